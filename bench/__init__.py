@@ -0,0 +1,20 @@
+"""
+Benchmarks for the static site generator.
+
+The modules in this package import the generator's modules from src/ directly,
+so run them from the project root, e.g.:
+
+    python3 -m bench.node_memory
+    python3 -m bench.suite
+    python3 -m bench compare
+
+bench.corpus generates the synthetic sites the suite runs on.
+"""
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(PROJECT_DIR, "src")
+
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
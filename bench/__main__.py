@@ -0,0 +1,27 @@
+"""
+Run a benchmark by name:
+
+    python3 -m bench COMMAND [options]
+
+where COMMAND is one of suite, compare, corpus, renderer or node_memory
+(the same as python3 -m bench.COMMAND).
+"""
+import sys
+import importlib
+
+COMMANDS = ("suite", "compare", "corpus", "renderer", "node_memory")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(2)
+    module = importlib.import_module(f"bench.{argv[0]}")
+    # for the usage messages
+    sys.argv[0] = f"python3 -m bench {argv[0]}"
+    module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Check for performance regressions: run the benchmark suite (bench.suite) several times
+and compare the median time of every benchmark with a stored baseline.
+
+    python3 -m bench.compare [--baseline PATH] [--rounds N] [--threshold PERCENT] [--save]
+                             [suite options, see bench.suite]
+
+A benchmark has regressed when its median is slower than the baseline's by more than
+--threshold percent *and* by more than the noise of the measurements (NOISE_FACTOR times
+the larger median absolute deviation of the two), so a noisy benchmark needs a bigger
+slowdown to fail. The exit status is 1 if anything regressed.
+
+--save runs the suite and stores the result as the new baseline instead. Compare on the
+machine the baseline was saved on: the corpus options and jobs are taken from the baseline.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+
+import bench
+from bench.corpus import corpus_options
+from bench.suite import (
+    SUITE_VERSION,
+    BENCHMARKS,
+    run_suite,
+    open_corpus,
+    environment,
+    add_suite_arguments,
+)
+
+BASELINE_PATH = "./bench_baseline.json"
+
+# percent a median may get slower before it counts as a regression
+THRESHOLD_PERCENT = 10.0
+
+# a slowdown smaller than this many median absolute deviations is just noise
+NOISE_FACTOR = 3.0
+
+# the suite is run this many times, and the runs of all rounds are pooled
+ROUNDS = 3
+
+
+def median_absolute_deviation(values):
+    median = statistics.median(values)
+    return statistics.median([abs(value - median) for value in values])
+
+
+def measure(corpus, names, repeat, jobs, rounds, log=None):
+    """
+    Run the suite rounds times and pool the runs of every benchmark.
+    Returns {benchmark name: {"runs", "median_seconds", "mad_seconds"}}
+    """
+    runs = {}
+    for round_number in range(rounds):
+        if log is not None:
+            log(f"round {round_number + 1}/{rounds}")
+        for name, result in run_suite(corpus, names, repeat, jobs).items():
+            runs.setdefault(name, []).extend(result["runs"])
+    return {
+        name: {
+            "runs": name_runs,
+            "median_seconds": statistics.median(name_runs),
+            "mad_seconds": median_absolute_deviation(name_runs),
+        }
+        for name, name_runs in runs.items()
+    }
+
+
+def compare_results(baseline, current, threshold_percent=THRESHOLD_PERCENT, noise_factor=NOISE_FACTOR):
+    """
+    Compare the results from measure() with those of the baseline.
+    Returns a list of rows, one per benchmark in current:
+    (name, baseline median, current median, change in percent, noise in percent, status),
+    status being "regressed", "improved", "ok" or "new" (not in the baseline).
+    """
+    rows = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        median = result["median_seconds"]
+        if base is None:
+            rows.append((name, None, median, None, None, "new"))
+            continue
+        base_median = base["median_seconds"]
+        change = median - base_median
+        noise = noise_factor * max(base["mad_seconds"], result["mad_seconds"])
+        # both the threshold and the noise have to be exceeded
+        allowed = max(base_median * threshold_percent / 100, noise)
+        if change > allowed:
+            status = "regressed"
+        elif -change > allowed:
+            status = "improved"
+        else:
+            status = "ok"
+        change_percent = change / base_median * 100 if base_median else 0.0
+        noise_percent = noise / base_median * 100 if base_median else 0.0
+        rows.append((name, base_median, median, change_percent, noise_percent, status))
+    return rows
+
+
+def format_table(rows):
+    lines = [f"{'benchmark':<26} {'baseline ms':>12} {'current ms':>11} {'change':>8} {'noise':>7}  status"]
+    for name, base_median, median, change_percent, noise_percent, status in rows:
+        if base_median is None:
+            lines.append(f"{name:<26} {'-':>12} {median * 1000:>11.2f} {'-':>8} {'-':>7}  {status}")
+        else:
+            lines.append(
+                f"{name:<26} {base_median * 1000:>12.2f} {median * 1000:>11.2f} "
+                f"{change_percent:>+7.1f}% {noise_percent:>6.1f}%  {status}"
+            )
+    return "\n".join(lines)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != SUITE_VERSION:
+        raise ValueError(f"{path} was saved by another version of the benchmark suite, save a new baseline with --save")
+    return baseline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_suite_arguments(parser)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help=f"the baseline json (default: {BASELINE_PATH})")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help=f"times to run the suite (default: {ROUNDS})")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD_PERCENT, help=f"percent slower that counts as a regression (default: {THRESHOLD_PERCENT})")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    options = corpus_options(args)
+    jobs = args.jobs
+    if not args.save:
+        if not os.path.isfile(args.baseline):
+            parser.error(f"no baseline at {args.baseline}, make one with --save")
+        try:
+            baseline = load_baseline(args.baseline)
+        except ValueError as e:
+            parser.error(str(e))
+        # measure the same thing the baseline did
+        options = baseline["corpus"]["options"]
+        jobs = baseline["jobs"]
+        if baseline["environment"] != environment():
+            print("warning: the baseline was saved on a different machine or python, the comparison may not mean much")
+
+    names = args.only or (list(baseline["results"]) if baseline is not None else list(BENCHMARKS))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            corpus = open_corpus(args.corpus_dir or tmp_dir, options)
+        except ValueError as e:
+            parser.error(str(e))
+        current = measure(corpus, names, args.repeat, jobs, args.rounds, log=print)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "version": SUITE_VERSION,
+                "environment": environment(),
+                "corpus": corpus.info,
+                "repeat": args.repeat,
+                "rounds": args.rounds,
+                "jobs": jobs,
+                "results": current,
+            }, f, indent=1)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    rows = compare_results(baseline["results"], current, args.threshold)
+    print(format_table(rows))
+    regressed = [row[0] for row in rows if row[5] == "regressed"]
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed: {', '.join(regressed)}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+A synthetic site to benchmark with: content/ (markdown pages), static/ and template.html,
+generated from a seed, so the same options always give exactly the same files.
+
+    python3 -m bench.corpus DEST_DIR [--pages N] [--blocks N] [--links X] [--markup X]
+                                     [--code-ratio X] [--depth N] [--static-files N] [--seed N]
+
+The pages use everything the generator understands: headings, paragraphs with bold, italic,
+code, links (to other pages and external) and images, quotes, both kinds of lists and code blocks.
+"""
+import os
+import json
+import random
+import argparse
+
+WORDS = (
+    "the elves of rivendell sang under the stars while hobbits ate second breakfast "
+    "in the shire and the ring was carried east through moria past lothlorien "
+    "down the great river to the black gate where the wizard and the ranger waited "
+    "for news of the halfling and his loyal gardener who climbed the mountain of fire"
+).split()
+
+# the options generate_corpus takes, and their defaults
+DEFAULT_OPTIONS = {
+    "pages": 200,
+    "blocks": 30,          # blocks per page
+    "links": 0.5,          # links (and images) per line of text, on average
+    "markup": 0.15,        # chance for a word to be bold, italic or code
+    "code_ratio": 0.1,     # share of the blocks that are code blocks
+    "depth": 2,            # directory levels under content/
+    "static_files": 50,
+    "seed": 0,
+}
+
+# sections per directory level, so depth 2 gives up to 4 * 4 directories
+SECTIONS_PER_LEVEL = 4
+
+TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet">
+</head>
+<body>
+    <nav><a href="/">Home</a> <a href="/section-0/">Docs</a></nav>
+    <article>{{ Content }}</article>
+</body>
+</html>
+"""
+
+
+def page_paths(pages, depth):
+    """ the path (relative to content/) of every page; page 0 is the home page """
+    paths = ["index.md"]
+    for i in range(1, pages):
+        parts = []
+        section = i
+        for level in range(depth):
+            parts.append(f"section-{section % SECTIONS_PER_LEVEL}" if level == 0 else f"part-{section % SECTIONS_PER_LEVEL}")
+            section //= SECTIONS_PER_LEVEL
+        parts.append(f"page-{i}.md")
+        paths.append("/".join(parts))
+    return paths
+
+
+def page_url(path):
+    """ the url of the page generated from the markdown at path (relative to content/) """
+    if path == "index.md":
+        return "/"
+    return "/" + path[:-len(".md")] + ".html"
+
+
+class PageWriter():
+    """ writes the markdown of one page, drawing everything from its own random generator """
+    def __init__(self, rng, options, urls, static_urls):
+        self.rng = rng
+        self.options = options
+        self.urls = urls
+        self.static_urls = static_urls
+
+    def words(self, count):
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def inline_text(self, word_count):
+        """ a run of text with inline markup, links and images """
+        pieces = []
+        # links per word, so longer paragraphs get more of them
+        link_chance = self.options["links"] / max(word_count, 1)
+        markup = self.options["markup"]
+        for _ in range(word_count):
+            roll = self.rng.random()
+            if roll < link_chance:
+                if self.rng.random() < 0.2 and self.static_urls:
+                    pieces.append(f"![{self.words(2)}]({self.rng.choice(self.static_urls)})")
+                elif self.rng.random() < 0.8:
+                    pieces.append(f"[{self.words(2)}]({self.rng.choice(self.urls)})")
+                else:
+                    pieces.append(f"[{self.words(1)}](https://example.com/{self.rng.choice(WORDS)})")
+                continue
+            word = self.rng.choice(WORDS)
+            roll = self.rng.random()
+            if roll < markup / 3:
+                pieces.append(f"**{word}**")
+            elif roll < markup * 2 / 3:
+                pieces.append(f"_{word}_")
+            elif roll < markup:
+                pieces.append(f"`{word}`")
+            else:
+                pieces.append(word)
+        return " ".join(pieces)
+
+    def block(self):
+        if self.rng.random() < self.options["code_ratio"]:
+            lines = [f"def {self.rng.choice(WORDS)}_{i}(x):\n    return x * {i}" for i in range(self.rng.randint(1, 4))]
+            return "```\n" + "\n\n".join(lines) + "\n```"
+        kind = self.rng.random()
+        if kind < 0.1:
+            return "#" * self.rng.randint(2, 4) + " " + self.words(self.rng.randint(2, 6))
+        if kind < 0.2:
+            return "\n".join("> " + self.inline_text(self.rng.randint(5, 15)) for _ in range(self.rng.randint(1, 3)))
+        if kind < 0.3:
+            return "\n".join("- " + self.inline_text(self.rng.randint(3, 10)) for _ in range(self.rng.randint(2, 6)))
+        if kind < 0.4:
+            return "\n".join(f"{i}. " + self.inline_text(self.rng.randint(3, 10)) for i in range(1, self.rng.randint(3, 7)))
+        # paragraphs, sometimes wrapped over several lines
+        return "\n".join(self.inline_text(self.rng.randint(10, 30)) for _ in range(self.rng.randint(1, 3)))
+
+    def page(self, title):
+        blocks = [f"# {title}"]
+        for _ in range(self.options["blocks"]):
+            blocks.append(self.block())
+        return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(dest_dir, **options):
+    """
+    Write content/, static/ and template.html for a site into dest_dir (which should be empty),
+    see DEFAULT_OPTIONS for the options. Returns a dict describing the corpus:
+    the options, and the number and total size of the pages and static files.
+    """
+    unknown = set(options) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown corpus options: {', '.join(sorted(unknown))}")
+    options = dict(DEFAULT_OPTIONS, **options)
+    if options["pages"] < 1:
+        raise ValueError("A corpus needs at least one page")
+
+    content_dir = os.path.join(dest_dir, "content")
+    static_dir = os.path.join(dest_dir, "static")
+    os.makedirs(content_dir, exist_ok=True)
+    os.makedirs(static_dir, exist_ok=True)
+    with open(os.path.join(dest_dir, "template.html"), "w") as f:
+        f.write(TEMPLATE)
+
+    # the static files: some "images" of a few KiB and a stylesheet
+    static_urls = []
+    static_bytes = 0
+    rng = random.Random(options["seed"])
+    with open(os.path.join(static_dir, "index.css"), "w") as f:
+        static_bytes += f.write("body { font-family: serif; }\n" * 20)
+    for i in range(options["static_files"]):
+        rel_path = f"images/{i % SECTIONS_PER_LEVEL}/image-{i}.png"
+        path = os.path.join(static_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            static_bytes += f.write(rng.randbytes(rng.randint(1024, 16 * 1024)))
+        static_urls.append("/" + rel_path)
+
+    paths = page_paths(options["pages"], options["depth"])
+    urls = [page_url(path) for path in paths]
+    content_bytes = 0
+    for i, path in enumerate(paths):
+        # a generator of its own per page, seeded with the seed and the page number
+        writer = PageWriter(random.Random(f"{options['seed']}:{i}"), options, urls, static_urls)
+        markdown = writer.page(f"Page {i}: {writer.words(3)}")
+        dest_path = os.path.join(content_dir, path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        with open(dest_path, "w") as f:
+            f.write(markdown)
+        content_bytes += len(markdown.encode())
+
+    return {
+        "options": options,
+        "pages": len(paths),
+        "content_bytes": content_bytes,
+        "static_files": options["static_files"] + 1,
+        "static_bytes": static_bytes,
+    }
+
+
+def add_corpus_arguments(parser):
+    """ the corpus options as command line arguments (shared with the benchmark suite) """
+    parser.add_argument("--pages", type=int, default=DEFAULT_OPTIONS["pages"], help=f"number of pages (default: {DEFAULT_OPTIONS['pages']})")
+    parser.add_argument("--blocks", type=int, default=DEFAULT_OPTIONS["blocks"], help=f"blocks per page (default: {DEFAULT_OPTIONS['blocks']})")
+    parser.add_argument("--links", type=float, default=DEFAULT_OPTIONS["links"], help=f"links and images per line of text (default: {DEFAULT_OPTIONS['links']})")
+    parser.add_argument("--markup", type=float, default=DEFAULT_OPTIONS["markup"], help=f"share of words in bold, italic or code (default: {DEFAULT_OPTIONS['markup']})")
+    parser.add_argument("--code-ratio", type=float, default=DEFAULT_OPTIONS["code_ratio"], help=f"share of blocks that are code blocks (default: {DEFAULT_OPTIONS['code_ratio']})")
+    parser.add_argument("--depth", type=int, default=DEFAULT_OPTIONS["depth"], help=f"directory levels under content/ (default: {DEFAULT_OPTIONS['depth']})")
+    parser.add_argument("--static-files", type=int, default=DEFAULT_OPTIONS["static_files"], help=f"number of static files (default: {DEFAULT_OPTIONS['static_files']})")
+    parser.add_argument("--seed", type=int, default=DEFAULT_OPTIONS["seed"], help=f"random seed (default: {DEFAULT_OPTIONS['seed']})")
+
+
+def corpus_options(args):
+    return {name: getattr(args, name) for name in DEFAULT_OPTIONS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dest_dir")
+    add_corpus_arguments(parser)
+    args = parser.parse_args(argv)
+    print(json.dumps(generate_corpus(args.dest_dir, **corpus_options(args)), indent=1))
+
+
+if __name__ == "__main__":
+    main()
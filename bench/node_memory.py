@@ -0,0 +1,102 @@
+"""
+Peak memory per page of the inline nodes (one TextNode and one LeafNode per inline span),
+with the slotted node classes compared to the plain classes they replaced.
+
+    python3 -m bench.node_memory [markdown files or directories...] [--repeat N]
+
+Without paths, every page in ./content is measured.
+"""
+import os
+import argparse
+import tracemalloc
+
+import bench
+from textnode import TextNode, TextType
+from htmlnode import LeafNode
+from markdown_blocks import scan_blocks, BlockType
+from inline_markdown import iter_inline_tokens
+
+
+class LegacyTextNode():
+    """ TextNode as it was before __slots__ (same constructor, with a per-instance __dict__) """
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class LegacyLeafNode():
+    """ LeafNode as it was before __slots__ """
+    def __init__(self, tag, value, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
+
+
+def build_inline_nodes(markdown, text_node_class, leaf_node_class, repeat):
+    """ build (and keep alive) the inline nodes of a page, repeat times over """
+    nodes = []
+    for _ in range(repeat):
+        for block in scan_blocks(markdown):
+            if block.block_type == BlockType.CODE:
+                continue
+            for text_type, text, url in iter_inline_tokens(" ".join(block.lines)):
+                text_node = text_node_class(text, text_type, url)
+                if text_type == TextType.LINK:
+                    leaf = leaf_node_class("a", text, {"href": url})
+                elif text_type == TextType.IMAGE:
+                    leaf = leaf_node_class("img", None, {"src": url, "alt": text})
+                else:
+                    leaf = leaf_node_class(None, text)
+                nodes.append((text_node, leaf))
+    return nodes
+
+
+def measure_peak(markdown, text_node_class, leaf_node_class, repeat):
+    tracemalloc.start()
+    try:
+        nodes = build_inline_nodes(markdown, text_node_class, leaf_node_class, repeat)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, len(nodes)
+
+
+def find_pages(paths):
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    if file_name.endswith(".md"):
+                        pages.append(os.path.join(dir_path, file_name))
+        else:
+            pages.append(path)
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[os.path.join(bench.PROJECT_DIR, "content")])
+    parser.add_argument("--repeat", type=int, default=1, help="build each page's nodes this many times (simulates bigger pages)")
+    args = parser.parse_args(argv)
+
+    print(f"{'page':<50} {'spans':>7} {'before KiB':>11} {'after KiB':>10} {'saved':>6}")
+    total_before = total_after = 0
+    for page in find_pages(args.paths):
+        with open(page) as f:
+            markdown = f.read()
+        before, spans = measure_peak(markdown, LegacyTextNode, LegacyLeafNode, args.repeat)
+        after, _ = measure_peak(markdown, TextNode, LeafNode, args.repeat)
+        total_before += before
+        total_after += after
+        saved = 1 - after / before if before else 0
+        print(f"{os.path.relpath(page):<50} {spans:>7} {before / 1024:>11.1f} {after / 1024:>10.1f} {saved:>6.0%}")
+    if total_before:
+        print(f"{'total':<50} {'':>7} {total_before / 1024:>11.1f} {total_after / 1024:>10.1f} {1 - total_after / total_before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
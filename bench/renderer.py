@@ -0,0 +1,88 @@
+"""
+Time and memory per page of the two markdown renderers:
+markdown_to_html_node(markdown).to_html() (through the node trees) and
+markdown_to_html(markdown) (the direct fast path).
+
+    python3 -m bench.renderer [markdown files or directories...] [--number N]
+
+Without paths, every page in ./content is measured.
+
+Both renderers memoize inline markdown (see markdown_to_html.clear_inline_caches), so every
+page is timed cold (the caches cleared before each render, as in a build's first page) and
+warm (rendered again with the caches full); the speedup is the cold one.
+The peak memory is that of a cold render.
+"""
+import os
+import time
+import argparse
+import tracemalloc
+
+import bench
+from bench.node_memory import find_pages
+from markdown_to_html import markdown_to_html_node, markdown_to_html, clear_inline_caches
+
+
+def render_tree(markdown):
+    return markdown_to_html_node(markdown).to_html()
+
+
+RENDERERS = {
+    "tree": render_tree,
+    "direct": markdown_to_html,
+}
+
+
+def time_renderer(render, markdown, number, warm=False):
+    """ the seconds per render of the page, with the inline caches cleared before each render unless warm """
+    seconds = 0.0
+    if warm:
+        render(markdown)
+    for _ in range(number):
+        if not warm:
+            clear_inline_caches()
+        start = time.perf_counter()
+        render(markdown)
+        seconds += time.perf_counter() - start
+    return seconds / number
+
+
+def peak_memory(render, markdown):
+    """ (peak traced bytes while rendering the page once with empty inline caches, the html) """
+    clear_inline_caches()
+    tracemalloc.start()
+    try:
+        html = render(markdown)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, html
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[os.path.join(bench.PROJECT_DIR, "content")])
+    parser.add_argument("--number", type=int, default=200, help="renders per page for the timing (default: 200)")
+    args = parser.parse_args(argv)
+
+    print(f"{'page':<40} {'renderer':<8} {'cold ms':>8} {'warm ms':>8} {'peak KiB':>9}")
+    totals = {name: 0.0 for name in RENDERERS}
+    warm_totals = {name: 0.0 for name in RENDERERS}
+    for page in find_pages(args.paths):
+        with open(page) as f:
+            markdown = f.read()
+        outputs = set()
+        for name, render in RENDERERS.items():
+            seconds = time_renderer(render, markdown, args.number)
+            warm_seconds = time_renderer(render, markdown, args.number, warm=True)
+            peak, html = peak_memory(render, markdown)
+            outputs.add(html)
+            totals[name] += seconds
+            warm_totals[name] += warm_seconds
+            print(f"{os.path.relpath(page):<40} {name:<8} {seconds * 1000:>8.3f} {warm_seconds * 1000:>8.3f} {peak / 1024:>9.1f}")
+        if len(outputs) != 1:
+            print(f"  !! the renderers disagree on {page}")
+    print(f"direct renderer speedup: {totals['tree'] / totals['direct']:.2f}x cold, {warm_totals['tree'] / warm_totals['direct']:.2f}x warm")
+
+
+if __name__ == "__main__":
+    main()
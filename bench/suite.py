@@ -0,0 +1,264 @@
+"""
+Throughput of the main steps of a build, on a synthetic site from bench.corpus:
+
+    markdown_to_blocks        splitting pages into blocks
+    text_to_textnodes         parsing the inline markdown of every block
+    markdown_to_html_node     building the node tree of every page
+    to_html                   serializing the node trees
+    generate_pages_recursive  building every page (read, render, write)
+    copy_directory_contents   copying static/
+
+    python3 -m bench.suite [--repeat N] [--jobs N] [--only NAME ...] [--output PATH]
+                           [--corpus-dir DIR] [corpus options, see bench.corpus]
+
+Every benchmark runs --repeat times; the median is reported as pages (or files) per second
+and MB per second of input (of html output for to_html), and everything is saved as json.
+"""
+import os
+import re
+import gc
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+
+import bench
+from bench.corpus import DEFAULT_OPTIONS, generate_corpus, add_corpus_arguments, corpus_options
+from markdown_blocks import markdown_to_blocks, scan_blocks, BlockType
+from inline_markdown import text_to_textnodes
+from markdown_to_html import markdown_to_html_node, clear_inline_caches
+from generate_page import generate_pages_recursive
+from copystatic import copy_directory_contents
+
+RESULTS_PATH = "./bench_results.json"
+
+# bump when the benchmarks change in a way that makes older results incomparable
+SUITE_VERSION = 1
+
+# the block prefixes that aren't part of a block's inline text
+BLOCK_PREFIX_PATTERN = re.compile(r"^(#{1,6} |> ?|- |\d+\. )")
+
+
+class Corpus():
+    """ a generated site, with its pages read into memory """
+    def __init__(self, root, info):
+        self.root = root
+        self.info = info
+        self.content_dir = os.path.join(root, "content")
+        self.static_dir = os.path.join(root, "static")
+        self.template_path = os.path.join(root, "template.html")
+        self.markdowns = []
+        for dir_path, dir_names, file_names in os.walk(self.content_dir):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                if file_name.endswith(".md"):
+                    with open(os.path.join(dir_path, file_name)) as f:
+                        self.markdowns.append(f.read())
+        self.content_bytes = sum(len(markdown.encode()) for markdown in self.markdowns)
+
+
+def inline_texts(markdown):
+    """ the inline markdown of every line of the page's blocks, without the block prefixes """
+    texts = []
+    for block in scan_blocks(markdown):
+        if block.block_type == BlockType.CODE:
+            continue
+        for line in block.lines:
+            texts.append(BLOCK_PREFIX_PATTERN.sub("", line))
+    return texts
+
+
+# every benchmark takes the corpus and a scratch directory, and returns
+# (prepare, run, items, unit, bytes): prepare() (or None) is called untimed before every run()
+def bench_markdown_to_blocks(corpus, scratch_dir, jobs):
+    def run():
+        for markdown in corpus.markdowns:
+            markdown_to_blocks(markdown)
+    return None, run, len(corpus.markdowns), "pages", corpus.content_bytes
+
+
+def bench_text_to_textnodes(corpus, scratch_dir, jobs):
+    pages = [inline_texts(markdown) for markdown in corpus.markdowns]
+    size = sum(len(text.encode()) for texts in pages for text in texts)
+
+    def run():
+        for texts in pages:
+            for text in texts:
+                text_to_textnodes(text)
+    return None, run, len(pages), "pages", size
+
+
+def bench_markdown_to_html_node(corpus, scratch_dir, jobs):
+    def run():
+        for markdown in corpus.markdowns:
+            markdown_to_html_node(markdown)
+    # the inline markdown is memoized, which would make every run after the first one faster
+    return clear_inline_caches, run, len(corpus.markdowns), "pages", corpus.content_bytes
+
+
+def bench_to_html(corpus, scratch_dir, jobs):
+    nodes = [markdown_to_html_node(markdown) for markdown in corpus.markdowns]
+    size = sum(len(node.to_html().encode()) for node in nodes)
+
+    def run():
+        for node in nodes:
+            node.to_html()
+    return None, run, len(nodes), "pages", size
+
+
+def bench_generate_pages_recursive(corpus, scratch_dir, jobs):
+    dest_dir = os.path.join(scratch_dir, "docs")
+
+    def prepare():
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        os.makedirs(dest_dir)
+        clear_inline_caches()
+
+    def run():
+        generate_pages_recursive(corpus.content_dir, corpus.template_path, dest_dir, jobs=jobs)
+    return prepare, run, len(corpus.markdowns), "pages", corpus.content_bytes
+
+
+def bench_copy_directory_contents(corpus, scratch_dir, jobs):
+    dest_dir = os.path.join(scratch_dir, "static")
+
+    def run():
+        copy_directory_contents(corpus.static_dir, dest_dir)
+    return None, run, corpus.info["static_files"], "files", corpus.info["static_bytes"]
+
+
+BENCHMARKS = {
+    "markdown_to_blocks": bench_markdown_to_blocks,
+    "text_to_textnodes": bench_text_to_textnodes,
+    "markdown_to_html_node": bench_markdown_to_html_node,
+    "to_html": bench_to_html,
+    "generate_pages_recursive": bench_generate_pages_recursive,
+    "copy_directory_contents": bench_copy_directory_contents,
+}
+
+
+def run_benchmark(benchmark, corpus, repeat=5, jobs=1):
+    """ run one of BENCHMARKS repeat times, and return its result (see run_suite) """
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        prepare, run, items, unit, size = benchmark(corpus, scratch_dir, jobs)
+        runs = []
+        for _ in range(repeat):
+            if prepare is not None:
+                prepare()
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            runs.append(time.perf_counter() - start)
+    median = statistics.median(runs)
+    return {
+        "runs": runs,
+        "median_seconds": median,
+        "min_seconds": min(runs),
+        "items": items,
+        "unit": unit,
+        "bytes": size,
+        "items_per_second": items / median if median else 0.0,
+        "mb_per_second": size / median / 1e6 if median else 0.0,
+    }
+
+
+def run_suite(corpus, names=None, repeat=5, jobs=1, log=None):
+    """
+    Run the named benchmarks (all of them by default) on the corpus.
+    Returns {benchmark name: result}, a result being a dict with the seconds of every run,
+    their median and minimum, and the throughput of the median run
+    (items, and MB of bytes, per second).
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark: {name}")
+        results[name] = run_benchmark(BENCHMARKS[name], corpus, repeat, jobs)
+        if log is not None:
+            log(format_result(name, results[name]))
+    return results
+
+
+def open_corpus(corpus_dir, options):
+    """
+    the Corpus in corpus_dir, generated first unless it already has content/.
+    Raises a ValueError if the corpus already there was generated with other options
+    (or has no corpus.json to tell), instead of silently benchmarking another site.
+    """
+    options = dict(DEFAULT_OPTIONS, **options)
+    info_path = os.path.join(corpus_dir, "corpus.json")
+    if not os.path.isdir(os.path.join(corpus_dir, "content")):
+        info = generate_corpus(corpus_dir, **options)
+        with open(info_path, "w") as f:
+            json.dump(info, f, indent=1)
+    try:
+        with open(info_path) as f:
+            info = json.load(f)
+    except (FileNotFoundError, ValueError):
+        raise ValueError(f"{corpus_dir} has a content directory but no valid corpus.json, use an empty directory")
+    if info.get("options") != options:
+        changed = sorted(name for name in options if info.get("options", {}).get(name) != options[name])
+        raise ValueError(
+            f"The corpus in {corpus_dir} was generated with other options ({', '.join(changed)}), "
+            "use another directory or the same options"
+        )
+    return Corpus(corpus_dir, info)
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def format_result(name, result):
+    return (
+        f"{name:<26} {result['median_seconds'] * 1000:>10.2f} ms "
+        f"{result['items_per_second']:>10.1f} {result['unit']}/s {result['mb_per_second']:>8.2f} MB/s"
+    )
+
+
+def add_suite_arguments(parser):
+    """ the options of a suite run as command line arguments (shared with bench.compare) """
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every benchmark (default: 5)")
+    parser.add_argument("--jobs", type=int, default=1, help="processes for generate_pages_recursive (default: 1)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), metavar="NAME", help="only run these benchmarks")
+    parser.add_argument("--corpus-dir", help="generate the corpus here (or use the one already there, made with the same options) instead of in a temporary directory")
+    add_corpus_arguments(parser)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_suite_arguments(parser)
+    parser.add_argument("--output", default=RESULTS_PATH, help=f"where to save the results as json (default: {RESULTS_PATH})")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            corpus = open_corpus(args.corpus_dir or tmp_dir, corpus_options(args))
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"corpus: {corpus.info['pages']} pages, {corpus.content_bytes / 1e6:.2f} MB of markdown")
+        results = run_suite(corpus, args.only, args.repeat, args.jobs, log=print)
+
+    report = {
+        "version": SUITE_VERSION,
+        "environment": environment(),
+        "corpus": corpus.info,
+        "repeat": args.repeat,
+        "jobs": args.jobs,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
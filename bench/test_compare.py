@@ -0,0 +1,111 @@
+import io
+import os
+import json
+import unittest
+import statistics
+from unittest import mock
+from contextlib import redirect_stdout
+
+from bench import compare
+from bench.compare import compare_results, median_absolute_deviation
+from fixtures import TempDirTestCase
+
+
+def result(runs):
+    return {
+        "runs": runs,
+        "median_seconds": statistics.median(runs),
+        "mad_seconds": median_absolute_deviation(runs),
+    }
+
+
+class TestCompareResults(unittest.TestCase):
+    def statuses(self, baseline, current, **options):
+        return {row[0]: row[5] for row in compare_results(baseline, current, **options)}
+
+    def test_statuses(self):
+        baseline = {
+            "slower": result([1.0, 1.0, 1.0]),
+            "faster": result([1.0, 1.0, 1.0]),
+            "same": result([1.0, 1.0, 1.0]),
+            "gone": result([1.0, 1.0, 1.0]),
+        }
+        current = {
+            "slower": result([1.2, 1.2, 1.2]),
+            "faster": result([0.8, 0.8, 0.8]),
+            "same": result([1.05, 1.05, 1.05]),
+            "added": result([1.0, 1.0, 1.0]),
+        }
+        self.assertEqual(
+            self.statuses(baseline, current),
+            {"slower": "regressed", "faster": "improved", "same": "ok", "added": "new"}
+        )
+
+    def test_rows(self):
+        rows = compare_results({"a": result([1.0, 1.0, 1.0])}, {"a": result([1.5, 1.5, 1.5]), "b": result([2.0])})
+        self.assertEqual(rows[0][:2], ("a", 1.0))
+        self.assertAlmostEqual(rows[0][3], 50.0)
+        self.assertEqual(rows[1], ("b", None, 2.0, None, None, "new"))
+        self.assertIn("regressed", compare.format_table(rows))
+
+    def test_noise_raises_the_threshold(self):
+        # 20% slower is over the 10% threshold, but not over 3 MADs of 0.1 seconds
+        baseline = {"noisy": result([0.9, 1.0, 1.1])}
+        current = {"noisy": result([1.1, 1.2, 1.3])}
+        self.assertEqual(self.statuses(baseline, current), {"noisy": "ok"})
+        self.assertEqual(self.statuses(baseline, current, noise_factor=1.0), {"noisy": "regressed"})
+        # and the other way around
+        self.assertEqual(self.statuses(current, baseline), {"noisy": "ok"})
+        # the threshold still applies when there is no noise at all
+        self.assertEqual(self.statuses({"a": result([1.0])}, {"a": result([1.05])}, threshold_percent=1.0), {"a": "regressed"})
+
+
+class TestCompareMain(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.baseline_path = self.path("baseline.json")
+        # a tiny corpus, so saving the baseline runs the real suite quickly
+        self.args = [
+            "--baseline", self.baseline_path, "--only", "markdown_to_blocks",
+            "--rounds", "1", "--repeat", "1", "--pages", "2", "--blocks", "2", "--static-files", "1",
+        ]
+        self.main("--save")
+        with open(self.baseline_path) as f:
+            self.baseline = json.load(f)
+
+    def main(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            compare.main(self.args + list(argv))
+        return output.getvalue()
+
+    def measured(self, factor):
+        # the baseline's results, factor times slower
+        return {
+            name: result([seconds * factor for seconds in base["runs"]])
+            for name, base in self.baseline["results"].items()
+        }
+
+    def test_save(self):
+        self.assertEqual(list(self.baseline["results"]), ["markdown_to_blocks"])
+        self.assertEqual(self.baseline["corpus"]["options"]["pages"], 2)
+
+    def test_exit_status(self):
+        with mock.patch.object(compare, "measure", return_value=self.measured(1.0)):
+            self.assertIn("No regressions", self.main())
+        with mock.patch.object(compare, "measure", return_value=self.measured(0.5)):
+            self.assertIn("improved", self.main())
+        with mock.patch.object(compare, "measure", return_value=self.measured(2.0)):
+            with self.assertRaises(SystemExit) as context:
+                self.main()
+        self.assertEqual(context.exception.code, 1)
+
+    def test_missing_baseline(self):
+        os.remove(self.baseline_path)
+        with self.assertRaises(SystemExit) as context, mock.patch("sys.stderr", io.StringIO()):
+            self.main()
+        self.assertEqual(context.exception.code, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from bench.corpus import generate_corpus
+from fixtures import TempDirTestCase
+
+
+class TestGenerateCorpus(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.options = {"pages": 20, "blocks": 5, "static_files": 3}
+
+    def generate(self, name, **options):
+        dest_dir = self.path(name)
+        info = generate_corpus(dest_dir, **options)
+        return info, self.read_tree(dest_dir)
+
+    def test_same_options_same_files(self):
+        info, files = self.generate("a", **self.options)
+        self.assertEqual(self.generate("b", **self.options), (info, files))
+        self.assertEqual(info["pages"], 20)
+        self.assertEqual(len([path for path in files if path.endswith(".md")]), 20)
+        self.assertEqual(info["content_bytes"], sum(len(data) for path, data in files.items() if path.endswith(".md")))
+
+    def test_seed_changes_the_files(self):
+        info, files = self.generate("a", **self.options)
+        other_info, other_files = self.generate("b", seed=1, **self.options)
+        self.assertEqual(sorted(other_files), sorted(files))
+        self.assertNotEqual(other_files, files)
+        self.assertEqual(other_info["options"]["seed"], 1)
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            generate_corpus(self.dir, colour="blue")
+        with self.assertRaises(ValueError):
+            generate_corpus(self.dir, pages=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import unittest
+
+from bench.suite import open_corpus
+from fixtures import TempDirTestCase
+
+
+class TestOpenCorpus(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.options = {"pages": 3, "blocks": 2, "static_files": 1}
+
+    def test_reuses_a_corpus_with_the_same_options(self):
+        corpus = open_corpus(self.dir, self.options)
+        self.assertEqual(len(corpus.markdowns), 3)
+        self.assertEqual(corpus.info["options"]["blocks"], 2)
+        index_path = self.path("content/index.md")
+        with open(index_path, "a") as f:
+            f.write("not generated again\n")
+        self.assertTrue(open_corpus(self.dir, self.options).markdowns[0].endswith("not generated again\n"))
+
+    def test_other_options_are_an_error(self):
+        open_corpus(self.dir, self.options)
+        with self.assertRaises(ValueError) as context:
+            open_corpus(self.dir, dict(self.options, pages=4, seed=1))
+        self.assertIn("pages, seed", str(context.exception))
+
+    def test_content_without_corpus_json_is_an_error(self):
+        os.mkdir(self.path("content"))
+        with self.assertRaises(ValueError):
+            open_corpus(self.dir, self.options)
+
+
+if __name__ == "__main__":
+    unittest.main()
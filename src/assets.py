@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from copystatic import (
+    COPY_THREADS,
+    place_file,
+    remove_stale_files,
+    source_file_hash,
+)
+from manifest import hash_text
+from urls import split_url_suffix
+
+"""
+Fingerprinted static assets: every file from static/ is written to docs/ under a name
+containing a hash of its content (static/index.css -> docs/index.3f2a9c1d.css),
+so it can be served with a long-lived, immutable cache header. A new version of a file
+gets a new name, and the pages are rendered with the new urls.
+
+The mapping from the original url to the fingerprinted one ({"/index.css": "/index.3f2a9c1d.css"})
+is written to docs/asset-manifest.json, and is what generate_pages_recursive takes as assets.
+url(...) references in stylesheets are rewritten the same way.
+"""
+
+ASSET_MANIFEST_FILENAME = "asset-manifest.json"
+
+# number of hex digits of the content hash put into the file name
+FINGERPRINT_LENGTH = 8
+
+# files that are looked up by their exact name, so they keep it
+UNFINGERPRINTED_NAMES = {"robots.txt", "favicon.ico", "CNAME", ".nojekyll"}
+UNFINGERPRINTED_EXTENSIONS = {".html"}
+
+# url(...) in a stylesheet, with or without quotes
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(['"]?)([^'")]*?)\1\s*\)""")
+
+
+def fingerprint_directory(source_dir, dest_dir, records, link_mode="copy", threads=COPY_THREADS):
+    """
+    Put every file from source_dir into dest_dir under its fingerprinted name
+    and write the asset manifest. Like copystatic.sync_directory_contents, only files
+    that changed are written, and files from an earlier build that are no longer
+    produced (old versions, deleted sources) are removed; records is the same kind of dict.
+    Returns the asset map: {original url: fingerprinted url}, both root-relative.
+    """
+    if not os.path.exists(source_dir):
+        raise Exception("The source directory provided does not exist!")
+    os.makedirs(dest_dir, exist_ok=True)
+
+    # the records from the last build by source, to reuse the hashes of unchanged files
+    previous = {}
+    for record in records.values():
+        previous[record["source"]] = record
+
+    stylesheets = []
+    others = []
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        for file_name in file_names:
+            source_path = os.path.join(dir_path, file_name)
+            url = "/" + os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+            if file_name.endswith(".css"):
+                stylesheets.append((source_path, url))
+            else:
+                others.append((source_path, url))
+
+    def place_asset(item):
+        source_path, url = item
+        source_stat = os.stat(source_path)
+        digest = source_file_hash(source_path, source_stat, previous.get(source_path))
+        asset_url = fingerprint_url(url, digest)
+        dest_path = os.path.normpath(os.path.join(dest_dir, asset_url[1:]))
+        try:
+            dest_stat = os.stat(dest_path)
+        except FileNotFoundError:
+            dest_stat = None
+        # the name says what the content is, so an existing file of the right size is the same file
+        if dest_stat is None or dest_stat.st_size != source_stat.st_size:
+            place_file(source_path, dest_path, link_mode, source_stat)
+        records[dest_path] = {
+            "source": source_path,
+            "size": source_stat.st_size,
+            "mtime_ns": source_stat.st_mtime_ns,
+            "hash": digest,
+        }
+        return url, asset_url, dest_path
+
+    asset_map = {}
+    produced = set()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for url, asset_url, dest_path in executor.map(place_asset, others):
+            asset_map[url] = asset_url
+            produced.add(dest_path)
+
+    # stylesheets go last: their content (and so their hash) depends on the urls of the other assets
+    for source_path, url in sorted(stylesheets):
+        source_stat = os.stat(source_path)
+        with open(source_path) as f:
+            css = rewrite_css_urls(f.read(), url, asset_map)
+        digest = hash_text(css)
+        asset_url = fingerprint_url(url, digest)
+        dest_path = os.path.normpath(os.path.join(dest_dir, asset_url[1:]))
+        if not os.path.isfile(dest_path):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with open(dest_path, "w") as f:
+                f.write(css)
+        records[dest_path] = {
+            "source": source_path,
+            "size": source_stat.st_size,
+            "mtime_ns": source_stat.st_mtime_ns,
+            "hash": None, # the hash of the rewritten stylesheet, not of the source
+        }
+        asset_map[url] = asset_url
+        produced.add(dest_path)
+
+    manifest_path = os.path.normpath(os.path.join(dest_dir, ASSET_MANIFEST_FILENAME))
+    produced.add(manifest_path)
+    remove_stale_files(records, produced, dest_dir)
+    write_asset_manifest(asset_map, manifest_path)
+    # recorded like the assets, so a later build without fingerprinting removes it along with them
+    manifest_stat = os.stat(manifest_path)
+    records[manifest_path] = {
+        "source": None,
+        "size": manifest_stat.st_size,
+        "mtime_ns": manifest_stat.st_mtime_ns,
+        "hash": None,
+    }
+    return asset_map
+
+
+def fingerprint_url(url, digest):
+    """ "/images/a.png" -> "/images/a.<first FINGERPRINT_LENGTH digits of digest>.png" """
+    dir_name, file_name = posixpath.split(url)
+    if file_name in UNFINGERPRINTED_NAMES:
+        return url
+    name, extension = posixpath.splitext(file_name)
+    if extension in UNFINGERPRINTED_EXTENSIONS:
+        return url
+    return posixpath.join(dir_name, f"{name}.{digest[:FINGERPRINT_LENGTH]}{extension}")
+
+
+def rewrite_css_urls(css, stylesheet_url, asset_map):
+    """
+    Point the url(...) references in a stylesheet at the fingerprinted assets.
+    Relative urls are resolved against the stylesheet's own url and stay relative.
+    """
+    base_dir = posixpath.dirname(stylesheet_url)
+
+    def replace_url(match):
+        quote, url = match.group(1), match.group(2)
+        path, suffix = split_url_suffix(url)
+        if not path or path.startswith("//") or ":" in path:
+            return match.group(0) # data: and external urls, or a bare #fragment
+        if path.startswith("/"):
+            asset_url = asset_map.get(posixpath.normpath(path))
+            new_path = asset_url
+        else:
+            asset_url = asset_map.get(posixpath.normpath(posixpath.join(base_dir, path)))
+            new_path = posixpath.relpath(asset_url, base_dir) if asset_url is not None else None
+        if new_path is None:
+            return match.group(0)
+        return f"url({quote}{new_path}{suffix}{quote})"
+
+    return CSS_URL_PATTERN.sub(replace_url, css)
+
+
+def write_asset_manifest(asset_map, path):
+    with open(path, "w") as f:
+        json.dump(asset_map, f, indent=1, sort_keys=True)
+
+
+def load_asset_manifest(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,105 @@
+import os
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+from copystatic import COPY_THREADS
+from manifest import hash_file
+
+"""
+Precompressed output: after a build, every text file in docs/ gets a gzipped
+sibling (index.html -> index.html.gz) that a static file server can send as is,
+instead of compressing the file again on every request.
+"""
+
+# the kinds of files worth compressing (images, fonts etc. are already compressed)
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".xml", ".map"}
+
+# files smaller than this (in bytes) are not compressed; the saving doesn't pay for the extra request logic
+GZIP_MIN_SIZE = 1024
+
+GZIP_LEVEL = 9
+
+
+def compress_directory(dest_dir, records, min_size=GZIP_MIN_SIZE, threads=COPY_THREADS, level=GZIP_LEVEL):
+    """
+    Write a .gz copy next to every compressible file in dest_dir of at least min_size bytes.
+    records is a dict (kept in the build manifest between builds) of the files compressed so far,
+    keyed by path; a file whose content hash is the same as last time keeps its .gz as it is.
+    .gz files written by an earlier build for files that are gone (or now too small) are removed.
+    The files are compressed on a pool of threads (zlib releases the GIL while it works).
+    Returns a dict counting the files that were "compressed", "unchanged" and "removed".
+    """
+    paths = []
+    for dir_path, dir_names, file_names in os.walk(dest_dir):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1] in COMPRESSIBLE_EXTENSIONS:
+                paths.append(os.path.normpath(os.path.join(dir_path, file_name)))
+
+    def compress(path):
+        return compress_file(path, records, min_size, level)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(compress, paths))
+
+    # .gz files of earlier builds that shouldn't be there anymore
+    compressed = set(path for path, result in zip(paths, results) if result is not None)
+    abs_dest_dir = os.path.abspath(dest_dir)
+    removed = 0
+    for path in list(records):
+        if path in compressed:
+            continue
+        if os.path.commonpath([os.path.abspath(path), abs_dest_dir]) != abs_dest_dir:
+            continue
+        if os.path.isfile(path + ".gz"):
+            os.remove(path + ".gz")
+        del records[path]
+        removed += 1
+
+    return {"compressed": results.count(True), "unchanged": results.count(False), "removed": removed}
+
+
+def compress_file(path, records, min_size=GZIP_MIN_SIZE, level=GZIP_LEVEL):
+    """
+    Write path + ".gz" unless it's still up to date, and record it in records.
+    Returns True if it was written, False if it was up to date, None if path is smaller than min_size.
+    """
+    file_stat = os.stat(path)
+    if file_stat.st_size < min_size:
+        return None
+    gz_path = path + ".gz"
+    record = records.get(path)
+    gz_exists = os.path.isfile(gz_path)
+
+    # an unchanged size and mtime means the file doesn't need to be read to know its hash
+    if (
+        record is not None
+        and gz_exists
+        and record["size"] == file_stat.st_size
+        and record["mtime_ns"] == file_stat.st_mtime_ns
+    ):
+        return False
+
+    output_hash = hash_file(path)
+    written = False
+    if record is None or record["hash"] != output_hash or not gz_exists:
+        write_gzip(path, gz_path, level)
+        written = True
+    records[path] = {
+        "hash": output_hash,
+        "size": file_stat.st_size,
+        "mtime_ns": file_stat.st_mtime_ns,
+    }
+    return written
+
+
+def write_gzip(path, gz_path, level=GZIP_LEVEL):
+    # no file name and a zero mtime in the gzip header, so the same input always gives the same bytes
+    tmp_path = gz_path + ".tmp"
+    with open(path, "rb") as source, open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", compresslevel=level, fileobj=raw, mtime=0) as dest:
+            while True:
+                chunk = source.read(64 * 1024)
+                if not chunk:
+                    break
+                dest.write(chunk)
+    os.replace(tmp_path, gz_path)
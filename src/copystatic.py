@@ -1,48 +1,256 @@
 import os, shutil
+from concurrent.futures import ThreadPoolExecutor
+from manifest import hash_file
+from profiling import span
 
-def copy_directory_contents(source_dir, dest_dir):
+try:
+    import fcntl
+except ImportError: # not available on Windows
+    fcntl = None
+
+# how a static file is placed into the destination directory:
+#   "copy"      a plain copy of the content
+#   "hardlink"  a hard link to the source file (no bytes are duplicated)
+#   "reflink"   a copy-on-write clone of the source file (btrfs, xfs, ...)
+# if a link can't be made (different filesystems, no support, ...) the file is copied
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+# the FICLONE ioctl from linux/fs.h, used for reflinks
+FICLONE = 0x40049409
+
+# number of threads copying files at the same time
+# (the copies are I/O bound, so this follows ThreadPoolExecutor's own default)
+COPY_THREADS = min(32, (os.cpu_count() or 1) + 4)
+
+
+def copy_directory_contents(source_dir, dest_dir, clean=True, link_mode="copy", threads=COPY_THREADS):
     """
-    a recursive function that copies all the contents from 
+    a function that copies all the contents from 
     a source directory (source_dir: str, relative to the project root) 
     to a destination directory (dest_dir: str, relative to the project root)
+    with clean=False the existing contents of dest_dir are kept
+    (files from source_dir still overwrite their copies in dest_dir)
+    the files are copied on a pool of threads; see LINK_MODES for link_mode
     """
     # It should first delete all the contents of the destination directory (public) to ensure that the copy is clean.
     # First check that the source_dir exists
-    # print(f"\nnew call to copy_directory_contents with {source_dir} and {dest_dir}")
     if not os.path.exists(source_dir):
         raise Exception("The source directory provided does not exist!")
-    # print(f"source directory exists: {source_dir}")
 
     # Then check the dest_dir exists
+    if clean:
+        clean_directory(dest_dir)
+    elif not os.path.exists(dest_dir):
+        os.mkdir(dest_dir)
+
+    # It should copy all files and subdirectories, nested files, etc.
+    files = []
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        dest_dir_path = os.path.join(dest_dir, os.path.relpath(dir_path, source_dir))
+        # the directories are created up front, so empty ones are copied too
+        os.makedirs(dest_dir_path, exist_ok=True)
+        for file_name in file_names:
+            files.append((os.path.join(dir_path, file_name), os.path.join(dest_dir_path, file_name)))
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # list() so an error in any of the copies is raised here
+        list(executor.map(lambda paths: _traced_place_file(paths[0], paths[1], link_mode), files))
+
+
+def _traced_place_file(source_path, dest_path, link_mode):
+    # one span per file in the trace of a build (see profiling.span)
+    with span("copy", source=source_path):
+        return place_file(source_path, dest_path, link_mode)
+
+
+def _traced_sync_file(source_path, dest_path, records, use_hash, link_mode):
+    with span("sync", source=source_path):
+        return sync_file(source_path, dest_path, records, use_hash=use_hash, link_mode=link_mode)
+
+
+def clean_directory(dest_dir):
+    """
+    delete all the contents of dest_dir, or create it if it doesn't exist
+    """
     if os.path.exists(dest_dir):
         # if it does, delete all of its contents
-        # print(f"destination directory exists: {dest_dir}")
-        # print(f"deleting all contents within {dest_dir}...")
         for entry in os.listdir(dest_dir):
             entry_path = os.path.join(dest_dir, entry)
             if os.path.isdir(entry_path):
-                # print(f"deleting dir {entry}...")
                 shutil.rmtree(entry_path)
             else:
-                # print(f"deleting file {entry}...")
                 os.remove(entry_path)
     else:
         # if not, create it
-        # print(f"destination directory does not exist; creating it at {dest_dir}")
         os.mkdir(dest_dir)
 
-    # It should copy all files and subdirectories, nested files, etc.
-    # print("now attempting to copy all contents from source to destination")
-    for entry in os.listdir(source_dir):
-        # print(f"processing {entry} from {source_dir}")
-        entry_path = os.path.join(source_dir, entry)
-        if os.path.isfile(entry_path):
-            # print(f"{entry} is a file; copying to {dest_dir}")
-            shutil.copy(entry_path, dest_dir)
-        else: # assume its a dir otherwise
-            # print(f"{entry} is a dir")
-            # print(f"calling copy_to_directory recursively with dest_dir as {os.path.join(dest_dir, entry)}")
-            copy_directory_contents(entry_path, os.path.join(dest_dir, entry))
-
-    # print(f"finishing this call to copy_directory contents\n")
 
+def place_file(source_path, dest_path, link_mode="copy", source_stat=None):
+    """
+    Put the file source_path at dest_path: copied, hard linked or reflinked depending on link_mode,
+    falling back to a plain copy when the link can't be made.
+    The copy keeps the source's mtime but not its permission bits.
+    Returns the link mode that was actually used.
+    """
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"Unknown link mode: {link_mode}")
+    if source_stat is None:
+        source_stat = os.stat(source_path)
+    dest_parent = os.path.dirname(dest_path)
+    if dest_parent:
+        os.makedirs(dest_parent, exist_ok=True)
+    # never write into an existing destination: if it's a hard link to the source
+    # (e.g. from a build with --link-static=hardlink), that would change the source too
+    try:
+        os.remove(dest_path)
+    except FileNotFoundError:
+        pass
+
+    if link_mode == "hardlink":
+        try:
+            os.link(source_path, dest_path)
+            return "hardlink"
+        except OSError:
+            pass
+    elif link_mode == "reflink" and _reflink(source_path, dest_path):
+        os.utime(dest_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        return "reflink"
+
+    shutil.copyfile(source_path, dest_path)
+    os.utime(dest_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    return "copy"
+
+
+def sync_directory_contents(source_dir, dest_dir, records, use_hash=False, link_mode="copy", threads=COPY_THREADS):
+    """
+    Bring dest_dir up to date with source_dir without starting from scratch:
+    only new or changed files are copied, and only files that were synced before
+    but no longer exist in source_dir are removed. Anything else in dest_dir
+    (e.g. the generated html) is left alone.
+    records is a dict (kept in the build manifest between builds) of the files
+    synced so far, keyed by destination path; it is updated in place.
+    A file is unchanged if its copy has the same size and mtime (copies keep the
+    source's mtime); with use_hash, files whose mtime differs but whose content
+    is the same aren't copied either.
+    The files are checked and copied on a pool of threads; see LINK_MODES for link_mode.
+    Returns a dict counting the files that were "copied", "unchanged" and "removed".
+    """
+    if not os.path.exists(source_dir):
+        raise Exception("The source directory provided does not exist!")
+    os.makedirs(dest_dir, exist_ok=True)
+
+    files = list(_walk_files(source_dir, dest_dir))
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        copied = list(executor.map(
+            lambda paths: _traced_sync_file(paths[0], paths[1], records, use_hash, link_mode),
+            files
+        ))
+    # files synced by an earlier build whose source has since been deleted
+    removed = remove_stale_files(records, set(dest_path for source_path, dest_path in files), dest_dir)
+    return {"copied": copied.count(True), "unchanged": copied.count(False), "removed": removed}
+
+
+def sync_file(source_path, dest_path, records, use_hash=False, link_mode="copy"):
+    """
+    Copy source_path to dest_path unless dest_path is already an up to date copy,
+    and record it in records. Returns True if the file was copied.
+    """
+    dest_path = os.path.normpath(dest_path)
+    source_stat = os.stat(source_path)
+    record = records.get(dest_path)
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        dest_stat = None
+
+    source_hash = None
+    up_to_date = False
+    if dest_stat is not None and dest_stat.st_size == source_stat.st_size:
+        if dest_stat.st_mtime_ns == source_stat.st_mtime_ns:
+            up_to_date = True
+        elif use_hash:
+            source_hash = source_file_hash(source_path, source_stat, record)
+            up_to_date = hash_file(dest_path) == source_hash
+
+    if not up_to_date:
+        place_file(source_path, dest_path, link_mode, source_stat)
+    if use_hash and source_hash is None:
+        source_hash = source_file_hash(source_path, source_stat, record)
+    records[dest_path] = {
+        "source": source_path,
+        "size": source_stat.st_size,
+        "mtime_ns": source_stat.st_mtime_ns,
+        "hash": source_hash,
+    }
+    return not up_to_date
+
+
+def remove_stale_files(records, kept, dest_dir):
+    """
+    Remove the files in records under dest_dir that aren't in the set of destination paths kept.
+    Returns how many were removed.
+    """
+    removed = 0
+    abs_dest_dir = os.path.abspath(dest_dir)
+    for dest_path in list(records):
+        if dest_path in kept:
+            continue
+        if os.path.commonpath([os.path.abspath(dest_path), abs_dest_dir]) != abs_dest_dir:
+            continue
+        remove_synced_file(dest_path, records, dest_dir)
+        removed += 1
+    return removed
+
+
+def remove_synced_file(dest_path, records, dest_dir):
+    """
+    Remove a previously synced file (and the directories it leaves empty, up to dest_dir)
+    and forget about it.
+    """
+    dest_path = os.path.normpath(dest_path)
+    if os.path.isfile(dest_path):
+        os.remove(dest_path)
+    records.pop(dest_path, None)
+    parent = os.path.dirname(dest_path)
+    stop_dir = os.path.abspath(dest_dir)
+    while parent and os.path.abspath(parent) != stop_dir and os.path.isdir(parent) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+
+def source_file_hash(source_path, source_stat, record):
+    """
+    The sha256 of source_path; the hash in its record from the last build is reused
+    if the file's size and mtime didn't change since.
+    """
+    if (
+        record is not None
+        and record.get("hash") is not None
+        and record["size"] == source_stat.st_size
+        and record["mtime_ns"] == source_stat.st_mtime_ns
+    ):
+        return record["hash"]
+    return hash_file(source_path)
+
+
+def _walk_files(source_dir, dest_dir):
+    # (source path, destination path) of every file under source_dir
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        rel_dir = os.path.relpath(dir_path, source_dir)
+        for file_name in file_names:
+            yield os.path.join(dir_path, file_name), os.path.normpath(os.path.join(dest_dir, rel_dir, file_name))
+
+
+def _reflink(source_path, dest_path):
+    # clone source_path into a new dest_path; returns False if the filesystem can't do it
+    if fcntl is None:
+        return False
+    try:
+        with open(source_path, "rb") as source, open(dest_path, "wb") as dest:
+            fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(dest_path)
+        except FileNotFoundError:
+            pass
+        return False
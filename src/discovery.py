@@ -0,0 +1,141 @@
+import os
+import json
+import time
+from collections import namedtuple
+
+from template import LAYOUT_FILENAME
+
+"""
+Finding the pages in the content directory, in a single os.scandir traversal:
+scandir already knows whether an entry is a file or a directory, so every page costs
+one stat (kept with the page, see ContentPage) and nothing else is looked up twice.
+
+A DirectorySnapshot saves what every directory contained (its pages, subdirectories and
+whether it has a layout) along with the directory's mtime. Adding, removing or renaming
+an entry changes the mtime of the directory it is in, so the next build reuses the
+listing of every directory whose mtime is unchanged instead of reading it again.
+Editing a page doesn't change its directory's mtime, which is why the pages themselves
+are still stat'ed (the incremental build needs their size and mtime anyway).
+"""
+
+SNAPSHOT_PATH = "./.content_snapshot.json"
+
+# a directory modified this close to the scan could still change within the same mtime tick,
+# so it isn't saved in the snapshot (and is read again next time)
+RACY_SECONDS = 2
+
+# a page found in the content directory:
+#   path           the markdown file
+#   template_path  the template it is rendered with (the closest layout, see template.find_layout)
+#   rel_path       path relative to the content directory
+#   stat           os.stat of the markdown file
+ContentPage = namedtuple("ContentPage", ["path", "template_path", "rel_path", "stat"])
+
+
+class DirectorySnapshot():
+    """
+    The listings of the content directories, keyed by their path relative to the content directory:
+        mtime_ns  mtime of the directory when it was listed
+        pages     names of its markdown files
+        dirs      names of its subdirectories
+        layout    whether it has a layout file
+    """
+    VERSION = 1
+
+    def __init__(self, path, root=None, dirs=None):
+        self.path = path
+        self.root = root
+        self.dirs = dirs if dirs is not None else {}
+        # directories listed from the snapshot, and read again
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path, root):
+        """ the snapshot of the content directory root saved at path (a missing or outdated one is empty) """
+        root = os.path.abspath(root)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return cls(path, root)
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION or data.get("root") != root:
+            return cls(path, root)
+        return cls(path, root, data.get("dirs", {}))
+
+    def get(self, rel_dir, mtime_ns):
+        """ the saved listing of rel_dir if its mtime is still mtime_ns, else None """
+        listing = self.dirs.get(rel_dir)
+        if listing is None or listing["mtime_ns"] != mtime_ns:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return listing
+
+    def save(self):
+        # write to a temporary file first so an interrupted build can't leave a half-written snapshot
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.VERSION, "root": self.root, "dirs": self.dirs}, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def discover_pages(dir_path_content, template_path, snapshot=None):
+    """
+    Return a ContentPage for every markdown file in dir_path_content and its subdirectories.
+    A directory with a layout file renders its pages (and those of its subdirectories) with it,
+    the others inherit template_path. If a DirectorySnapshot is given, the directories that
+    didn't change since it was saved aren't read again, and it is updated for the next build.
+    """
+    return list(iter_content_pages(dir_path_content, template_path, snapshot))
+
+
+def iter_content_pages(dir_path_content, template_path, snapshot=None):
+    """ discover_pages, yielding the pages one at a time (the snapshot is updated at the end) """
+    if not os.path.isdir(dir_path_content):
+        raise ValueError(f"Not a content directory: {dir_path_content}")
+    # the listings made now, which replace the snapshot's (so deleted directories are dropped)
+    listings = {}
+    racy_ns = time.time_ns() - RACY_SECONDS * 1_000_000_000
+    yield from _iter_dir(dir_path_content, "", os.path.abspath(template_path), snapshot, listings, racy_ns)
+    if snapshot is not None:
+        snapshot.dirs = listings
+
+
+def _iter_dir(dir_path, rel_dir, template_path, snapshot, listings, racy_ns):
+    mtime_ns = os.stat(dir_path).st_mtime_ns
+    listing = snapshot.get(rel_dir, mtime_ns) if snapshot is not None else None
+    stats = None
+    if listing is None:
+        listing, stats = _list_dir(dir_path, mtime_ns)
+    if mtime_ns < racy_ns:
+        listings[rel_dir] = listing
+
+    # a section may override the template with its own layout
+    if listing["layout"]:
+        template_path = os.path.join(os.path.abspath(dir_path), LAYOUT_FILENAME)
+
+    for name in listing["pages"]:
+        path = os.path.join(dir_path, name)
+        # scandir's stat when the directory was just read
+        stat = stats[name] if stats is not None else os.stat(path)
+        yield ContentPage(path, template_path, os.path.join(rel_dir, name), stat)
+    for name in listing["dirs"]:
+        yield from _iter_dir(os.path.join(dir_path, name), os.path.join(rel_dir, name), template_path, snapshot, listings, racy_ns)
+
+
+def _list_dir(dir_path, mtime_ns):
+    # (listing, {page name: stat}) of the directory
+    listing = {"mtime_ns": mtime_ns, "pages": [], "dirs": [], "layout": False}
+    stats = {}
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                if os.path.splitext(entry.name)[1] == ".md":
+                    listing["pages"].append(entry.name)
+                    stats[entry.name] = entry.stat()
+                elif entry.name == LAYOUT_FILENAME:
+                    listing["layout"] = True
+            elif entry.is_dir():
+                listing["dirs"].append(entry.name)
+    return listing, stats
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+"""
+Shared by the tests that build (part of) a site in a temporary directory.
+"""
+
+
+class TempDirTestCase(unittest.TestCase):
+    """ a test case with a fresh temporary directory, self.dir, for every test """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def write(self, name, text, newline=None):
+        """ write text to name (relative to self.dir), creating its directories; returns the path """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", newline=newline) as f:
+            f.write(text)
+        return path
+
+    def bump_mtime(self, path):
+        """
+        Move the mtime of path a second ahead, for the tests that rewrite a file with the
+        same size: on filesystems with coarse mtimes it could otherwise look unchanged.
+        """
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def read_tree(self, root):
+        """ {path relative to root: bytes} of every file under root """
+        files = {}
+        for dir_path, dir_names, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
@@ -1,110 +1,730 @@
 from markdown_to_html import (
     markdown_to_html_node, 
+    iter_markdown_html,
+    iter_blocks_html,
     extract_title,
+    extract_title_from_lines,
 )
+from markdown_blocks import scan_block_lines
+from largefile import MappedMarkdown, is_large_file, LARGE_FILE_THRESHOLD
 from htmlnode import HTMLNode
+from template import compile_template
+from discovery import iter_content_pages
+from manifest import hash_text, hash_file, hash_context
+from urls import UrlResolver, MARKER_RESOLVER, URL_MARKER, split_marked_urls, patch_marked_urls
+from profiling import Profiler, stage, timed_iter, time_page, get_profiler, set_profiler
+from pipeline import Pipeline, PipelineStage, PIPELINE_QUEUE_SIZE, READER_THREADS, WRITER_THREADS
+from render_cache import BlockCache
+from concurrent.futures import ProcessPoolExecutor
 import os
+import time
+import hashlib
+import threading
 
 
-def generate_page(from_path, template_path, dest_path, basepath="/"):
-    # print(f"Generating page from {from_path} to {dest_path} using {template_path}...")
+def _render_tree(markdown, resolver=None, cache=None):
+    # the tree is always built in full; the block cache only applies to the direct renderer
+    with stage("serialize"):
+        node = markdown_to_html_node(markdown, resolver)
+    return timed_iter("serialize", node.iter_html())
 
-    # Read the markdown file at from_path and store the contents in a variable.
-    from_path_file = open(from_path)
-    from_path_contents = from_path_file.read()
-    from_path_file.close()
 
-    # Read the template file at template_path and store the contents in a variable.
-    template_path_file = open(template_path)
-    template_path_contents = template_path_file.read()
-    template_path_file.close()
+# the ways to turn a page's markdown into html chunks; both give the same html
+#   "direct": straight from the parsed blocks and inline tokens (markdown_to_html.iter_markdown_html)
+#   "tree":   through the TextNode and HTMLNode trees (markdown_to_html_node)
+RENDERERS = {
+    "direct": iter_markdown_html,
+    "tree": _render_tree,
+}
 
-    from_path_contents_as_html = markdown_to_html_node(from_path_contents).to_html()
-    from_path_contents_title = extract_title(from_path_contents)
-    
-    # Replace the {{ Title }} and {{ Content }} placeholders 
+
+def render_page(markdown, template, basepath="/", context=None, renderer="direct", assets=None, resolver=None, cache=None):
+    """
+    Render the markdown text into a full html page using the (compiled) template
+    and return it as a string.
+    Besides {{ Title }} and {{ Content }}, any other template slot is filled
+    from the optional context dict (e.g. { "SiteName": "Tolkien Fan Club" }).
+    renderer picks how the markdown is turned into html (see RENDERERS).
+    assets is an optional asset map from assets.fingerprint_directory; urls of
+    the assets in it are replaced by their fingerprinted urls.
+    Instead of basepath and assets, an already made urls.UrlResolver can be passed.
+    cache is an optional render_cache.BlockCache of already rendered blocks.
+    """
+    return "".join(iter_render_page(markdown, template, basepath, context, renderer, assets, resolver, cache))
+
+
+def iter_render_page(markdown, template, basepath="/", context=None, renderer="direct", assets=None, resolver=None, cache=None):
+    """
+    Like render_page, but yields the page in chunks so it can be written out
+    without ever holding the whole html page in memory.
+    """
+    # the urls are resolved (basepath, fingerprinted assets) where they are created:
+    # on the link and image props while rendering, and in the template's own html
+    if resolver is None:
+        resolver = UrlResolver(normalize_basepath(basepath), assets)
+    from_path_contents_as_html = RENDERERS[renderer](markdown, resolver, cache)
+    with stage("block parse"):
+        from_path_contents_title = extract_title(markdown)
+    return _fill_template(template, resolver, from_path_contents_title, from_path_contents_as_html, context)
+
+
+def iter_render_large_page(from_path, template, resolver, context=None):
+    """
+    iter_render_page for the markdown file at from_path, read through a memory map (see largefile.py):
+    the file is scanned block by block and every block's html is yielded as soon as it is rendered,
+    so neither the markdown nor the html is ever in memory as a whole.
+    Always uses the "direct" renderer, and no block cache (which would keep every block until it is flushed).
+    """
+    with MappedMarkdown(from_path) as markdown:
+        with stage("block parse"):
+            title = extract_title_from_lines(markdown.iter_lines())
+        content = iter_blocks_html(scan_block_lines(markdown.iter_lines()), resolver)
+        # the map has to stay open until the page has been written
+        yield from _fill_template(template, resolver, title, content, context)
+
+
+def _fill_template(template, resolver, title, content, context):
+    # Fill the {{ Title }} and {{ Content }} slots (plus any extra ones)
     # in the template with the HTML and title you generated.
-    final_html_with_title = from_path_contents_title.join(
-        template_path_contents.split("{{ Title }}", 1)
-    )
-    final_html_with_title_and_content = from_path_contents_as_html.join(
-        final_html_with_title.split("{{ Content }}", 1)
-    )
-    
-    # update any href URLs to account for basepath
-    html_with_updated_href = final_html_with_title_and_content.replace('href="/', f'href="{basepath}')
-    # update any src URLs to account for basepath
-    html_with_updated_src = html_with_updated_href.replace('src="/', f'src="{basepath}')
+    page_context = dict(context) if context else {}
+    page_context["Title"] = title
+    page_context["Content"] = content
+
+    with stage("url rewrite"):
+        template = template.resolve_urls(resolver)
+    return timed_iter("template fill", template.iter_render(page_context))
 
-    return_html = html_with_updated_src
 
-    with open(dest_path, "w") as f:
-        f.write(return_html)
+def write_page(chunks, dest_path):
+    """ stream the html chunks into dest_path """
+    with stage("write"), open(dest_path, "w") as f:
+        f.writelines(chunks)
     
     if not f.closed:
         raise Exception("dest_path file did not close successfully!")
 
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath="/", dest_file_ext=".html"):
+def write_page_if_changed(chunks, dest_path):
     """
-    Crawl every entry in the content directory.
-    For each markdown file found, generate a new .html file using the same template.html. 
-    The generated pages should be written to the public directory in the 
-    same directory structure.
+    Stream the html chunks into a temporary file next to dest_path while hashing them,
+    and only replace dest_path if the content differs (so an unchanged page keeps its mtime).
+    Returns a tuple: (sha256 of the html, whether dest_path was written)
     """
-    
-    # pre-process basepath to always begin and end with "/", e.g. "/path/"
+    tmp_path = dest_path + ".tmp"
+    digest = hashlib.sha256()
+    with stage("write"):
+        with open(tmp_path, "w") as f:
+            for chunk in chunks:
+                digest.update(chunk.encode())
+                f.write(chunk)
+        output_hash = digest.hexdigest()
+
+        if os.path.isfile(dest_path) and hash_file(dest_path) == output_hash:
+            os.remove(tmp_path)
+            return output_hash, False
+        os.replace(tmp_path, dest_path)
+    return output_hash, True
+
+
+def render_page_outputs(markdown, template, resolvers, context=None, renderer="direct", cache=None):
+    """
+    Render the page once for several UrlResolvers (e.g. the same site under different basepaths)
+    and return one iterable of html chunks per resolver, in the same order.
+    The markdown is parsed and rendered a single time with its urls marked,
+    and each output only fills in its own urls (see urls.MarkerResolver).
+    """
+    if len(resolvers) == 1 or URL_MARKER in markdown:
+        # nothing to share, or a page the markers can't be used on
+        return [
+            iter_render_page(markdown, template, context=context, renderer=renderer, resolver=resolver, cache=cache)
+            for resolver in resolvers
+        ]
+    html = "".join(iter_render_page(markdown, template, context=context, renderer=renderer, resolver=MARKER_RESOLVER, cache=cache))
+    parts = split_marked_urls(html)
+    return [timed_iter("url rewrite", patch_marked_urls(parts, resolver)) for resolver in resolvers]
+
+
+def generate_page(from_path, template_path, dest_path, basepath="/", context=None, manifest=None, renderer="direct", assets=None, resolver=None, cache=None):
+    """
+    Render the markdown file at from_path into dest_path using the template at template_path.
+    If a BuildManifest is given, the page is only re-rendered when its markdown,
+    template, basepath or context changed since the last build, and dest_path
+    is only rewritten when the generated html actually differs.
+    assets is an optional asset map; basepath and assets can also be given as a resolver (see render_page).
+    Returns True if dest_path was written.
+    """
+    if resolver is None:
+        resolver = UrlResolver(normalize_basepath(basepath), assets)
+    return generate_page_outputs(from_path, template_path, [(resolver, dest_path)], context, manifest, renderer, cache)[0]
+
+
+def generate_page_outputs(from_path, template_path, outputs, context=None, manifest=None, renderer="direct", cache=None, source_stat=None, large_file_threshold=LARGE_FILE_THRESHOLD):
+    """
+    Like generate_page, but writes the page to several outputs from a single render.
+    outputs is a list of (UrlResolver, dest_path) tuples.
+    source_stat is the os.stat of from_path if it is already known (see discovery.ContentPage).
+    Markdown files of at least large_file_threshold bytes are rendered with generate_large_page_outputs
+    (None never does).
+    Returns a list with whether each dest_path was written.
+    """
+    # The template is compiled once and cached (see template.py),
+    # so this only re-reads template_path when it has been modified.
+    template = compile_template(template_path)
+
+    records = [manifest.get_page(dest_path) for resolver, dest_path in outputs] if manifest is not None else None
+    if is_large_file(from_path, large_file_threshold, source_stat):
+        results = generate_large_page_outputs(from_path, template, outputs, context, records, source_stat)
+    elif manifest is not None:
+        results = build_page_incremental(from_path, template, outputs, context, records, renderer, cache, source_stat)
+    else:
+        # Read the markdown file at from_path and store the contents in a variable.
+        with stage("read"):
+            from_path_file = open(from_path)
+            from_path_contents = from_path_file.read()
+            from_path_file.close()
+
+        # the page is rendered straight into dest_path
+        resolvers = [resolver for resolver, dest_path in outputs]
+        pages = render_page_outputs(from_path_contents, template, resolvers, context, renderer, cache)
+        for (resolver, dest_path), chunks in zip(outputs, pages):
+            write_page(chunks, dest_path)
+        return [True] * len(outputs)
+
+    if manifest is not None:
+        for (resolver, dest_path), (record, written) in zip(outputs, results):
+            manifest.set_page(dest_path, record)
+    return [written for record, written in results]
+
+
+def generate_large_page_outputs(from_path, template, outputs, context=None, records=None, source_stat=None):
+    """
+    generate_page_outputs for a markdown file too big to read into memory: every output is
+    rendered from a memory map of the file and streamed into its dest_path (see iter_render_large_page),
+    so the memory used doesn't depend on the size of the file.
+    records are the outputs' manifest records for an incremental build (see build_page_incremental), or None.
+    Returns a list with a tuple for every output: (its new manifest record or None, whether dest_path was written)
+    """
+    if records is None:
+        for resolver, dest_path in outputs:
+            write_page(iter_render_large_page(from_path, template, resolver, context), dest_path)
+        return [(None, True)] * len(outputs)
+
+    # the file is hashed (not read) if it changed
+    check = check_page_outputs(from_path, template, outputs, context, records, source_stat, read_markdown=False)
+    for i in check.stale:
+        resolver, dest_path = outputs[i]
+        output_hash, written = write_page_if_changed(iter_render_large_page(from_path, template, resolver, context), dest_path)
+        check.results[i] = (page_record(check, template, resolver, dest_path, output_hash), written)
+    return check.results
+
+
+def build_page_incremental(from_path, template, outputs, context, records, renderer="direct", cache=None, source_stat=None):
+    """
+    The incremental part of generate_page_outputs, without touching the manifest itself
+    (so it can also run in a worker process).
+    outputs is a list of (UrlResolver, dest_path) tuples, and records has each output's
+    manifest record from the previous build (or None).
+    Returns a list with a tuple for every output: (its new manifest record, whether dest_path was written)
+    """
+    check = check_page_outputs(from_path, template, outputs, context, records, source_stat)
+    if not check.stale:
+        return check.results
+
+    markdown = check.markdown
+    if markdown is None:
+        with stage("read"), open(from_path) as f:
+            markdown = f.read()
+    pages = render_page_outputs(markdown, template, [outputs[i][0] for i in check.stale], context, renderer, cache)
+    for i, chunks in zip(check.stale, pages):
+        resolver, dest_path = outputs[i]
+        # leave the file (and its mtime) alone if the html came out the same
+        output_hash, written = write_page_if_changed(chunks, dest_path)
+        check.results[i] = (page_record(check, template, resolver, dest_path, output_hash), written)
+    return check.results
+
+
+class PageCheck():
+    """
+    What check_page_outputs found out about a page:
+        source_stat   os.stat of the markdown file
+        input_hash    sha256 of the markdown
+        context_hash  hash of the extra template values
+        markdown      the markdown, if it had to be read to hash it (else None)
+        results       (record, False) for every output that is up to date, None for the others
+        stale         the indexes of the outputs that need to be rendered
+    """
+    __slots__ = ("from_path", "source_stat", "input_hash", "context_hash", "markdown", "results", "stale")
+
+    def __init__(self, from_path, source_stat, input_hash, context_hash, markdown, results, stale):
+        self.from_path = from_path
+        self.source_stat = source_stat
+        self.input_hash = input_hash
+        self.context_hash = context_hash
+        self.markdown = markdown
+        self.results = results
+        self.stale = stale
+
+
+def check_page_outputs(from_path, template, outputs, context, records, source_stat=None, read_markdown=True):
+    """
+    Find out which outputs of a page an incremental build has to render again,
+    by comparing the page's inputs and outputs with their manifest records (see build_page_incremental).
+    With read_markdown=False a changed markdown file is hashed in chunks instead of being read
+    (for large files, see generate_large_page_outputs).
+    Returns a PageCheck.
+    """
+    if source_stat is None:
+        source_stat = os.stat(from_path)
+    context_hash = hash_context(context)
+
+    # an unchanged size and mtime means the markdown doesn't need to be read to know its hash
+    markdown = None
+    for record in records:
+        if (
+            record is not None
+            and record["source"] == from_path
+            and record["input_size"] == source_stat.st_size
+            and record["input_mtime_ns"] == source_stat.st_mtime_ns
+        ):
+            input_hash = record["input_hash"]
+            break
+    else:
+        with stage("read"):
+            if read_markdown:
+                with open(from_path) as f:
+                    markdown = f.read()
+                input_hash = hash_text(markdown)
+            else:
+                input_hash = hash_file(from_path)
+
+    results = [None] * len(outputs)
+    stale = []
+    for i in range(len(outputs)):
+        resolver, dest_path = outputs[i]
+        record = records[i]
+        # the generated file must also still be the one this build wrote
+        try:
+            dest_stat = os.stat(dest_path)
+        except FileNotFoundError:
+            dest_stat = None
+
+        if (
+            record is not None
+            and dest_stat is not None
+            and record["input_hash"] == input_hash
+            and record["template_hash"] == template.digest
+            and record["basepath"] == resolver.basepath
+            and record["context_hash"] == context_hash
+            and record["assets_hash"] == resolver.assets_hash
+            and record["output_size"] == dest_stat.st_size
+            and record["output_mtime_ns"] == dest_stat.st_mtime_ns
+        ):
+            results[i] = (record, False)
+        else:
+            stale.append(i)
+    return PageCheck(from_path, source_stat, input_hash, context_hash, markdown, results, stale)
+
+
+def page_record(check, template, resolver, dest_path, output_hash):
+    """ the manifest record of an output of the page from check_page_outputs, just written to dest_path """
+    dest_stat = os.stat(dest_path)
+    return {
+        "source": check.from_path,
+        "input_hash": check.input_hash,
+        "input_size": check.source_stat.st_size,
+        "input_mtime_ns": check.source_stat.st_mtime_ns,
+        "template_hash": template.digest,
+        "template_dependencies": template.dependencies,
+        "basepath": resolver.basepath,
+        "context_hash": check.context_hash,
+        "assets_hash": resolver.assets_hash,
+        "output_hash": output_hash,
+        "output_size": dest_stat.st_size,
+        "output_mtime_ns": dest_stat.st_mtime_ns,
+    }
+
+
+class PageBuildError(Exception):
+    """
+    Raised by generate_pages_recursive when one or more pages failed to build.
+    errors is a list of (markdown source path, error message) tuples.
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        lines = [f"{len(errors)} page(s) failed to build:"]
+        for from_path, message in errors:
+            lines.append(f"  {from_path}: {message}")
+        super().__init__("\n".join(lines))
+
+
+def normalize_basepath(basepath):
+    """ pre-process basepath to always begin and end with "/", e.g. "/path/" """
     if len(basepath) < 1:
         raise ValueError("basepath must be a string of at least length 1!")
     if basepath != "/" and basepath[-1] != "/":
         basepath += "/"
     if basepath != "/" and basepath[0] != "/":
         basepath = "/" + basepath
+    return basepath
+
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath="/", dest_file_ext=".html", context=None, manifest=None, jobs=1, renderer="direct", assets=None, cache=None, pipeline=False, snapshot=None, large_file_threshold=LARGE_FILE_THRESHOLD):
+    """
+    Crawl every entry in the content directory.
+    For each markdown file found, generate a new .html file using the same template.html. 
+    The generated pages should be written to the public directory in the 
+    same directory structure.
+    A directory containing a _layout.html file uses that as the template for
+    its pages (and its subdirectories) instead of template_path.
+    Passing a BuildManifest makes this an incremental build (see generate_page).
+    renderer picks how the markdown is turned into html (see RENDERERS).
+    assets is an optional asset map, cache an optional block cache (see render_page).
+    With jobs > 1 the pages are rendered on a pool of that many processes
+    (jobs=0 uses one per CPU core); the output is the same as with jobs=1.
+    With pipeline=True, reading, rendering and writing pages overlap (see generate_pages_targets).
+    snapshot is an optional discovery.DirectorySnapshot, to skip reading the unchanged content directories.
+    Markdown files of at least large_file_threshold bytes are streamed from a memory map (see generate_large_page_outputs).
+    Every page is attempted; if any failed, a PageBuildError listing them is raised at the end.
+    """
+    return generate_pages_targets(
+        dir_path_content,
+        template_path,
+        [(basepath, dest_dir_path)],
+        dest_file_ext=dest_file_ext,
+        context=context,
+        manifest=manifest,
+        jobs=jobs,
+        renderer=renderer,
+        assets=assets,
+        cache=cache,
+        pipeline=pipeline,
+        snapshot=snapshot,
+        large_file_threshold=large_file_threshold
+    )
+
+
+def generate_pages_targets(dir_path_content, template_path, targets, dest_file_ext=".html", context=None, manifest=None, jobs=1, renderer="direct", assets=None, cache=None, pipeline=False, readers=READER_THREADS, writers=WRITER_THREADS, queue_size=PIPELINE_QUEUE_SIZE, snapshot=None, large_file_threshold=LARGE_FILE_THRESHOLD):
+    """
+    generate_pages_recursive for several targets at once: targets is a list of
+    (basepath, dest_dir_path) tuples, e.g. [("/", "./docs"), ("/site/", "./public")].
+    Every page is parsed and rendered once, and written to each target with its own urls.
+
+    With pipeline=True the pages go through a pipeline.Pipeline instead: the content directory
+    is walked while pages are read (on readers threads), rendered (in this process, or on
+    jobs processes) and written (on writers threads), with at most queue_size pages waiting
+    between two stages. The pipeline's report (see Pipeline.report) is returned; otherwise None.
+    """
+    # one resolver per target for the whole build, so the basepath and the asset map are only processed once
+    resolvers = [UrlResolver(normalize_basepath(basepath), assets) for basepath, dest_dir_path in targets]
 
     # check that dir_path_content exists and is a directory
     if not os.path.exists(dir_path_content):
         raise ValueError("Provided dir_path_content does not exist!")
     if not os.path.isdir(dir_path_content):
         raise ValueError("Provided dir_path_content is not a directory!")
-    
-    # print(f"Recursively generating pages from {dir_path_content} to {dest_dir_path} using {template_path}...")
-
-    # crawl every entry in the content directory
-    # print(f"Crawling all entries in {dir_path_content}...")
-    for entry in os.listdir(dir_path_content):
-        entry_path = os.path.join(dir_path_content, entry)
-        # print(f"processing entry {entry} at path {entry_path}")
-        if os.path.isfile(entry_path):
-            file_name, file_extension = os.path.splitext(entry)
-            if file_extension == ".md":
-                # print(f"{entry} is a markdown file. Running generate_page using template path {template_path}...")
-                generate_page(
-                    entry_path, 
-                    template_path, 
-                    os.path.join(dest_dir_path, file_name + dest_file_ext),
-                    basepath=basepath
-                )
-        if os.path.isdir(entry_path):
-            # print(f"{entry} is a directory. Recursively running generate_pages_recursive with dir_path_content: {dir_path_content}, template_path: {os.path.abspath(template_path)}, and dest_dir_path: {dest_dir_path}...")
-
-            # create the directory first if it doesn't exist
-            new_dest_dir_path = os.path.join(dest_dir_path, entry)
-            if not os.path.exists(new_dest_dir_path):
-                try:
-                    os.mkdir(new_dest_dir_path)
-                    # print(f"Directory '{new_dest_dir_path}' created successfully.")
-                except PermissionError:
-                    print(f"Permission denied: Unable to create '{new_dest_dir_path}'.")
-                except Exception as e:
-                    print(f"An error occurred: {e}")
-
-            generate_pages_recursive(
-                os.path.join(dir_path_content, entry),
-                os.path.abspath(template_path),
-                new_dest_dir_path,
-                basepath=basepath
-            )
-    
-    # print("COMPLETED running generate_pages_recursive.")
+
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if pipeline:
+        pages = _iter_target_pages(dir_path_content, template_path, targets, dest_file_ext, snapshot)
+        return _generate_pages_pipeline(pages, resolvers, context, manifest, jobs, renderer, cache, readers, writers, queue_size, large_file_threshold)
+
+    with stage("walk"):
+        pages = list(_iter_target_pages(dir_path_content, template_path, targets, dest_file_ext, snapshot))
+
+    if jobs > 1 and len(pages) > 1:
+        errors = _generate_pages_parallel(pages, resolvers, context, manifest, jobs, renderer, cache, large_file_threshold)
+    else:
+        errors = []
+        for from_path, page_template_path, dest_paths, source_stat in pages:
+            try:
+                with time_page(from_path):
+                    generate_page_outputs(from_path, page_template_path, list(zip(resolvers, dest_paths)), context=context, manifest=manifest, renderer=renderer, cache=cache, source_stat=source_stat, large_file_threshold=large_file_threshold)
+            except Exception as e:
+                errors.append((from_path, _describe_error(e)))
+
+    if errors:
+        raise PageBuildError(errors)
+
+
+def _iter_target_pages(dir_path_content, template_path, targets, dest_file_ext, snapshot=None):
+    # (markdown path, template path, [destination path in every target], os.stat of the markdown) for every page
+    made_dirs = set()
+    for page in iter_content_pages(dir_path_content, template_path, snapshot):
+        rel_dest_path = os.path.splitext(page.rel_path)[0] + dest_file_ext
+        dest_paths = [os.path.join(dest_dir_path, rel_dest_path) for basepath, dest_dir_path in targets]
+        for dest_path in dest_paths:
+            dest_dir_path = os.path.dirname(dest_path)
+            if dest_dir_path not in made_dirs:
+                os.makedirs(dest_dir_path, exist_ok=True)
+                made_dirs.add(dest_dir_path)
+        yield page.path, page.template_path, dest_paths, page.stat
+
+
+def collect_pages(dir_path_content, template_path, dest_dir_path, dest_file_ext=".html"):
+    """
+    Walk the content directory and return a list of (markdown path, template path, destination path)
+    tuples, one for every page to generate. The destination directories are created along the way.
+    """
+    return list(iter_pages(dir_path_content, template_path, dest_dir_path, dest_file_ext))
+
+
+def iter_pages(dir_path_content, template_path, dest_dir_path, dest_file_ext=".html", snapshot=None):
+    """ collect_pages, yielding the pages one at a time while walking (see discovery.iter_content_pages) """
+    for from_path, page_template_path, dest_paths, source_stat in _iter_target_pages(dir_path_content, template_path, [(None, dest_dir_path)], dest_file_ext, snapshot):
+        yield from_path, page_template_path, dest_paths[0]
+
+
+# templates, the build's UrlResolvers (one per target) and block cache,
+# handed to each worker process once, when the pool starts
+_worker_templates = {}
+_worker_resolvers = []
+_worker_cache = None
+
+
+def _worker_pool(jobs, templates, resolvers, cache):
+    """ a pool of jobs worker processes, each set up with _init_worker """
+    profiler = get_profiler()
+    # the cache's path and size only: a worker opens a connection of its own, an sqlite
+    # connection mustn't be used on both sides of a fork (which is what the pool does on Linux)
+    cache_args = (cache.path, cache.max_bytes) if cache is not None else None
+    trace = None if profiler is None else profiler.events is not None
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(templates, resolvers, cache_args, trace))
+
+
+def _init_worker(templates, resolvers, cache_args, trace):
+    global _worker_cache
+    _worker_templates.update(templates)
+    _worker_resolvers.extend(resolvers)
+    # a read only connection of the worker's own (see render_cache.BlockCache)
+    _worker_cache = BlockCache(*cache_args, read_only=True) if cache_args is not None else None
+    # the worker's timings are sent back with every page and merged into the main process's profiler;
+    # trace is None when not profiling, otherwise whether the profiler records a trace
+    set_profiler(Profiler(trace) if trace is not None else None)
+
+
+def _generate_pages_parallel(pages, resolvers, context, manifest, jobs, renderer, cache, large_file_threshold):
+    # compile every template once in this process and share the result with the workers,
+    # instead of letting each worker read and compile them again
+    templates = {}
+    for from_path, template_path, dest_paths, source_stat in pages:
+        if template_path not in templates:
+            templates[template_path] = compile_template(template_path)
+
+    tasks = []
+    for from_path, template_path, dest_paths, source_stat in pages:
+        records = [manifest.get_page(dest_path) for dest_path in dest_paths] if manifest is not None else None
+        tasks.append((from_path, template_path, dest_paths, source_stat, context, records, renderer, large_file_threshold))
+
+    errors = []
+    profiler = get_profiler()
+    # hand out pages in batches to keep the inter-process overhead down
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    with _worker_pool(jobs, templates, resolvers, cache) as executor:
+        for from_path, dest_paths, records, cache_updates, profile_updates, error in executor.map(_generate_page_task, tasks, chunksize=chunksize):
+            if cache_updates is not None:
+                cache.merge_updates(cache_updates)
+            if profile_updates is not None:
+                profiler.merge_updates(profile_updates)
+            if error is not None:
+                errors.append((from_path, error))
+            elif manifest is not None:
+                for dest_path, record in zip(dest_paths, records):
+                    manifest.set_page(dest_path, record)
+    return errors
+
+
+def _generate_page_task(task):
+    # runs in a worker process; errors are returned (not raised) so one bad page doesn't stop the others
+    # records is None unless this is an incremental build
+    from_path, template_path, dest_paths, source_stat, context, records, renderer, large_file_threshold = task
+    outputs = list(zip(_worker_resolvers, dest_paths))
+    try:
+        with time_page(from_path):
+            template = _worker_templates[template_path]
+            if is_large_file(from_path, large_file_threshold, source_stat):
+                results = generate_large_page_outputs(from_path, template, outputs, context, records, source_stat)
+                records = [record for record, written in results] if records is not None else None
+            elif records is not None:
+                results = build_page_incremental(from_path, template, outputs, context, records, renderer, _worker_cache, source_stat)
+                records = [record for record, written in results]
+            else:
+                with stage("read"), open(from_path) as f:
+                    markdown = f.read()
+                pages = render_page_outputs(markdown, template, _worker_resolvers, context, renderer, _worker_cache)
+                for dest_path, chunks in zip(dest_paths, pages):
+                    write_page(chunks, dest_path)
+        error = None
+    except Exception as e:
+        records = None
+        error = _describe_error(e)
+    # the blocks this page rendered go back to the main process, which writes the cache
+    cache_updates = _worker_cache.take_updates() if _worker_cache is not None else None
+    profiler = get_profiler()
+    profile_updates = profiler.take_updates() if profiler is not None else None
+    return from_path, dest_paths, records, cache_updates, profile_updates, error
+
+
+class _PipelinePage():
+    # a page on its way through _generate_pages_pipeline
+    __slots__ = ("from_path", "template_path", "dest_paths", "source_stat", "template", "check", "markdown", "stale", "html", "seconds")
+
+    def __init__(self, from_path, template_path, dest_paths, source_stat=None):
+        self.from_path = from_path
+        self.template_path = template_path
+        self.dest_paths = dest_paths
+        self.source_stat = source_stat
+        self.template = None
+        # the PageCheck of an incremental build
+        self.check = None
+        self.markdown = None
+        # the indexes of the outputs to render, and their html
+        self.stale = None
+        self.html = None
+        # the time spent on the page in every stage, for the profiler
+        self.seconds = 0.0
+
+
+class PageRenderError(Exception):
+    """ a page failed to render in a worker process of a pipelined build (the message describes the original error) """
+
+
+def _generate_pages_pipeline(pages, resolvers, context, manifest, jobs, renderer, cache, readers, writers, queue_size, large_file_threshold):
+    # see generate_pages_targets; the manifest and the profiler are shared by the threads of every stage
+    lock = threading.Lock()
+    profiler = get_profiler()
+    errors = []
+
+    def read(page):
+        started = time.perf_counter()
+        page.template = compile_template(page.template_path)
+        if is_large_file(page.from_path, large_file_threshold, page.source_stat):
+            # streamed from the file straight into its outputs, without going through the queues
+            outputs = list(zip(resolvers, page.dest_paths))
+            with lock:
+                records = [manifest.get_page(dest_path) for dest_path in page.dest_paths] if manifest is not None else None
+            results = generate_large_page_outputs(page.from_path, page.template, outputs, context, records, page.source_stat)
+            if manifest is not None:
+                with lock:
+                    for dest_path, (record, written) in zip(page.dest_paths, results):
+                        manifest.set_page(dest_path, record)
+            _add_pipeline_page(profiler, page, started)
+            return None, page.source_stat.st_size if page.source_stat is not None else 0
+        if manifest is not None:
+            outputs = list(zip(resolvers, page.dest_paths))
+            with lock:
+                records = [manifest.get_page(dest_path) for dest_path in page.dest_paths]
+            page.check = check_page_outputs(page.from_path, page.template, outputs, context, records, page.source_stat)
+            page.stale = page.check.stale
+            if not page.stale:
+                with lock:
+                    for dest_path, (record, written) in zip(page.dest_paths, page.check.results):
+                        manifest.set_page(dest_path, record)
+                _add_pipeline_page(profiler, page, started)
+                return None, 0
+            page.markdown = page.check.markdown
+        else:
+            page.stale = list(range(len(resolvers)))
+        if page.markdown is None:
+            with stage("read"), open(page.from_path) as f:
+                page.markdown = f.read()
+        page.seconds += time.perf_counter() - started
+        return page, len(page.markdown)
+
+    def render_here(page):
+        started = time.perf_counter()
+        chunks = render_page_outputs(page.markdown, page.template, [resolvers[i] for i in page.stale], context, renderer, cache)
+        page.html = ["".join(output) for output in chunks]
+        page.markdown = None
+        page.seconds += time.perf_counter() - started
+        return page, len(page.html[0])
+
+    def render_in_worker(page):
+        started = time.perf_counter()
+        task = (page.template_path, page.markdown, page.stale, context, renderer)
+        html, cache_updates, profile_updates, error = executor.submit(_render_page_task, task).result()
+        with lock:
+            if cache_updates is not None:
+                cache.merge_updates(cache_updates)
+            if profile_updates is not None:
+                profiler.merge_updates(profile_updates)
+        if error is not None:
+            raise PageRenderError(error)
+        page.html = html
+        page.markdown = None
+        page.seconds += time.perf_counter() - started
+        return page, len(page.html[0])
+
+    def write(page):
+        started = time.perf_counter()
+        size = 0
+        for i, html in zip(page.stale, page.html):
+            resolver, dest_path = resolvers[i], page.dest_paths[i]
+            size += len(html)
+            if manifest is None:
+                write_page([html], dest_path)
+                continue
+            # leave the file (and its mtime) alone if the html came out the same
+            output_hash, written = write_page_if_changed([html], dest_path)
+            record = page_record(page.check, page.template, resolver, dest_path, output_hash)
+            with lock:
+                manifest.set_page(dest_path, record)
+        _add_pipeline_page(profiler, page, started)
+        return None, size
+
+    def on_error(page, e):
+        with lock:
+            errors.append((page.from_path, str(e) if isinstance(e, PageRenderError) else _describe_error(e)))
+
+    if jobs > 1:
+        # the render stage only hands the pages to the worker processes, one thread per worker
+        render_stage = PipelineStage("render", render_in_worker, jobs)
+        executor = _worker_pool(jobs, {}, resolvers, cache)
+        # start the workers now, before the pipeline's threads: forking a process with threads running can deadlock
+        executor.submit(int).result()
+    else:
+        # rendering is pure python, so more threads wouldn't render any faster
+        render_stage = PipelineStage("render", render_here)
+        executor = None
+
+    pipeline = Pipeline([
+        PipelineStage("read", read, readers),
+        render_stage,
+        PipelineStage("write", write, writers),
+    ], queue_size, on_error)
+    try:
+        pipeline.run(_PipelinePage(*page) for page in timed_iter("walk", pages))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if errors:
+        raise PageBuildError(errors)
+    return pipeline.report()
+
+
+def _add_pipeline_page(profiler, page, started):
+    if profiler is not None:
+        profiler.add_page(page.from_path, page.seconds + time.perf_counter() - started)
+
+
+def _render_page_task(task):
+    # runs in a worker process of a pipelined build: the html of the page's outputs with the given indexes
+    template_path, markdown, indexes, context, renderer = task
+    try:
+        # compiled once per worker (see template.compile_template)
+        template = compile_template(template_path)
+        pages = render_page_outputs(markdown, template, [_worker_resolvers[i] for i in indexes], context, renderer, _worker_cache)
+        html = ["".join(chunks) for chunks in pages]
+        error = None
+    except Exception as e:
+        html = None
+        error = _describe_error(e)
+    cache_updates = _worker_cache.take_updates() if _worker_cache is not None else None
+    profiler = get_profiler()
+    profile_updates = profiler.take_updates() if profiler is not None else None
+    return html, cache_updates, profile_updates, error
 
 
+def _describe_error(e):
+    return f"{type(e).__name__}: {e}"
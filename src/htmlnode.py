@@ -1,4 +1,13 @@
+from types import MappingProxyType
+
+# marks the end of a node's children in ParentNode.iter_html
+_NO_MORE_CHILDREN = object()
+
+
 class HTMLNode():
+    # no per-instance __dict__: a LeafNode is created for every inline span of every page
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -7,6 +16,17 @@ class HTMLNode():
     
     def to_html(self):
         raise NotImplementedError("to_html method not implemented")
+
+    def iter_html(self):
+        """
+        Yield the node's html in chunks instead of building one string.
+        "".join(node.iter_html()) == node.to_html()
+        """
+        yield self.to_html()
+
+    def write_html(self, fp):
+        """ stream the node's html into a writable text file object """
+        fp.writelines(self.iter_html())
     
     def props_to_html(self):
         if self.props is None:
@@ -21,6 +41,8 @@ class HTMLNode():
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
     
@@ -40,19 +62,62 @@ class LeafNode(HTMLNode):
         return f"LeafNode({self.tag}, {self.value}, {self.props})"
 
 
+class FrozenLeafNode(LeafNode):
+    """
+    An immutable LeafNode, e.g. for nodes that are shared between several trees.
+    Its props are a read only copy of the props it was made with.
+    """
+    __slots__ = ()
+
+    def __init__(self, tag, value, props=None):
+        object.__setattr__(self, "tag", tag)
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "children", None)
+        object.__setattr__(self, "props", MappingProxyType(dict(props)) if props is not None else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        props = dict(self.props) if self.props is not None else None
+        return f"LeafNode({self.tag}, {self.value}, {props})"
+
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
     
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def iter_html(self):
+        # walks the tree with an explicit stack instead of recursing into every child,
+        # so the output is never copied per level and deep trees can't hit the recursion limit
+        yield self.opening_tag()
+        stack = [(self, iter(self.children))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, _NO_MORE_CHILDREN)
+            if child is _NO_MORE_CHILDREN:
+                stack.pop()
+                yield f"</{node.tag}>"
+            elif isinstance(child, ParentNode):
+                yield child.opening_tag()
+                stack.append((child, iter(child.children)))
+            else:
+                yield from child.iter_html()
+
+    def opening_tag(self):
         if self.tag is None:
             raise ValueError("ParentNode instance must have a tag")
         if self.children is None:
             raise ValueError("ParentNode must have children")
-        children_html = ""
-        for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"        
+        return f"<{self.tag}{self.props_to_html()}>"
     
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
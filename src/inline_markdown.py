@@ -1,4 +1,5 @@
-from textnode import TextType, TextNode
+from textnode import TextType, TextNode, FrozenTextNode
+from functools import lru_cache
 import re
 
 """
@@ -8,63 +9,135 @@ This is an _italic and **bold** word_.
 For simplicity's sake, we won't allow it!
 """
 
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+# where an inline element can start: bold, italic, code, image or link
+INLINE_START_PATTERN = re.compile(r"\*\*|_|`|!\[|\[")
+# a link starting exactly at a given position (the tokenizer has already ruled out a preceding "!")
+_LINK_AT_PATTERN = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+INLINE_DELIMITERS = {
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+
+# how many distinct strings each memoized inline function remembers (least recently used go first)
+INLINE_CACHE_SIZE = 4096
+
 
 def text_to_textnodes(text):
     """
     Converts a raw string of markdown-flavored text into a list of TextNode objects.
     """
-    nodes = [TextNode(text, TextType.NORMAL)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    nodes = []
+    for text_type, node_text, url in iter_inline_tokens(text):
+        nodes.append(TextNode(node_text, text_type, url))
     return nodes
 
 
+@lru_cache(maxsize=INLINE_CACHE_SIZE)
+def cached_text_to_textnodes(text):
+    """
+    Like text_to_textnodes, but memoized: the same text gets the same tuple of
+    immutable FrozenTextNodes back, shared by every caller.
+    Nav labels, "Read more" links, footers etc. repeat across a whole site.
+    """
+    return tuple([FrozenTextNode(node_text, text_type, url) for text_type, node_text, url in iter_inline_tokens(text)])
+
+
+def iter_inline_tokens(text):
+    """
+    Scan the text once, left to right, and yield a (text_type, text, url) tuple
+    for every inline element (bold, italic, code, image, link) and every run of normal text in between.
+    Whatever element starts first wins, so e.g. a "_" inside a link's url or a "**" inside
+    a code span is left alone. Like split_nodes_delimiter, an unmatched delimiter raises an Exception,
+    and runs of three or more stars are read the same way it reads them (see _iter_bold).
+    """
+    normal_start = 0 # start of the normal text not yielded yet
+    search_start = 0
+    while True:
+        match = INLINE_START_PATTERN.search(text, search_start)
+        if match is None:
+            break
+        token = match.group()
+        start = match.start()
+
+        if token == "**":
+            if start > normal_start:
+                yield TextType.NORMAL, text[normal_start:start], None
+            normal_start = search_start = yield from _iter_bold(text, start)
+            continue
+
+        if token in INLINE_DELIMITERS:
+            end = text.find(token, match.end())
+            if end == -1:
+                raise Exception("Unmatched delimiter! Formatting issue with input text.")
+            if start > normal_start:
+                yield TextType.NORMAL, text[normal_start:start], None
+            if end > match.end(): # empty spans (e.g. "****") are dropped
+                yield INLINE_DELIMITERS[token], text[match.end():end], None
+            normal_start = search_start = end + len(token)
+            continue
+
+        if token == "![":
+            element = IMAGE_PATTERN.match(text, start)
+            text_type = TextType.IMAGE
+        else:
+            element = _LINK_AT_PATTERN.match(text, start)
+            text_type = TextType.LINK
+        if element is None:
+            # just a bracket, it stays part of the normal text
+            search_start = match.end()
+            continue
+        if start > normal_start:
+            yield TextType.NORMAL, text[normal_start:start], None
+        yield text_type, element.group(1), element.group(2)
+        normal_start = search_start = element.end()
+
+    if normal_start < len(text):
+        yield TextType.NORMAL, text[normal_start:], None
+
+
+def _iter_bold(text, start):
+    # yields the bold spans of the "**" run at start, returns where the normal text goes on.
+    # Like split_nodes_delimiter always did, a run of n stars counts as n - 1 (overlapping) "**",
+    # each one switching bold on or off: "***" leaves things as they were, "****" switches once
+    bold = False
+    while True:
+        run_end = start + 2
+        while run_end < len(text) and text[run_end] == "*":
+            run_end += 1
+        if (run_end - start) % 2 == 0:
+            bold = not bold
+        if not bold:
+            return run_end
+        start = text.find("**", run_end)
+        if start == -1:
+            raise Exception("Unmatched delimiter! Formatting issue with input text.")
+        if start > run_end:
+            yield TextType.BOLD, text[run_end:start], None
+
+
 def extract_markdown_images(text):
-    pattern = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    return re.findall(pattern, text)
+    return IMAGE_PATTERN.findall(text)
 
 
 def extract_markdown_links(text):
-    pattern = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)" 
-    return re.findall(pattern, text)
+    return LINK_PATTERN.findall(text)
 
 
 def split_nodes_image(old_nodes):
-    if not old_nodes: # if input list is empty, just return it
-        return old_nodes
-    
-    new_nodes = []
-    for node in old_nodes:
-        if node.text_type != TextType.NORMAL:
-            new_nodes.append(node)
-            continue
-        extracted_images = extract_markdown_images(node.text)
-        remaining_text = node.text
-        for image in extracted_images:
-            sections = remaining_text.split(f"![{image[0]}]({image[1]})", 1)
-            if sections[0]: # if there is text before the image, add it as a node
-                new_nodes.append(TextNode(
-                    sections[0],
-                    TextType.NORMAL
-                ))
-            new_nodes.append(TextNode(
-                image[0], # the alt text
-                TextType.IMAGE,
-                image[1] # the image url
-            ))
-            remaining_text = sections[1] # update to only include the text after this image, so the processing of next image starts from where we left off
-        if remaining_text: # this is only True if there is trailing text after the last image; if so, we want to add it as a node
-            new_nodes.append(TextNode(
-                remaining_text,
-                TextType.NORMAL
-            ))
-    return new_nodes 
+    return split_nodes_pattern(old_nodes, IMAGE_PATTERN, TextType.IMAGE)
 
 
 def split_nodes_link(old_nodes):
+    return split_nodes_pattern(old_nodes, LINK_PATTERN, TextType.LINK)
+
+
+def split_nodes_pattern(old_nodes, pattern, text_type):
+    # splits the NORMAL nodes on every match of an image or link pattern
+    # group 1 of the pattern is the alt/link text, group 2 the url
     if not old_nodes: # if input list is empty, just return it
         return old_nodes
     
@@ -73,28 +146,22 @@ def split_nodes_link(old_nodes):
         if node.text_type != TextType.NORMAL:
             new_nodes.append(node)
             continue
-        extracted_links = extract_markdown_links(node.text)
-        remaining_text = node.text
-        for link in extracted_links:
-            pattern = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
-            match = re.search(pattern, remaining_text) # returns first match only
-            if not match:
-                raise Exception("problem with split_nodes_link")
-            sections = remaining_text.split(match.group(0), 1)
-            if sections[0]: # if there is text before the link, add it as a node
+        remaining_start = 0 # where the text after the previous match starts
+        for match in pattern.finditer(node.text):
+            if match.start() > remaining_start: # if there is text before the match, add it as a node
                 new_nodes.append(TextNode(
-                    sections[0],
+                    node.text[remaining_start:match.start()],
                     TextType.NORMAL
                 ))
             new_nodes.append(TextNode(
-                link[0], # the link text
-                TextType.LINK,
-                link[1] # the link url
+                match.group(1), # the alt / link text
+                text_type,
+                match.group(2) # the url
             ))
-            remaining_text = sections[1] # update to only include the text after this link, so the processing of next link starts from where we left off
-        if remaining_text: # this is only True if there is trailing text after the last link; if so, we want to add it as a node
+            remaining_start = match.end()
+        if remaining_start < len(node.text): # trailing text after the last match
             new_nodes.append(TextNode(
-                remaining_text,
+                node.text[remaining_start:],
                 TextType.NORMAL
             ))
     return new_nodes 
@@ -210,9 +277,12 @@ def delim_index_builder(text, delimiter):
         raise Exception("delimiter must be a non-empty string")
     delimiter_length = len(delimiter)
     delimiter_indexes = []
-    for idx in range(len(text) - (delimiter_length - 1)):
-        if text[idx:idx+delimiter_length] == delimiter:
-            delimiter_indexes.append(
-                (idx, idx+delimiter_length - 1)
-            )
+    # str.find jumps straight to the next occurrence instead of slicing at every index
+    # (searching again from idx + 1 still finds overlapping occurrences, e.g. in "***")
+    idx = text.find(delimiter)
+    while idx != -1:
+        delimiter_indexes.append(
+            (idx, idx+delimiter_length - 1)
+        )
+        idx = text.find(delimiter, idx + 1)
     return delimiter_indexes
@@ -0,0 +1,83 @@
+import os
+import mmap
+import locale
+
+"""
+Reading very large markdown files without holding them in memory: the file is memory-mapped
+and its lines are decoded one at a time, so they can be fed to markdown_blocks.scan_block_lines
+and rendered block by block (see generate_page.generate_large_page_outputs). The pages of the
+mapping are only paged in by the OS as they are read, and can be dropped again afterwards.
+
+The lines come out exactly as open(path).read().split("\\n") would give them: decoded with
+the same (locale) encoding, and with "\\r\\n" and "\\r" line endings turned into "\\n".
+"""
+
+# markdown files at least this big (in bytes) are rendered from a memory map
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+
+
+def is_large_file(path, threshold=LARGE_FILE_THRESHOLD, source_stat=None):
+    """ whether the file at path is to be read as a large file (never if threshold is None) """
+    if threshold is None:
+        return False
+    if source_stat is None:
+        source_stat = os.stat(path)
+    return source_stat.st_size >= threshold
+
+
+class MappedMarkdown():
+    """
+    A markdown file opened as a memory map, to be used in a with statement:
+
+        with MappedMarkdown(path) as markdown:
+            for line in markdown.iter_lines():
+                ...
+
+    iter_lines() can be called any number of times, every call reads the file from its start.
+    """
+    def __init__(self, path, encoding=None):
+        self.path = path
+        # what open() decodes text files with
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.file = None
+        self.mapped = None
+
+    def __enter__(self):
+        self.file = open(self.path, "rb")
+        # an empty file can't be mapped (and has nothing to map)
+        if os.fstat(self.file.fileno()).st_size > 0:
+            self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+        self.file.close()
+
+    def iter_lines(self):
+        """ the lines of the file, without their line endings """
+        mapped = self.mapped
+        if mapped is None:
+            yield ""
+            return
+        start = 0
+        while True:
+            end = mapped.find(b"\n", start)
+            if end == -1:
+                # what is left after the last line ending is a line too (possibly empty)
+                yield from _split_carriage_returns(mapped[start:].decode(self.encoding), last=True)
+                return
+            yield from _split_carriage_returns(mapped[start:end].decode(self.encoding), last=False)
+            start = end + 1
+
+
+def _split_carriage_returns(line, last):
+    # the text between two "\n" can still hold old Mac line endings ("\r"),
+    # and a "\r" right before the "\n" is part of a "\r\n" line ending
+    if "\r" not in line:
+        yield line
+        return
+    if not last and line.endswith("\r"):
+        line = line[:-1]
+    yield from line.split("\r")
@@ -1,30 +1,328 @@
 import sys
-from copystatic import copy_directory_contents
-from generate_page import generate_pages_recursive
-
-basepath = sys.argv[1] if (len(sys.argv) > 1) else "/"
-
-print(f"basepath: {basepath}")
+import argparse
+from copystatic import copy_directory_contents, clean_directory, sync_directory_contents, LINK_MODES, COPY_THREADS
+from assets import fingerprint_directory, ASSET_MANIFEST_FILENAME
+from compress import compress_directory, GZIP_MIN_SIZE
+from generate_page import generate_pages_targets, PageBuildError, RENDERERS
+from manifest import BuildManifest
+from render_cache import open_block_cache, BLOCK_CACHE_PATH, BLOCK_CACHE_MAX_BYTES
+from profiling import Profiler, set_profiler, stage, format_report, write_report, write_trace, PROFILE_PATH, SLOWEST_PAGES, TRACE_PATH
+from memprofile import MemoryProfiler, format_memory_report, write_memory_report, MEMPROFILE_PATH
+from discovery import DirectorySnapshot, SNAPSHOT_PATH
+from largefile import LARGE_FILE_THRESHOLD
+from pipeline import format_pipeline_report, PIPELINE_QUEUE_SIZE, READER_THREADS, WRITER_THREADS
 
 dir_path_static = "./static"
 dir_path_public = "./docs"
 generate_pages_recursive_dir_path_content = "./content"
 generate_pages_recursive_template_path = "./template.html"
 generate_pages_recursive_dest_dir_path = "./docs"
+build_manifest_path = "./.build_manifest.json"
 
-def main():
-    print(f"Deleting {dir_path_public} directory...")
-    print(f"Copying static files to {dir_path_public} directory...")
-    # note that this function does the deleting AND the copying
-    copy_directory_contents(dir_path_static, dir_path_public)
 
-    print("Recursively generating all pages...")
-    generate_pages_recursive(
-        generate_pages_recursive_dir_path_content,
-        generate_pages_recursive_template_path,
-        generate_pages_recursive_dest_dir_path,
-        basepath=basepath
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate the static site from ./content into ./docs")
+    parser.add_argument("basepath", nargs="?", default="/", help='the site\'s base path, e.g. "8v2_static_site_generator" (default: "/")')
+    parser.add_argument(
+        "--target",
+        action="append",
+        type=parse_target,
+        metavar="BASEPATH:DEST",
+        help="build the site for this basepath into DEST instead of ./docs; can be given several times, "
+        "every page is then rendered once and written to each target",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="keep ./docs and only re-render pages whose markdown, template or basepath changed since the last build",
+    )
+    parser.add_argument(
+        "--sync-static",
+        action="store_true",
+        help="keep ./docs and only copy the static files that are new or changed (implied by --incremental)",
+    )
+    parser.add_argument(
+        "--hash-static",
+        action="store_true",
+        help="when syncing static files, compare the content of files whose mtime changed instead of copying them again",
+    )
+    parser.add_argument(
+        "--link-static",
+        choices=LINK_MODES,
+        default="copy",
+        help="place static files into ./docs as copies, hard links or reflinks (falls back to copying; default: copy)",
+    )
+    parser.add_argument(
+        "--static-threads",
+        type=int,
+        default=COPY_THREADS,
+        help=f"number of threads copying static files and compressing output files (default: {COPY_THREADS})",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help=f"give static files content-hashed names (e.g. index.3f2a9c1d.css) and point the pages at them; the mapping is written to {ASSET_MANIFEST_FILENAME}",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="write a .gz copy next to every generated html, css and other text file in ./docs",
+    )
+    parser.add_argument(
+        "--gzip-min-size",
+        type=int,
+        default=GZIP_MIN_SIZE,
+        help=f"don't compress files smaller than this many bytes (default: {GZIP_MIN_SIZE})",
+    )
+    parser.add_argument(
+        "--block-cache",
+        action="store_true",
+        help="keep the html of every rendered markdown block on disk, and only render blocks that aren't in it (direct renderer only)",
+    )
+    parser.add_argument("--block-cache-path", default=BLOCK_CACHE_PATH, help=f"the block cache database (default: {BLOCK_CACHE_PATH})")
+    parser.add_argument(
+        "--block-cache-size",
+        type=int,
+        default=BLOCK_CACHE_MAX_BYTES // (1024 * 1024),
+        help=f"trim the block cache to this many MB, least recently used blocks first (default: {BLOCK_CACHE_MAX_BYTES // (1024 * 1024)})",
+    )
+    parser.add_argument("--manifest", default=build_manifest_path, help=f"build manifest used by --incremental and --sync-static (default: {build_manifest_path})")
+    parser.add_argument(
+        "--content-snapshot",
+        default=SNAPSHOT_PATH,
+        help=f"where --incremental saves the listings of the content directories, to skip the unchanged ones next time (default: {SNAPSHOT_PATH})",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="render pages on this many processes (0: one per CPU core, default: 1)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="overlap walking content/, reading, rendering and writing pages, and report each stage's throughput",
+    )
+    parser.add_argument("--readers", type=int, default=READER_THREADS, help=f"threads reading pages with --pipeline (default: {READER_THREADS})")
+    parser.add_argument("--writers", type=int, default=WRITER_THREADS, help=f"threads writing pages with --pipeline (default: {WRITER_THREADS})")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=PIPELINE_QUEUE_SIZE,
+        help=f"pages waiting between two --pipeline stages at most (default: {PIPELINE_QUEUE_SIZE})",
+    )
+    parser.add_argument(
+        "--large-file-threshold",
+        type=int,
+        default=LARGE_FILE_THRESHOLD // (1024 * 1024),
+        help="stream markdown files of at least this many MB from a memory map, block by block, "
+        f"so they are never in memory as a whole (0: never, default: {LARGE_FILE_THRESHOLD // (1024 * 1024)})",
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=sorted(RENDERERS),
+        default="direct",
+        help='"direct" renders markdown straight to html, "tree" builds the HTMLNode tree first (same output; default: direct)',
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every stage of the build and every page, print a summary and write it as json to --profile-output",
+    )
+    parser.add_argument("--profile-output", default=PROFILE_PATH, help=f"where --profile writes its json report (default: {PROFILE_PATH})")
+    parser.add_argument(
+        "--profile-slowest",
+        type=int,
+        default=SLOWEST_PAGES,
+        help=f"number of slowest pages --profile lists (default: {SLOWEST_PAGES})",
     )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="record every stage, page and static file copy on a timeline and write it to --trace-output "
+        "as a Chrome trace (open it in chrome://tracing or ui.perfetto.dev)",
+    )
+    parser.add_argument("--trace-output", default=TRACE_PATH, help=f"where --trace writes its trace (default: {TRACE_PATH})")
+    parser.add_argument(
+        "--memprofile",
+        action="store_true",
+        help="trace memory allocations (tracemalloc) and report the peak memory and top call sites of every stage and "
+        "of the largest pages, and the peak RSS; written as json to --memprofile-output (implies --jobs 1 without --pipeline, and is slow)",
+    )
+    parser.add_argument("--memprofile-output", default=MEMPROFILE_PATH, help=f"where --memprofile writes its json report (default: {MEMPROFILE_PATH})")
+    args = parser.parse_args(argv)
+    if args.target and args.basepath != "/":
+        parser.error("give either a basepath or --target options, not both")
+    if args.block_cache and args.renderer != "direct":
+        # the tree renderer always builds the whole page, it has no blocks to look up
+        parser.error("--block-cache only works with --renderer direct")
+    return args
+
+
+def parse_target(value):
+    """ "BASEPATH:DEST" -> (basepath, dest_dir) """
+    basepath, sep, dest_dir = value.partition(":")
+    if not sep or not basepath or not dest_dir:
+        raise argparse.ArgumentTypeError(f'expected BASEPATH:DEST, e.g. "8v2_static_site_generator:./public", got "{value}"')
+    return basepath, dest_dir
+
+
+def copy_static(args, dest_dir, manifest):
+    """
+    Put the static files into dest_dir the way the arguments ask for.
+    Returns the asset map when fingerprinting, otherwise None.
+    """
+    if args.fingerprint:
+        if manifest is not None:
+            records = manifest.static
+        else:
+            records = {}
+            print(f"Deleting {dest_dir} directory...")
+            clean_directory(dest_dir)
+        print(f"Fingerprinting static files into {dest_dir} directory...")
+        return fingerprint_directory(
+            dir_path_static,
+            dest_dir,
+            records,
+            link_mode=args.link_static,
+            threads=args.static_threads
+        )
+    elif manifest is not None:
+        print(f"Syncing static files to {dest_dir} directory...")
+        stats = sync_directory_contents(
+            dir_path_static,
+            dest_dir,
+            manifest.static,
+            use_hash=args.hash_static,
+            link_mode=args.link_static,
+            threads=args.static_threads
+        )
+        print(f"Copied {stats['copied']}, unchanged {stats['unchanged']}, removed {stats['removed']} static files")
+    else:
+        print(f"Deleting {dest_dir} directory...")
+        print(f"Copying static files to {dest_dir} directory...")
+        # note that this function does the deleting AND the copying
+        copy_directory_contents(dir_path_static, dest_dir, link_mode=args.link_static, threads=args.static_threads)
+    return None
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.target:
+        targets = args.target
+    else:
+        targets = [(args.basepath, generate_pages_recursive_dest_dir_path)]
+
+    for basepath, dest_dir in targets:
+        print(f"basepath: {basepath} -> {dest_dir}")
+
+    profiler = None
+    if args.memprofile:
+        if args.jobs != 1:
+            # tracemalloc only sees this process
+            print("--memprofile builds on a single process, ignoring --jobs")
+            args.jobs = 1
+        if args.pipeline:
+            # the stages would all be measured at once
+            print("--memprofile builds one page at a time, ignoring --pipeline")
+            args.pipeline = False
+        profiler = MemoryProfiler(trace=args.trace)
+        set_profiler(profiler)
+    elif args.profile or args.trace:
+        profiler = Profiler(trace=args.trace)
+        set_profiler(profiler)
+
+    if args.incremental or args.sync_static:
+        manifest = BuildManifest.load(args.manifest)
+    else:
+        manifest = None
+    snapshot = DirectorySnapshot.load(args.content_snapshot, generate_pages_recursive_dir_path_content) if args.incremental else None
+
+    # the static files are the same in every target, and so is the asset map
+    assets = None
+    for basepath, dest_dir in targets:
+        with stage("static copy"):
+            assets = copy_static(args, dest_dir, manifest)
+
+    cache = None
+    if args.block_cache:
+        cache = open_block_cache(args.block_cache_path, args.block_cache_size * 1024 * 1024)
+
+    print("Recursively generating all pages...")
+    build_errors = None
+    try:
+        pipeline_report = generate_pages_targets(
+            generate_pages_recursive_dir_path_content,
+            generate_pages_recursive_template_path,
+            targets,
+            manifest=manifest if args.incremental else None,
+            jobs=args.jobs,
+            renderer=args.renderer,
+            assets=assets,
+            cache=cache,
+            pipeline=args.pipeline,
+            readers=args.readers,
+            writers=args.writers,
+            queue_size=args.queue_size,
+            snapshot=snapshot,
+            large_file_threshold=args.large_file_threshold * 1024 * 1024 if args.large_file_threshold > 0 else None
+        )
+    except PageBuildError as e:
+        build_errors = e
+    else:
+        if pipeline_report is not None:
+            print(format_pipeline_report(pipeline_report))
+
+    if cache is not None:
+        print(f"Block cache: {cache.hits} hits, {cache.misses} misses ({cache.hit_ratio():.1%} hit ratio)")
+        cache.close()
+
+    if args.incremental:
+        # remove the pages whose markdown file no longer exists
+        # (skipped when pages failed, as those would look deleted too)
+        if build_errors is None:
+            for basepath, dest_dir in targets:
+                for removed_path in manifest.prune_pages(dest_dir):
+                    print(f"Removed stale page {removed_path}")
+
+    if args.gzip:
+        for basepath, dest_dir in targets:
+            print(f"Compressing text files in {dest_dir} directory...")
+            with stage("gzip"):
+                stats = compress_directory(
+                    dest_dir,
+                    manifest.compressed if manifest is not None else {},
+                    min_size=args.gzip_min_size,
+                    threads=args.static_threads
+                )
+            print(f"Compressed {stats['compressed']}, unchanged {stats['unchanged']}, removed {stats['removed']} .gz files")
+
+    if manifest is not None:
+        manifest.save()
+    if snapshot is not None:
+        snapshot.save()
+
+    if profiler is not None:
+        set_profiler(None)
+        if args.profile:
+            report = profiler.report(args.profile_slowest)
+            print(format_report(report))
+            write_report(report, args.profile_output)
+            print(f"Profile written to {args.profile_output}")
+        if args.trace:
+            write_trace(profiler, args.trace_output)
+            print(f"Trace written to {args.trace_output}")
+        if args.memprofile:
+            report = profiler.report(args.profile_slowest)
+            profiler.stop()
+            print(format_memory_report(report))
+            write_memory_report(report, args.memprofile_output)
+            print(f"Memory profile written to {args.memprofile_output}")
+
+    if build_errors is not None:
+        print(build_errors)
+        sys.exit(1)
 
 
-main() 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_context(context):
+    """ hash of the extra template values, so a changed value invalidates the page """
+    if not context:
+        return None
+    return hash_text(json.dumps(context, sort_keys=True))
+
+
+class BuildManifest():
+    """
+    Records what every generated page was built from, so an incremental build
+    only needs to re-render the pages whose inputs changed.
+
+    Each page is keyed by its destination path and stores:
+        source          the markdown file it was generated from
+        input_hash      sha256 of the markdown text
+        input_size      size and mtime of the markdown file, so unchanged files
+        input_mtime_ns  don't even need to be read and hashed
+        template_hash   digest of the (expanded) template it was rendered with
+        template_dependencies  the template files (and partials) behind template_hash
+        basepath        the basepath it was rendered with
+        context_hash    hash of any extra template values
+        assets_hash     hash of the fingerprinted asset urls it links to (see assets.py)
+        output_hash     sha256 of the generated html
+        output_size     size and mtime of the generated file, to notice when
+        output_mtime_ns it was modified or deleted outside of the build
+    """
+    VERSION = 3
+
+    def __init__(self, path, pages=None, static=None, compressed=None):
+        self.path = path
+        self.pages = pages if pages is not None else {}
+        # the files copied from static/ by copystatic.sync_directory_contents, keyed by destination path
+        self.static = static if static is not None else {}
+        # the files compress.compress_directory wrote a .gz copy of, keyed by path
+        self.compressed = compressed if compressed is not None else {}
+        # destination paths touched during the current build, see prune_pages()
+        self.seen = set()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load the manifest at path.
+        A missing, unreadable or outdated manifest just means a full build.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return cls(path)
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION:
+            return cls(path)
+        return cls(path, data.get("pages", {}), data.get("static", {}), data.get("compressed", {}))
+
+    def save(self):
+        # write to a temporary file first so an interrupted build can't leave a half-written manifest
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"version": self.VERSION, "pages": self.pages, "static": self.static, "compressed": self.compressed},
+                f,
+                indent=1,
+                sort_keys=True
+            )
+        os.replace(tmp_path, self.path)
+
+    def start_build(self):
+        """ forget which pages were built so far, e.g. before a new full build in watch mode """
+        self.seen = set()
+
+    def get_page(self, dest_path):
+        return self.pages.get(os.path.normpath(dest_path))
+
+    def set_page(self, dest_path, record):
+        key = os.path.normpath(dest_path)
+        self.pages[key] = record
+        self.seen.add(key)
+
+    def remove_page(self, dest_path):
+        self.pages.pop(os.path.normpath(dest_path), None)
+
+    def prune_pages(self, dest_dir_path):
+        """
+        Delete the generated pages under dest_dir_path that weren't built this time
+        (i.e. their markdown file was deleted or renamed), and forget about them.
+        Returns the list of removed paths.
+        """
+        dest_dir_path = os.path.abspath(dest_dir_path)
+        removed = []
+        for key in list(self.pages):
+            if key in self.seen:
+                continue
+            if os.path.commonpath([os.path.abspath(key), dest_dir_path]) != dest_dir_path:
+                continue
+            if os.path.isfile(key):
+                os.remove(key)
+            del self.pages[key]
+            removed.append(key)
+        return removed
@@ -1,4 +1,5 @@
 from enum import Enum
+from collections import namedtuple
 
 
 class BlockType(Enum):
@@ -10,10 +11,26 @@ class BlockType(Enum):
     ULIST = "unordered_list"
 
 
+# one block of a markdown document, as produced by scan_blocks
+#   block_type: the BlockType of the block
+#   text:       the block's markdown, stripped of surrounding whitespace
+#   lines:      the same text split into lines
+#   start_line: index of the block's first line in the document
+#   end_line:   index of the line after the block's last line
+Block = namedtuple("Block", ["block_type", "text", "lines", "start_line", "end_line"])
+
+CODE_FENCE = "```"
+
+
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
+
 
-    if block.startswith((
+def lines_to_block_type(lines):
+    """ block_to_block_type for a block that is already split into lines """
+    first_line = lines[0]
+
+    if first_line.startswith((
         "# ",
         "## ",
         "### ",
@@ -24,21 +41,21 @@ def block_to_block_type(block):
         return BlockType.HEADING
     if (
         len(lines) > 1 
-        and lines[0].startswith("```")
-        and lines[-1].startswith("```")
+        and lines[0].startswith(CODE_FENCE)
+        and lines[-1].startswith(CODE_FENCE)
     ):
         return BlockType.CODE
-    if block.startswith(">"):
+    if first_line.startswith(">"):
         for line in lines:
             if not line.startswith(">"):
                 return BlockType.PARAGRAPH
         return BlockType.QUOTE
-    if block.startswith("- "):
+    if first_line.startswith("- "):
         for line in lines:
             if not line.startswith("- "):
                 return BlockType.PARAGRAPH
         return BlockType.ULIST
-    if block.startswith("1. "):
+    if first_line.startswith("1. "):
         current_number = 1
         for line in lines:
             if not line.startswith(f"{str(current_number) + ". "}"):
@@ -49,9 +66,66 @@ def block_to_block_type(block):
 
 
 def markdown_to_blocks(markdown):
-    pre_stripped_blocks = markdown.split("\n\n")
-    stripped_blocks = []
-    for pre_stripped_block in pre_stripped_blocks:
-        if pre_stripped_block != "":
-            stripped_blocks.append(pre_stripped_block.strip())
-    return stripped_blocks
+    return [block.text for block in scan_blocks(markdown)]
+
+
+def scan_blocks(markdown):
+    """
+    Split a markdown document into typed blocks in a single pass over its lines.
+    Blocks are separated by blank lines, except inside a fenced code block
+    (from a line starting with ``` up to the next line starting with ```),
+    which is kept whole even if it contains blank lines.
+    Yields a Block for every block, classified exactly once.
+    """
+    return scan_block_lines(markdown.split("\n"))
+
+
+def scan_block_lines(lines, start_line=0, fences=True):
+    """
+    scan_blocks for any iterable of lines (without their line endings),
+    so a document doesn't need to be held in memory as one string.
+    start_line is the line number of the first line, used for the Block offsets.
+    """
+    block_lines = []
+    block_start = start_line
+    in_fence = False
+    line_number = start_line - 1
+    for line_number, line in enumerate(lines, start_line):
+        if in_fence:
+            block_lines.append(line)
+            if line.lstrip().startswith(CODE_FENCE):
+                yield _make_block(block_lines, block_start, line_number + 1)
+                block_lines = []
+                in_fence = False
+            continue
+        if not line or line.isspace():
+            if block_lines:
+                yield _make_block(block_lines, block_start, line_number)
+                block_lines = []
+            continue
+        if not block_lines:
+            block_start = line_number
+            in_fence = fences and _opens_fence(line)
+        block_lines.append(line)
+
+    if in_fence:
+        # the fence was never closed, so there was no code block after all:
+        # split what was collected on blank lines like everything else
+        # (it can't contain another fence, as that line would have closed this one)
+        yield from scan_block_lines(block_lines, block_start, fences=False)
+    elif block_lines:
+        yield _make_block(block_lines, block_start, line_number + 1)
+
+
+def _opens_fence(line):
+    # like CommonMark: the ``` may be followed by an info string, but not by another backtick,
+    # so a paragraph starting with inline code ("```foo``` bar") doesn't open a code block
+    line = line.lstrip()
+    return line.startswith(CODE_FENCE) and "`" not in line.lstrip("`")
+
+
+def _make_block(lines, start_line, end_line):
+    # strip the whitespace around the block, like str.strip() on the whole block would
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return Block(lines_to_block_type(lines), "\n".join(lines), lines, start_line, end_line)
@@ -1,51 +1,52 @@
-from htmlnode import ParentNode
+from htmlnode import ParentNode, FrozenLeafNode
 from textnode import TextType, TextNode, text_node_to_html_node
-from markdown_blocks import markdown_to_blocks, block_to_block_type, BlockType
-from inline_markdown import text_to_textnodes
+from markdown_blocks import scan_blocks, block_to_block_type, BlockType
+from inline_markdown import cached_text_to_textnodes, iter_inline_tokens, INLINE_CACHE_SIZE
+from profiling import stage, timed_iter
+from functools import lru_cache
 import re
 
 
-def markdown_to_html_node(markdown):
+def markdown_to_html_node(markdown, resolver=None):
     """
     Converts a full markdown document into a single parent HTMLNode. 
     That one parent HTMLNode should (obviously) contain many child HTMLNode objects 
-    representing the nested elements."""
+    representing the nested elements.
+    An optional urls.UrlResolver resolves the link and image URLs."""
     
     # this list will hold all of the block HTMLNodes
     # this list will become the children for the master ParentNode
     block_html_node_list = []
 
-    # Split the markdown into block
-    blocks = markdown_to_blocks(markdown)
-
-    # Loop over each block
-    for block in blocks:
-        
-        # Determine the type of block
-        block_type = block_to_block_type(block)
+    # Split the markdown into typed blocks (each block is classified once, while scanning)
+    # and loop over them
+    for scanned_block in timed_iter("block parse", scan_blocks(markdown)):
+        block = scanned_block.text
+        block_type = scanned_block.block_type
+        html_tag = block_to_block_html_tags(block, block_type)
 
         # Based on the type of block, create a new HTMLNode with the proper data
         match block_type:
             case BlockType.PARAGRAPH:
-                children = text_to_children(block)
+                children = text_to_children(block, resolver)
                 parent = ParentNode(
-                    block_to_block_html_tags(block),
+                    html_tag,
                     children,
                     None
                 )
             case BlockType.HEADING:
                 # remove the heading prefix before processing for children
                 # e.g. "### Heading" -> "Heading"
-                children = text_to_children(strip_heading_prefix(block))
+                children = text_to_children(strip_heading_prefix(block), resolver)
                 parent = ParentNode(
-                    block_to_block_html_tags(block),
+                    html_tag,
                     children,
                     None
                 )
             case BlockType.CODE:
                 # remove the first and last lines of the code block
                 # to get the inner text
-                lines = block.split("\n")
+                lines = scanned_block.lines
                 cleaned_lines = lines[1:-1]
                 cleaned_text = "\n".join(cleaned_lines) + "\n"
                 # custom building of children to account for code block special case
@@ -59,14 +60,14 @@ def markdown_to_html_node(markdown):
             case BlockType.QUOTE:
                 # removing leading ">" on each line before processing quoted text
                 # note that any leading or trailing spaces are stripped in the processing
-                lines = block.split("\n")
+                lines = scanned_block.lines
                 cleaned_lines = []
                 for line in lines:
                     cleaned_lines.append(line[1:])
                 cleaned_text = "\n".join(cleaned_lines)
-                children = text_to_children(cleaned_text)
+                children = text_to_children(cleaned_text, resolver)
                 parent = ParentNode(
-                    block_to_block_html_tags(block),
+                    html_tag,
                     children,
                     None
                 )
@@ -79,12 +80,12 @@ def markdown_to_html_node(markdown):
                     children.append(
                         ParentNode(
                             "li",
-                            text_to_children(line),
+                            text_to_children(line, resolver),
                             None
                         )
                     )
                 parent = ParentNode(
-                    block_to_block_html_tags(block),
+                    html_tag,
                     children,
                     None
                 )
@@ -97,12 +98,12 @@ def markdown_to_html_node(markdown):
                     children.append(
                         ParentNode(
                             "li",
-                            text_to_children(line),
+                            text_to_children(line, resolver),
                             None
                         )
                     )
                 parent = ParentNode(
-                    block_to_block_html_tags(block),
+                    html_tag,
                     children,
                     None
                 )
@@ -131,11 +132,107 @@ def markdown_to_html_node(markdown):
     return ParentNode("div", block_html_node_list, None)
 
 
-def text_to_children(text):
+def markdown_to_html(markdown, resolver=None):
+    """
+    The fast path of markdown_to_html_node(markdown, resolver).to_html():
+    returns the same html, without building TextNode and HTMLNode trees in between.
+    """
+    return "".join(iter_markdown_html(markdown, resolver))
+
+
+def iter_markdown_html(markdown, resolver=None, cache=None):
+    """
+    Render a markdown document straight from the scanned blocks and inline tokens,
+    yielding the html of one block at a time.
+    With a render_cache.BlockCache, blocks rendered before are looked up instead.
+    """
+    return iter_blocks_html(scan_blocks(markdown), resolver, cache)
+
+
+def iter_blocks_html(blocks, resolver=None, cache=None):
+    """ iter_markdown_html for already scanned blocks (e.g. from markdown_blocks.scan_block_lines) """
+    yield "<div>"
+    for block in timed_iter("block parse", blocks):
+        with stage("serialize"):
+            if cache is not None:
+                html = cache.render_block(block, resolver, block_to_html)
+            else:
+                html = block_to_html(block, resolver)
+        yield html
+    yield "</div>"
+
+
+def block_to_html(block, resolver=None):
+    """ the html of one Block from scan_blocks, the same as its node from markdown_to_html_node """
+    match block.block_type:
+        case BlockType.PARAGRAPH:
+            return f"<p>{text_to_html(block.text, resolver)}</p>"
+        case BlockType.HEADING:
+            html_tag = block_to_block_html_tags(block.text, block.block_type)
+            return f"<{html_tag}>{text_to_html(strip_heading_prefix(block.text), resolver)}</{html_tag}>"
+        case BlockType.CODE:
+            # no inline processing inside code blocks
+            code = "\n".join(block.lines[1:-1]) + "\n"
+            return f"<pre><code>{code}</code></pre>"
+        case BlockType.QUOTE:
+            quoted_text = "\n".join([line[1:] for line in block.lines])
+            return f"<blockquote>{text_to_html(quoted_text, resolver)}</blockquote>"
+        case BlockType.OLIST:
+            items = strip_prefixes_from_ordered_list_md(block.text).split("\n")
+            return "<ol>" + "".join([f"<li>{text_to_html(item, resolver)}</li>" for item in items]) + "</ol>"
+        case BlockType.ULIST:
+            items = strip_prefixes_from_unordered_list_md(block.text).split("\n")
+            return "<ul>" + "".join([f"<li>{text_to_html(item, resolver)}</li>" for item in items]) + "</ul>"
+        case _:
+            raise Exception("problem parsing markdown")
+
+
+def text_to_html(text, resolver=None):
+    """
+    The html of the inline markdown in text, the same as
+    joining the to_html() of every node from text_to_children(text).
+    Memoized (see inline_cache_info), so repeated text is only rendered once.
+    """
+    return _cached_text_to_html(text, resolver)
+
+
+@lru_cache(maxsize=INLINE_CACHE_SIZE)
+def _cached_text_to_html(text, resolver):
+    # replace newlines with spaces in the text before processing, like text_to_children
+    cleaned_text = " ".join([line.strip() for line in text.split("\n")])
+    html = []
+    for text_type, value, url in timed_iter("inline parse", iter_inline_tokens(cleaned_text)):
+        match text_type:
+            case TextType.NORMAL:
+                html.append(value)
+            case TextType.BOLD:
+                html.append(f"<b>{value}</b>")
+            case TextType.ITALIC:
+                html.append(f"<i>{value}</i>")
+            case TextType.CODE:
+                html.append(f"<code>{value}</code>")
+            case TextType.LINK:
+                if resolver is not None:
+                    url = resolver.resolve(url)
+                html.append(f'<a href="{url}">{value}</a>')
+            case TextType.IMAGE:
+                if resolver is not None:
+                    url = resolver.resolve(url)
+                html.append(f'<img src="{url}" alt="{value}" />')
+    return "".join(html)
+
+
+def text_to_children(text, resolver=None):
     # takes in a block, which is a string of markdown
     # returns a list of HTMLNodes that represent the inline markdown
     # using previous created functions
     # (think TextNode -> HTMLNode)
+    # the nodes are immutable and shared by every call with the same text (see inline_cache_info)
+    return list(_cached_text_to_children(text, resolver))
+
+
+@lru_cache(maxsize=INLINE_CACHE_SIZE)
+def _cached_text_to_children(text, resolver):
     children = []
     # replace newlines with spaces in the text before processing
     lines = text.split("\n")
@@ -143,16 +240,35 @@ def text_to_children(text):
     for line in lines:
         cleaned_lines.append(line.strip())
     cleaned_text = " ".join(cleaned_lines)
-    text_nodes = text_to_textnodes(cleaned_text)
+    with stage("inline parse"):
+        text_nodes = cached_text_to_textnodes(cleaned_text)
     for text_node in text_nodes:
-        children.append(text_node_to_html_node(text_node))
-    return children
+        node = text_node_to_html_node(text_node, resolver)
+        children.append(FrozenLeafNode(node.tag, node.value, node.props))
+    return tuple(children)
+
+
+def inline_cache_info():
+    """ hits, misses and size of the memoized inline functions, by name """
+    return {
+        "text_to_textnodes": cached_text_to_textnodes.cache_info(),
+        "text_to_children": _cached_text_to_children.cache_info(),
+        "text_to_html": _cached_text_to_html.cache_info(),
+    }
+
+
+def clear_inline_caches():
+    cached_text_to_textnodes.cache_clear()
+    _cached_text_to_children.cache_clear()
+    _cached_text_to_html.cache_clear()
 
 
-def block_to_block_html_tags(block):
+def block_to_block_html_tags(block, block_type=None):
     """ takes in a block, which is a string of markdown, returns a string holding the opening html tag (as a string) required for that block """
     
-    block_type = block_to_block_type(block)
+    # the block type only needs to be worked out here if the caller doesn't already know it
+    if block_type is None:
+        block_type = block_to_block_type(block)
 
     match block_type:
         case BlockType.PARAGRAPH:
@@ -190,7 +306,12 @@ def extract_title(markdown):
     If there is no h1 header, raise an exception.
     extract_title("# Hello") should return "Hello" (strip the # and any leading or trailing whitespace)
     """
-    for line in markdown.split("\n"):
+    return extract_title_from_lines(markdown.split("\n"))
+
+
+def extract_title_from_lines(lines):
+    """ extract_title for any iterable of lines, which is only read up to the title """
+    for line in lines:
         if line.startswith("# "):
             return strip_heading_prefix(line).strip()
     raise Exception("Markdown file does not contain an h1 header!")
@@ -0,0 +1,254 @@
+import sys
+import json
+import heapq
+import itertools
+import tracemalloc
+
+import profiling
+from profiling import Profiler, percentile, SLOWEST_PAGES
+
+try:
+    import resource
+except ImportError: # not on Windows
+    resource = None
+
+"""
+Memory profiling of a build with tracemalloc: how much memory each stage and each page
+allocated on top of what was already there when it started (its peak growth), what
+allocated it (the top call sites) and the process's peak RSS.
+
+MemoryProfiler is a profiling.Profiler, so it is driven by the same stage() and time_page()
+marks in the code. When a stage or page starts, the traced memory at that point is its
+starting level; at every point where a stage starts or ends, the peak since the previous
+point is read (and reset), and the peak minus the starting level is given to the stage that
+was running and to the page being built. When that growth is a new high for the stage or
+page (by SNAPSHOT_STEP), a tracemalloc snapshot is taken, and comparing it with the snapshot
+taken when the stage or page started gives the call sites of the memory it added, not the
+allocations that already lived through the whole build (the page list, the inline caches).
+
+Every page starts with a snapshot. Stages are entered far too often for that (inline parsing
+once per block), so a stage running inside a page is compared with the page's starting
+snapshot: its call sites are those of everything the page had added by then, and are reported
+as "page_call_sites". Only the stages outside of pages (static copy, walk, gzip) take a snapshot
+of their own, and have "call_sites" of just the stage.
+
+tracemalloc only sees the process it runs in, so a memory profiled build runs on one process.
+"""
+
+MEMPROFILE_PATH = "./build_memprofile.json"
+
+# call sites listed per stage and per page
+TOP_CALL_SITES = 10
+
+# a new snapshot is taken once the traced memory is this much above the previous snapshot's
+SNAPSHOT_STEP = 1.1
+
+# pages whose memory growth is more than this many times the median page's are flagged
+DOMINANT_PAGE_FACTOR = 4
+
+# tracemalloc's own allocations, the profilers' (e.g. the trace events) and the import machinery
+# aren't interesting (left out of the call sites; filtering the snapshots themselves is far too slow)
+IGNORED_FILES = {
+    tracemalloc.__file__,
+    profiling.__file__,
+    __file__,
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    "<unknown>",
+}
+
+
+class MemoryProfiler(Profiler):
+    def __init__(self, trace=False, top=TOP_CALL_SITES, frames=1):
+        super().__init__(trace)
+        self.top = top
+        # whether tracemalloc was started here (and so should be stopped by stop())
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(frames)
+        tracemalloc.reset_peak()
+        self.traced_peak = 0
+        # the stages entered and not yet left: (traced bytes at their start, snapshot to compare with)
+        self.levels = []
+        # stage name -> peak growth while it ran, and (growth, snapshot, starting snapshot) at its highest point
+        self.stage_growths = {}
+        self.stage_snapshots = {}
+        # the stages that ran inside a page, whose starting snapshot is the page's
+        self.page_stages = set()
+        # the page being built: [markdown path, traced bytes at its start, peak,
+        #                        (traced bytes, snapshot) or None, snapshot at its start]
+        self.page = None
+        # the growth of every page built
+        self.page_growths = []
+        # the top pages by growth: a heap of (growth, page number, markdown path, peak,
+        # (snapshot, starting snapshot) or None), the smallest growth first
+        self.largest_pages = []
+        self.page_numbers = itertools.count()
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot()
+
+    def sample(self):
+        """ hand the peak since the last sample to the running stage and page """
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self.traced_peak = max(self.traced_peak, peak)
+        if self.levels:
+            name = self.stack[-1][0]
+            start, start_snapshot = self.levels[-1]
+            growth = peak - start
+            self.stage_growths[name] = max(self.stage_growths.get(name, 0), growth)
+            snapshot_growth = self.stage_snapshots.get(name, (0, None, None))[0]
+            if current - start > snapshot_growth * SNAPSHOT_STEP:
+                self.stage_snapshots[name] = (current - start, self.take_snapshot(), start_snapshot)
+        if self.page is not None:
+            self.page[2] = max(self.page[2], peak)
+            snapshot_level = self.page[3][0] if self.page[3] is not None else self.page[1]
+            if current > snapshot_level * SNAPSHOT_STEP and self.could_be_largest(current - self.page[1]):
+                self.page[3] = (current, self.take_snapshot())
+        return current
+
+    def could_be_largest(self, growth):
+        """ whether a page that grew this much would be among the top pages (whose snapshots are kept) """
+        return len(self.largest_pages) < self.top or growth > self.largest_pages[0][0]
+
+    def enter(self, name):
+        current = self.sample()
+        # see the module docstring: only the stages outside of pages take their own starting snapshot
+        if self.page is not None:
+            start_snapshot = self.page[4]
+            self.page_stages.add(name)
+        else:
+            start_snapshot = self.take_snapshot()
+        super().enter(name)
+        self.levels.append((current, start_snapshot))
+
+    def exit(self):
+        self.sample()
+        super().exit()
+        self.levels.pop()
+
+    def start_page(self, from_path):
+        current = self.sample()
+        self.page = [from_path, current, current, None, self.take_snapshot()]
+
+    def add_page(self, from_path, seconds):
+        self.sample()
+        page_path, start, peak, snapshot_point, start_snapshot = self.page
+        self.page = None
+        snapshots = (snapshot_point[1], start_snapshot) if snapshot_point is not None else None
+        growth = peak - start
+        self.page_growths.append(growth)
+        # only the top pages are kept, along with their snapshots
+        entry = (growth, next(self.page_numbers), from_path, peak, snapshots)
+        if len(self.largest_pages) < self.top:
+            heapq.heappush(self.largest_pages, entry)
+        elif growth > self.largest_pages[0][0]:
+            heapq.heapreplace(self.largest_pages, entry)
+        super().add_page(from_path, seconds)
+
+    def call_sites(self, snapshot, start_snapshot):
+        """ the top call sites of the memory held in snapshot that wasn't in start_snapshot """
+        sites = []
+        for stat in snapshot.compare_to(start_snapshot, "lineno"):
+            if len(sites) == self.top or stat.size_diff <= 0:
+                break
+            frame = stat.traceback[0]
+            if frame.filename in IGNORED_FILES:
+                continue
+            sites.append({"site": f"{frame.filename}:{frame.lineno}", "bytes": stat.size_diff, "count": stat.count_diff})
+        return sites
+
+    def stage_memory(self, name):
+        """ the report of a stage: its growth, and call sites of its own or of its page's (see the module docstring) """
+        sites = self.call_sites(*self.stage_snapshots[name][1:]) if name in self.stage_snapshots else []
+        key = "page_call_sites" if name in self.page_stages else "call_sites"
+        return {"growth_bytes": self.stage_growths[name], key: sites}
+
+    def stop(self):
+        if self.started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self, slowest=SLOWEST_PAGES):
+        """ Profiler.report(), with the memory measurements under "memory" """
+        report = super().report(slowest)
+        if tracemalloc.is_tracing():
+            self.traced_peak = max(self.traced_peak, tracemalloc.get_traced_memory()[1])
+
+        growths = sorted(self.page_growths)
+        median_growth = percentile(growths, 50)
+        largest_pages = []
+        # the largest growth first, and of equal ones the page built first
+        for growth, page_number, from_path, peak, snapshots in sorted(self.largest_pages, key=lambda entry: (-entry[0], entry[1])):
+            largest_pages.append({
+                "source": from_path,
+                "peak_bytes": peak,
+                "growth_bytes": growth,
+                "dominant": median_growth > 0 and growth > median_growth * DOMINANT_PAGE_FACTOR,
+                "call_sites": self.call_sites(*snapshots) if snapshots is not None else [],
+            })
+
+        report["memory"] = {
+            "traced_peak_bytes": self.traced_peak,
+            "max_rss_bytes": max_rss_bytes(),
+            "stages": {
+                name: self.stage_memory(name)
+                for name in report["stages"] if name in self.stage_growths
+            },
+            "pages": {
+                "count": len(growths),
+                "p50_growth_bytes": median_growth,
+                "p95_growth_bytes": percentile(growths, 95),
+                "max_growth_bytes": growths[-1] if growths else 0,
+            },
+            "largest_pages": largest_pages,
+            "dominant_pages": [page["source"] for page in largest_pages if page["dominant"]],
+        }
+        return report
+
+
+def max_rss_bytes():
+    """ the peak resident set size of this process (None where the resource module is missing) """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def format_memory_report(report):
+    """ the "memory" part of MemoryProfiler.report() as readable text """
+    memory = report["memory"]
+    lines = [f"Memory profile (traced peak {_mib(memory['traced_peak_bytes'])}"]
+    if memory["max_rss_bytes"] is not None:
+        lines[0] += f", peak RSS {_mib(memory['max_rss_bytes'])}"
+    lines[0] += ")"
+    lines.append("  stage           peak growth  top call site (of the page, for the stages run inside pages)")
+    for name, stage in memory["stages"].items():
+        sites = stage.get("call_sites", stage.get("page_call_sites"))
+        top_site = sites[0]["site"] if sites else ""
+        if sites and "page_call_sites" in stage:
+            top_site += " (page)"
+        lines.append(f"  {name:<15} {_mib(stage['growth_bytes']):>11}  {top_site}")
+    pages = memory["pages"]
+    lines.append(
+        f"  {pages['count']} pages grew memory by: p50 {_mib(pages['p50_growth_bytes'])}, "
+        f"p95 {_mib(pages['p95_growth_bytes'])}, max {_mib(pages['max_growth_bytes'])}"
+    )
+    if memory["largest_pages"]:
+        lines.append("  largest pages:")
+        for page in memory["largest_pages"]:
+            flag = "  !! dominates memory" if page["dominant"] else ""
+            lines.append(f"    {_mib(page['growth_bytes']):>11}  {page['source']}{flag}")
+            for site in page["call_sites"][:3]:
+                lines.append(f"        {_mib(site['bytes']):>11}  {site['site']}")
+    return "\n".join(lines)
+
+
+def _mib(size):
+    return f"{size / (1024 * 1024):.2f} MiB"
+
+
+def write_memory_report(report, path=MEMPROFILE_PATH):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
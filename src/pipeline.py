@@ -0,0 +1,162 @@
+import time
+import queue
+import threading
+
+"""
+A pipeline of stages connected by bounded queues, each stage run by its own threads:
+a source (e.g. walking content/) feeds the first stage, and every stage hands what it made
+to the next one. Reading, rendering and writing pages then overlap, instead of the CPU
+waiting for the disk and the other way around, and since no queue holds more than
+queue_size items, the memory used doesn't grow with the size of the site.
+
+Every stage counts the items and bytes it handled and the time its threads were busy,
+so the report shows which stage holds the others up (see Pipeline.report).
+"""
+
+PIPELINE_QUEUE_SIZE = 16
+READER_THREADS = 4
+WRITER_THREADS = 4
+
+# put into a stage's queue once for each of its threads when there is nothing more to come
+_DONE = object()
+
+
+class PipelineStage():
+    """
+    One stage of a Pipeline: handle(item) is called for every item and returns
+    (the item for the next stage or None if there is nothing left to do with it, bytes handled).
+    """
+    def __init__(self, name, handle, threads=1):
+        if threads < 1:
+            raise ValueError(f"A pipeline stage needs at least one thread: {name}")
+        self.name = name
+        self.handle = handle
+        self.threads = threads
+        self.items = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+        # threads that haven't finished yet, see Pipeline._run_stage
+        self.running = threads
+
+    def add(self, size, seconds):
+        with self.lock:
+            self.items += 1
+            self.bytes += size
+            self.busy_seconds += seconds
+
+
+class Pipeline():
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE, on_error=None):
+        """
+        stages is a list of PipelineStage. on_error(item, exception) is called (from the stage's thread)
+        when handling an item raises; the item is then dropped and the pipeline goes on.
+        """
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self.source_stage = PipelineStage("walk", None)
+        self.wall_seconds = 0.0
+
+    def run(self, source):
+        """ feed every item of the iterable source through the stages, and wait until all are done """
+        queues = [queue.Queue(self.queue_size) for stage in self.stages]
+        source_errors = []
+        threads = [threading.Thread(target=self._run_source, args=(source, queues[0], source_errors), daemon=True)]
+        for i in range(len(self.stages)):
+            next_queue = queues[i + 1] if i + 1 < len(queues) else None
+            next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            for _ in range(self.stages[i].threads):
+                threads.append(threading.Thread(
+                    target=self._run_stage,
+                    args=(self.stages[i], queues[i], next_stage, next_queue),
+                    daemon=True
+                ))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_seconds += time.perf_counter() - start
+        if source_errors:
+            raise source_errors[0]
+
+    def _run_source(self, source, out_queue, errors):
+        stage = self.source_stage
+        try:
+            iterator = iter(source)
+            while True:
+                started = time.perf_counter()
+                item = next(iterator, _DONE)
+                if item is _DONE:
+                    break
+                stage.add(0, time.perf_counter() - started)
+                out_queue.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(self.stages[0].threads):
+                out_queue.put(_DONE)
+
+    def _run_stage(self, stage, in_queue, next_stage, out_queue):
+        try:
+            while True:
+                item = in_queue.get()
+                if item is _DONE:
+                    break
+                started = time.perf_counter()
+                try:
+                    result, size = stage.handle(item)
+                except Exception as e:
+                    result, size = None, 0
+                    if self.on_error is not None:
+                        self.on_error(item, e)
+                stage.add(size, time.perf_counter() - started)
+                if result is not None and out_queue is not None:
+                    out_queue.put(result)
+        finally:
+            # the last thread of the stage to finish tells the next stage there is nothing more to come
+            with stage.lock:
+                stage.running -= 1
+                last = stage.running == 0
+            if last and out_queue is not None:
+                for _ in range(next_stage.threads):
+                    out_queue.put(_DONE)
+
+    def report(self):
+        """
+        Per stage: its threads, the items and bytes it handled, the seconds its threads were busy,
+        its throughput (items and MB per second of a thread being busy, times the threads) and
+        its utilization (the share of the wall time its threads were busy).
+        The stage with the highest utilization is the bottleneck.
+        """
+        stages = []
+        for stage in [self.source_stage] + self.stages:
+            # the time the stage would need with all of its threads busy
+            capacity_seconds = stage.busy_seconds / stage.threads
+            stages.append({
+                "stage": stage.name,
+                "threads": stage.threads,
+                "items": stage.items,
+                "bytes": stage.bytes,
+                "busy_seconds": stage.busy_seconds,
+                "items_per_second": stage.items / capacity_seconds if capacity_seconds else 0.0,
+                "mb_per_second": stage.bytes / capacity_seconds / 1e6 if capacity_seconds else 0.0,
+                "utilization": capacity_seconds / self.wall_seconds if self.wall_seconds else 0.0,
+            })
+        bottleneck = max(stages, key=lambda stage: stage["utilization"])["stage"] if stages else None
+        return {"wall_seconds": self.wall_seconds, "stages": stages, "bottleneck": bottleneck}
+
+
+def format_pipeline_report(report):
+    lines = [f"Pipeline ({report['wall_seconds']:.3f}s, bottleneck: {report['bottleneck']})"]
+    lines.append(f"  {'stage':<8} {'threads':>7} {'items':>7} {'MB':>8} {'items/s':>9} {'MB/s':>8} {'busy':>6}")
+    for stage in report["stages"]:
+        lines.append(
+            f"  {stage['stage']:<8} {stage['threads']:>7} {stage['items']:>7} {stage['bytes'] / 1e6:>8.2f} "
+            f"{stage['items_per_second']:>9.1f} {stage['mb_per_second']:>8.2f} {stage['utilization']:>6.0%}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,328 @@
+import os
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+"""
+Timing of the stages of a build (static copy, directory walk, reading, block and inline
+parsing, serializing, template fill, url rewriting, writing), and of every page.
+
+The stages are marked in the code with stage(), timed_iter() and time_page(), which do nothing unless
+a Profiler was made the current one with set_profiler(). Stages nest, and the time of a stage
+doesn't include the stages inside it: since pages are rendered lazily (the html is produced
+while it's written), writing a page runs the template fill, which runs the block parsing, etc.,
+and each of them only counts its own time. The stage totals therefore add up to
+(at most) the time of the build.
+
+A Profiler made with trace=True also keeps every stage, page and span() as an event
+of a timeline, written by write_trace() in the Chrome trace event format
+(open it in chrome://tracing or https://ui.perfetto.dev).
+"""
+
+# the stages, in the order they are reported
+STAGES = (
+    "static copy",
+    "walk",
+    "read",
+    "block parse",
+    "inline parse",
+    "serialize",
+    "template fill",
+    "url rewrite",
+    "write",
+    "gzip",
+)
+
+PROFILE_PATH = "./build_profile.json"
+TRACE_PATH = "./build_trace.json"
+
+# how many of the slowest pages the report lists
+SLOWEST_PAGES = 10
+
+_NO_STAGE = nullcontext()
+
+# the Profiler stage() and timed_iter() report to, if any
+_profiler = None
+
+
+class Profiler():
+    def __init__(self, trace=False):
+        self.start_time = time.perf_counter()
+        # stage name -> seconds spent in it (not counting nested stages), and how many times it was entered
+        self.seconds = {}
+        self.calls = {}
+        # (markdown path, seconds) for every page built
+        self.pages = []
+        # every thread has its own stack of the stages it entered and didn't leave yet:
+        # [name, time the stage last started counting, time it was entered]
+        self.local = threading.local()
+        # the totals are updated by every thread building pages (see pipeline.py)
+        self.lock = threading.Lock()
+        # with trace=True, every stage, page and span as (name, category, start, seconds, pid, tid, args)
+        self.events = [] if trace else None
+
+    @property
+    def stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def enter(self, name):
+        now = time.perf_counter()
+        stack = self.stack
+        with self.lock:
+            if stack:
+                # the stage we're in stops counting while the nested one runs
+                parent = stack[-1]
+                self.seconds[parent[0]] = self.seconds.get(parent[0], 0.0) + now - parent[1]
+            self.calls[name] = self.calls.get(name, 0) + 1
+        stack.append([name, now, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        stack = self.stack
+        name, started, entered = stack.pop()
+        with self.lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + now - started
+        if stack:
+            stack[-1][1] = now
+        if self.events is not None:
+            self.add_event(name, "stage", entered, now - entered)
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def start_page(self, from_path):
+        # called when a page starts building; see memprofile.MemoryProfiler
+        pass
+
+    def add_page(self, from_path, seconds):
+        self.pages.append((from_path, seconds))
+        if self.events is not None:
+            self.add_event(from_path, "page", time.perf_counter() - seconds, seconds, {"source": from_path})
+
+    def add_event(self, name, category, start, seconds, args=None):
+        # list.append is atomic, so any thread can add events
+        self.events.append((name, category, start, seconds, os.getpid(), threading.get_native_id(), args))
+
+    def take_updates(self):
+        """
+        Return (and forget) what was measured since the last call, to be merged into
+        another Profiler with merge_updates(), e.g. from a worker process: (seconds, calls, pages, events)
+        """
+        with self.lock:
+            updates = (self.seconds, self.calls, self.pages, self.events)
+            self.seconds = {}
+            self.calls = {}
+            self.pages = []
+            if self.events is not None:
+                self.events = []
+        return updates
+
+    def merge_updates(self, updates):
+        seconds, calls, pages, events = updates
+        with self.lock:
+            for name in seconds:
+                self.seconds[name] = self.seconds.get(name, 0.0) + seconds[name]
+            for name in calls:
+                self.calls[name] = self.calls.get(name, 0) + calls[name]
+        self.pages.extend(pages)
+        if self.events is not None and events:
+            self.events.extend(events)
+
+    def trace(self):
+        """
+        The recorded events as a Chrome trace (what write_trace saves as json): one complete ("X")
+        event per stage, page and span, with times in microseconds since the profiler was made.
+        perf_counter is the system's monotonic clock, so the events of worker processes line up.
+        """
+        if self.events is None:
+            raise ValueError("This Profiler doesn't record a trace, make it with trace=True")
+        trace_events = []
+        main_pid = os.getpid()
+        pids = sorted(set(event[4] for event in self.events) | {main_pid})
+        for pid in pids:
+            process_name = "build" if pid == main_pid else f"worker {pid}"
+            trace_events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": process_name}})
+        for name, category, start, seconds, pid, tid, args in self.events:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self.start_time) * 1e6, 3),
+                "dur": round(seconds * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+            }
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def report(self, slowest=SLOWEST_PAGES):
+        """ the measurements as a dict (what write_report saves as json) """
+        stage_names = [name for name in STAGES if name in self.seconds]
+        stage_names += sorted(name for name in self.seconds if name not in STAGES)
+        page_seconds = sorted(seconds for from_path, seconds in self.pages)
+        slowest_pages = sorted(self.pages, key=lambda page: page[1], reverse=True)[:slowest]
+        return {
+            "total_seconds": time.perf_counter() - self.start_time,
+            "stages": {
+                name: {"seconds": self.seconds[name], "calls": self.calls.get(name, 0)}
+                for name in stage_names
+            },
+            "pages": {
+                "count": len(page_seconds),
+                "total_seconds": sum(page_seconds),
+                "p50_seconds": percentile(page_seconds, 50),
+                "p95_seconds": percentile(page_seconds, 95),
+                "max_seconds": page_seconds[-1] if page_seconds else 0.0,
+            },
+            "slowest_pages": [{"source": from_path, "seconds": seconds} for from_path, seconds in slowest_pages],
+        }
+
+
+class _Stage():
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.enter(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.exit()
+        return False
+
+
+def set_profiler(profiler):
+    """ make profiler (or None, to stop profiling) the one stage() and timed_iter() report to """
+    global _profiler
+    _profiler = profiler
+
+
+def get_profiler():
+    return _profiler
+
+
+def stage(name):
+    """ a context manager timing its block as the named stage (if profiling) """
+    if _profiler is None:
+        return _NO_STAGE
+    return _profiler.stage(name)
+
+
+def timed_iter(name, iterable):
+    """
+    Time the work of producing every item of a (lazy) iterable as the named stage.
+    Returns the iterable itself when not profiling.
+    """
+    if _profiler is None:
+        return iterable
+    return _timed_iter(_profiler, name, iterable)
+
+
+def _timed_iter(profiler, name, iterable):
+    iterator = iter(iterable)
+    while True:
+        profiler.enter(name)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            profiler.exit()
+        yield item
+
+
+def span(name, **args):
+    """
+    A context manager adding its block to the trace (if tracing) as an event of its own,
+    e.g. span("copy", source=path); unlike stage() it can be used from any thread, but isn't
+    part of the stage totals.
+    """
+    if _profiler is None or _profiler.events is None:
+        return _NO_STAGE
+    return _Span(_profiler, name, args)
+
+
+class _Span():
+    __slots__ = ("profiler", "name", "args", "started")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.add_event(self.name, "span", self.started, time.perf_counter() - self.started, self.args)
+        return False
+
+
+def time_page(from_path):
+    """ a context manager timing the build of the page made from the markdown at from_path (if profiling) """
+    if _profiler is None:
+        return _NO_STAGE
+    return _Page(_profiler, from_path)
+
+
+class _Page():
+    __slots__ = ("profiler", "from_path", "started")
+
+    def __init__(self, profiler, from_path):
+        self.profiler = profiler
+        self.from_path = from_path
+
+    def __enter__(self):
+        self.profiler.start_page(self.from_path)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.add_page(self.from_path, time.perf_counter() - self.started)
+        return False
+
+
+def percentile(sorted_values, percent):
+    """ the nearest-rank percentile of an already sorted list (0.0 for an empty one) """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def format_report(report):
+    """ the report from Profiler.report() as readable text """
+    lines = [f"Build profile ({report['total_seconds']:.3f}s total)"]
+    lines.append("  stage            seconds    calls")
+    for name, stats in report["stages"].items():
+        lines.append(f"  {name:<15} {stats['seconds']:>8.3f} {stats['calls']:>8}")
+    pages = report["pages"]
+    lines.append(
+        f"  {pages['count']} pages: p50 {pages['p50_seconds'] * 1000:.2f}ms, "
+        f"p95 {pages['p95_seconds'] * 1000:.2f}ms, max {pages['max_seconds'] * 1000:.2f}ms"
+    )
+    if report["slowest_pages"]:
+        lines.append("  slowest pages:")
+        for slow_page in report["slowest_pages"]:
+            lines.append(f"    {slow_page['seconds'] * 1000:>9.2f}ms  {slow_page['source']}")
+    return "\n".join(lines)
+
+
+def write_report(report, path=PROFILE_PATH):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def write_trace(profiler, path=TRACE_PATH):
+    with open(path, "w") as f:
+        json.dump(profiler.trace(), f)
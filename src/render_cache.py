@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import hashlib
+
+"""
+A persistent cache of rendered blocks: the html of every block of markdown
+(see markdown_blocks.scan_blocks) is stored in a small sqlite database, keyed by a
+hash of the block's text, the renderer version and the url resolver it was rendered with.
+Re-rendering a page after editing one paragraph then only renders that paragraph;
+every other block is looked up.
+
+The database is written by one process only: worker processes of a parallel build
+look blocks up, and hand what they rendered back to the main process (see take_updates).
+"""
+
+# bump this whenever a change to the renderer changes the html of a block,
+# so blocks cached by an older version are never used
+RENDERER_VERSION = 1
+
+BLOCK_CACHE_PATH = "./.block_cache.sqlite"
+
+# the cache is trimmed back to this many bytes of html (least recently used blocks go first)
+BLOCK_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class BlockCache():
+    def __init__(self, path=BLOCK_CACHE_PATH, max_bytes=BLOCK_CACHE_MAX_BYTES, read_only=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        # blocks rendered (key -> html) and looked up (keys) since the last flush
+        self.new_blocks = {}
+        self.used_keys = set()
+        # a pipelined build (see pipeline.py) renders on another thread than the one that opened the cache;
+        # a cache is still only used by one thread at a time
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if not read_only:
+            # readers (the worker processes) don't block the writer, nor the other way around
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS blocks (key TEXT PRIMARY KEY, html TEXT NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS blocks_last_used ON blocks (last_used)")
+            self.connection.commit()
+
+    def block_key(self, block, resolver):
+        """ the cache key of a Block rendered with a UrlResolver (or None) """
+        resolver_key = resolver.key if resolver is not None else ""
+        text = f"{RENDERER_VERSION}\0{resolver_key}\0{block.text}"
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key):
+        """ the cached html for key, or None """
+        html = self.new_blocks.get(key)
+        if html is None:
+            row = self.connection.execute("SELECT html FROM blocks WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                html = row[0]
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used_keys.add(key)
+        return html
+
+    def put(self, key, html):
+        self.new_blocks[key] = html
+
+    def render_block(self, block, resolver, render):
+        """ the html of the block: from the cache, or render(block, resolver) (which is then cached) """
+        key = self.block_key(block, resolver)
+        html = self.get(key)
+        if html is None:
+            html = render(block, resolver)
+            self.put(key, html)
+        return html
+
+    def take_updates(self):
+        """
+        Return (and forget) what changed since the last call, to be merged into
+        the writing cache with merge_updates(): (new blocks, used keys, hits, misses)
+        """
+        updates = (self.new_blocks, self.used_keys, self.hits, self.misses)
+        self.new_blocks = {}
+        self.used_keys = set()
+        self.hits = 0
+        self.misses = 0
+        return updates
+
+    def merge_updates(self, updates):
+        new_blocks, used_keys, hits, misses = updates
+        self.new_blocks.update(new_blocks)
+        self.used_keys.update(used_keys)
+        self.hits += hits
+        self.misses += misses
+
+    def flush(self):
+        """ write the new blocks and the use times to the database, then trim it to max_bytes """
+        if self.read_only:
+            raise ValueError("A read only BlockCache can't be flushed")
+        # every flush is one step of the clock the least recently used blocks are found with
+        now = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) + 1 FROM blocks").fetchone()[0]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO blocks (key, html, size, last_used) VALUES (?, ?, ?, ?)",
+                [(key, html, len(html.encode()), now) for key, html in self.new_blocks.items()]
+            )
+            self.connection.executemany(
+                "UPDATE blocks SET last_used = ? WHERE key = ?",
+                [(now, key) for key in self.used_keys if key not in self.new_blocks]
+            )
+        self.new_blocks = {}
+        self.used_keys = set()
+        self.evict()
+
+    def evict(self):
+        """ remove the least recently used blocks until the cache is no bigger than max_bytes """
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+        removed = []
+        for key, size in self.connection.execute("SELECT key, size FROM blocks ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            removed.append((key,))
+            total -= size
+        with self.connection:
+            self.connection.executemany("DELETE FROM blocks WHERE key = ?", removed)
+        return len(removed)
+
+    def total_bytes(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        if not self.read_only:
+            self.flush()
+        self.connection.close()
+
+
+def open_block_cache(path=BLOCK_CACHE_PATH, max_bytes=BLOCK_CACHE_MAX_BYTES):
+    """ open (or create) the block cache at path """
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    return BlockCache(path, max_bytes)
@@ -0,0 +1,196 @@
+import os
+import re
+import hashlib
+
+"""
+A tiny template engine for the page templates (e.g. template.html).
+
+A template is parsed once into a list of static segments with named slots
+between them. Filling a template is then just a join of the static segments
+with the slot values, instead of re-reading the file and doing a split/join
+pass over the whole document for every placeholder.
+
+Supported syntax:
+    {{ Name }}          a slot, filled from the context passed to render()
+    {{> partial.html }} a partial, inlined at compile time
+                        (the path is relative to the including template)
+
+Slots without a value in the context are left in the output untouched.
+
+The root-relative href and src urls in a template are resolved (basepath, fingerprinted
+assets) once per urls.UrlResolver with CompiledTemplate.resolve_urls(), not per page.
+"""
+
+# matches "{{ Title }}" style slots and "{{> header.html }}" style partials
+TAG_PATTERN = re.compile(r"\{\{(>?)\s*([^{}]+?)\s*\}\}")
+
+# name of a per-section layout file inside the content directory.
+# a section (directory) containing this file is rendered with it instead
+# of the template inherited from the parent directory.
+LAYOUT_FILENAME = "_layout.html"
+
+# compiled templates, keyed by absolute path
+# each value is a tuple: (dependency mtimes, CompiledTemplate)
+_template_cache = {}
+
+
+class CompiledTemplate():
+    def __init__(self, path, segments, slots, placeholders, dependencies, digest):
+        # static text around the slots; there is always one more segment than slots
+        self.segments = segments
+        # slot names in the order they appear in the template
+        self.slots = slots
+        # the original "{{ Name }}" text of each slot, used when a slot has no value
+        self.placeholders = placeholders
+        self.path = path
+        # every file this template was built from (itself plus any partials)
+        self.dependencies = dependencies
+        # sha256 of the fully expanded template source
+        self.digest = digest
+        # this template with its urls resolved, by UrlResolver (see resolve_urls)
+        self.resolved = {}
+
+    def render(self, context):
+        """
+        Fill the slots with the values in the context dict and return the page as a string.
+        """
+        return "".join(self.iter_render(context))
+
+    def iter_render(self, context):
+        """
+        Yield the filled template piece by piece, without joining it into one string.
+        A context value can also be an iterable of strings (e.g. HTMLNode.iter_html()),
+        which is streamed into its slot; such an iterable can only fill one slot.
+        """
+        yield self.segments[0]
+        for i in range(len(self.slots)):
+            value = context.get(self.slots[i])
+            if value is None:
+                yield self.placeholders[i]
+            elif isinstance(value, str):
+                yield value
+            else:
+                yield from value
+            yield self.segments[i + 1]
+
+    def resolve_urls(self, resolver):
+        """
+        Return a copy of this template with the href="/..." and src="/..." urls in its
+        static html resolved by the UrlResolver. The copy is made once per resolver.
+        """
+        template = self.resolved.get(resolver)
+        if template is None:
+            template = CompiledTemplate(
+                self.path,
+                [resolver.resolve_attributes(segment) for segment in self.segments],
+                self.slots,
+                self.placeholders,
+                self.dependencies,
+                self.digest
+            )
+            self.resolved[resolver] = template
+        return template
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.path}, slots: {self.slots})"
+
+
+def compile_template(template_path):
+    """
+    Return the CompiledTemplate for template_path.
+    The template is only read and parsed again if it (or one of its partials)
+    has been modified since it was last compiled.
+    """
+    abs_path = os.path.abspath(template_path)
+    cached = _template_cache.get(abs_path)
+    if cached is not None:
+        mtimes, template = cached
+        if mtimes == _dependency_mtimes(template.dependencies):
+            return template
+
+    template = _compile_template_file(abs_path)
+    _template_cache[abs_path] = (_dependency_mtimes(template.dependencies), template)
+    return template
+
+
+def compile_template_string(source, path="<string>"):
+    """
+    Compile template source that isn't read from a file (no caching).
+    Partials are resolved relative to the current working directory.
+    """
+    dependencies = []
+    expanded = _expand_partials(source, os.path.abspath(os.path.dirname(path)), dependencies, [path])
+    return _parse_template(expanded, path, dependencies)
+
+
+def clear_template_cache():
+    _template_cache.clear()
+
+
+def find_layout(dir_path, inherited_template_path):
+    """
+    Return the template to use for the pages in dir_path:
+    the section's own layout file if it has one, otherwise the inherited template.
+    """
+    layout_path = os.path.join(dir_path, LAYOUT_FILENAME)
+    if os.path.isfile(layout_path):
+        return layout_path
+    return inherited_template_path
+
+
+def _compile_template_file(abs_path):
+    with open(abs_path) as f:
+        source = f.read()
+    dependencies = [abs_path]
+    expanded = _expand_partials(source, os.path.dirname(abs_path), dependencies, [abs_path])
+    return _parse_template(expanded, abs_path, dependencies)
+
+
+def _parse_template(source, path, dependencies):
+    segments = []
+    slots = []
+    placeholders = []
+    last_end = 0
+    for match in TAG_PATTERN.finditer(source):
+        segments.append(source[last_end:match.start()])
+        slots.append(match.group(2))
+        placeholders.append(match.group(0))
+        last_end = match.end()
+    segments.append(source[last_end:])
+    digest = hashlib.sha256(source.encode()).hexdigest()
+    return CompiledTemplate(path, segments, slots, placeholders, dependencies, digest)
+
+
+def _expand_partials(source, base_dir, dependencies, include_stack):
+    # inline every "{{> partial }}" tag, recursively
+    # include_stack holds the chain of files being expanded, to catch include cycles
+    def replace_partial(match):
+        if not match.group(1):
+            return match.group(0) # a plain slot, leave it for _parse_template
+        partial_path = os.path.abspath(os.path.join(base_dir, match.group(2)))
+        if partial_path in include_stack:
+            raise ValueError(f"Template partial includes itself: {partial_path}")
+        if not os.path.isfile(partial_path):
+            raise ValueError(f"Template partial does not exist: {partial_path}")
+        with open(partial_path) as f:
+            partial_source = f.read()
+        if partial_path not in dependencies:
+            dependencies.append(partial_path)
+        return _expand_partials(
+            partial_source,
+            os.path.dirname(partial_path),
+            dependencies,
+            include_stack + [partial_path]
+        )
+
+    return TAG_PATTERN.sub(replace_partial, source)
+
+
+def _dependency_mtimes(dependencies):
+    mtimes = []
+    for path in dependencies:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            mtimes.append(None)
+    return tuple(mtimes)
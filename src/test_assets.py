@@ -0,0 +1,73 @@
+import os
+import unittest
+
+from copystatic import sync_directory_contents
+from assets import fingerprint_directory, fingerprint_url, rewrite_css_urls, load_asset_manifest, ASSET_MANIFEST_FILENAME
+from fixtures import TempDirTestCase
+
+
+class TestFingerprintDirectory(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source_dir = os.path.join(self.dir, "static")
+        self.dest_dir = os.path.join(self.dir, "docs")
+        self.write("static/index.css", "body { background: url(images/a.png) }")
+        self.write("static/images/a.png", "png a")
+        self.write("static/robots.txt", "User-agent: *")
+        self.records = {}
+
+    def read(self, url):
+        with open(os.path.join(self.dest_dir, url[1:])) as f:
+            return f.read()
+
+    def test_fingerprinted_files_and_manifest(self):
+        assets = fingerprint_directory(self.source_dir, self.dest_dir, self.records)
+        self.assertRegex(assets["/images/a.png"], r"^/images/a\.[0-9a-f]{8}\.png$")
+        self.assertEqual(assets["/robots.txt"], "/robots.txt")
+        self.assertEqual(self.read(assets["/images/a.png"]), "png a")
+        # the stylesheet points at the fingerprinted image
+        self.assertEqual(self.read(assets["/index.css"]), f"body {{ background: url({assets['/images/a.png'][1:]}) }}")
+        self.assertEqual(load_asset_manifest(os.path.join(self.dest_dir, ASSET_MANIFEST_FILENAME)), assets)
+
+    def test_changed_asset_replaces_old_version(self):
+        self.write("docs/index.html", "<html></html>")
+        old = fingerprint_directory(self.source_dir, self.dest_dir, self.records)
+        self.write("static/images/a.png", "png a, changed")
+        new = fingerprint_directory(self.source_dir, self.dest_dir, self.records)
+        self.assertNotEqual(old["/images/a.png"], new["/images/a.png"])
+        # the stylesheet's content changed with it, so it got a new name too
+        self.assertNotEqual(old["/index.css"], new["/index.css"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, old["/images/a.png"][1:])))
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, old["/index.css"][1:])))
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "index.html")))
+
+    def test_manifest_is_removed_without_fingerprinting(self):
+        manifest_path = os.path.join(self.dest_dir, ASSET_MANIFEST_FILENAME)
+        fingerprint_directory(self.source_dir, self.dest_dir, self.records)
+        self.assertIn(manifest_path, self.records)
+        # the next incremental build copies the files as they are
+        sync_directory_contents(self.source_dir, self.dest_dir, self.records)
+        self.assertFalse(os.path.exists(manifest_path))
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "index.css")))
+        # and fingerprinting again brings it back
+        fingerprint_directory(self.source_dir, self.dest_dir, self.records)
+        self.assertTrue(os.path.exists(manifest_path))
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "index.css")))
+
+
+class TestAssetUrls(unittest.TestCase):
+    def test_fingerprint_url(self):
+        self.assertEqual(fingerprint_url("/images/a.png", "3f2a9c1d0000"), "/images/a.3f2a9c1d.png")
+        self.assertEqual(fingerprint_url("/404.html", "3f2a9c1d0000"), "/404.html")
+
+    def test_rewrite_css_urls(self):
+        assets = {"/images/a.png": "/images/a.11111111.png", "/fonts/b.woff": "/fonts/b.22222222.woff"}
+        css = 'a { x: url("../images/a.png"); y: url(/fonts/b.woff?v=2); z: url(data:image/png;base64,AA); w: url(other.png) }'
+        self.assertEqual(
+            rewrite_css_urls(css, "/css/site.css", assets),
+            'a { x: url("../images/a.11111111.png"); y: url(/fonts/b.22222222.woff?v=2); z: url(data:image/png;base64,AA); w: url(other.png) }'
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import gzip
+import unittest
+
+from compress import compress_directory
+from fixtures import TempDirTestCase
+
+
+class TestCompressDirectory(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.html = "<p>" + "hello " * 500 + "</p>"
+        self.write("index.html", self.html)
+        self.write("blog/post.html", self.html)
+        self.write("small.css", "a {}")
+        self.write("image.png", "x" * 5000)
+        self.records = {}
+
+    def test_compresses_text_files_above_min_size(self):
+        stats = compress_directory(self.dir, self.records, min_size=100)
+        self.assertEqual(stats, {"compressed": 2, "unchanged": 0, "removed": 0})
+        with gzip.open(self.path("blog/post.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), self.html)
+        self.assertFalse(os.path.exists(self.path("small.css.gz")))
+        self.assertFalse(os.path.exists(self.path("image.png.gz")))
+
+    def test_output_is_deterministic(self):
+        compress_directory(self.dir, self.records, min_size=100)
+        with open(self.path("index.html.gz"), "rb") as f, open(self.path("blog/post.html.gz"), "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_unchanged_files_are_skipped(self):
+        compress_directory(self.dir, self.records, min_size=100)
+        mtime = os.stat(self.path("index.html.gz")).st_mtime_ns
+        # rewritten with the same content: hashed again, but not recompressed
+        self.bump_mtime(self.write("index.html", self.html))
+        self.write("blog/post.html", self.html + "<p>more</p>")
+        stats = compress_directory(self.dir, self.records, min_size=100)
+        self.assertEqual(stats, {"compressed": 1, "unchanged": 1, "removed": 0})
+        self.assertEqual(os.stat(self.path("index.html.gz")).st_mtime_ns, mtime)
+
+    def test_stale_gz_files_are_removed(self):
+        compress_directory(self.dir, self.records, min_size=100)
+        os.remove(self.path("blog/post.html"))
+        self.write("index.html", "<p>tiny</p>")
+        stats = compress_directory(self.dir, self.records, min_size=100)
+        self.assertEqual(stats["removed"], 2)
+        self.assertFalse(os.path.exists(self.path("blog/post.html.gz")))
+        self.assertFalse(os.path.exists(self.path("index.html.gz")))
+        self.assertEqual(self.records, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
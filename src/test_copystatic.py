@@ -0,0 +1,121 @@
+import os
+import unittest
+
+from copystatic import copy_directory_contents, sync_directory_contents, place_file
+from fixtures import TempDirTestCase
+
+
+class TestSyncDirectoryContents(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source_dir = os.path.join(self.dir, "static")
+        self.dest_dir = os.path.join(self.dir, "docs")
+        self.write("static/index.css", "body {}")
+        self.write("static/images/a.png", "png a")
+        self.write("static/images/b.png", "png b")
+        self.records = {}
+
+    def dest(self, name):
+        return os.path.join(self.dest_dir, name)
+
+    def test_first_sync_copies_everything(self):
+        stats = sync_directory_contents(self.source_dir, self.dest_dir, self.records)
+        self.assertEqual(stats, {"copied": 3, "unchanged": 0, "removed": 0})
+        with open(self.dest("images/b.png")) as f:
+            self.assertEqual(f.read(), "png b")
+        # copies keep the source's mtime
+        self.assertEqual(
+            os.stat(self.dest("index.css")).st_mtime_ns,
+            os.stat(os.path.join(self.source_dir, "index.css")).st_mtime_ns
+        )
+
+    def test_only_changed_files_are_copied(self):
+        sync_directory_contents(self.source_dir, self.dest_dir, self.records)
+        mtime = os.stat(self.dest("images/a.png")).st_mtime_ns
+        self.bump_mtime(self.write("static/images/b.png", "png b, changed"))
+        stats = sync_directory_contents(self.source_dir, self.dest_dir, self.records)
+        self.assertEqual(stats, {"copied": 1, "unchanged": 2, "removed": 0})
+        self.assertEqual(os.stat(self.dest("images/a.png")).st_mtime_ns, mtime)
+        with open(self.dest("images/b.png")) as f:
+            self.assertEqual(f.read(), "png b, changed")
+
+    def test_hash_skips_touched_files(self):
+        sync_directory_contents(self.source_dir, self.dest_dir, self.records, use_hash=True)
+        self.bump_mtime(self.write("static/index.css", "body {}"))
+        stats = sync_directory_contents(self.source_dir, self.dest_dir, self.records, use_hash=True)
+        self.assertEqual(stats["copied"], 0)
+        stats = sync_directory_contents(self.source_dir, self.dest_dir, self.records)
+        self.assertEqual(stats["copied"], 1)
+
+    def test_removes_only_synced_files(self):
+        sync_directory_contents(self.source_dir, self.dest_dir, self.records)
+        self.write("docs/index.html", "<html></html>")
+        self.write("docs/images/page.html", "<html></html>")
+        os.remove(os.path.join(self.source_dir, "images", "a.png"))
+        os.remove(os.path.join(self.source_dir, "index.css"))
+        stats = sync_directory_contents(self.source_dir, self.dest_dir, self.records)
+        self.assertEqual(stats["removed"], 2)
+        self.assertFalse(os.path.exists(self.dest("images/a.png")))
+        self.assertFalse(os.path.exists(self.dest("index.css")))
+        self.assertTrue(os.path.exists(self.dest("index.html")))
+        self.assertTrue(os.path.exists(self.dest("images/page.html")))
+        self.assertEqual(len(self.records), 1)
+
+
+class TestPlaceFile(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source_path = os.path.join(self.dir, "static", "a.png")
+        os.makedirs(os.path.dirname(self.source_path))
+        with open(self.source_path, "w") as f:
+            f.write("png a")
+        os.chmod(self.source_path, 0o600)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_link_modes(self):
+        for link_mode in ("copy", "hardlink", "reflink"):
+            dest_path = os.path.join(self.dir, "docs", link_mode, "a.png")
+            used = place_file(self.source_path, dest_path, link_mode)
+            # reflinks fall back to a copy on filesystems that can't clone
+            self.assertIn(used, (link_mode, "copy"))
+            self.assertEqual(self.read(dest_path), "png a")
+            self.assertEqual(os.stat(dest_path).st_mtime_ns, os.stat(self.source_path).st_mtime_ns)
+
+    def test_copy_does_not_copy_permissions(self):
+        dest_path = os.path.join(self.dir, "docs", "a.png")
+        place_file(self.source_path, dest_path)
+        self.assertNotEqual(os.stat(dest_path).st_ino, os.stat(self.source_path).st_ino)
+        self.assertEqual(os.stat(dest_path).st_mode & 0o777, 0o666 & ~self.umask())
+
+    def test_replacing_a_hardlink_keeps_the_source(self):
+        dest_path = os.path.join(self.dir, "docs", "a.png")
+        if place_file(self.source_path, dest_path, "hardlink") != "hardlink":
+            self.skipTest("hard links are not supported here")
+        other_path = os.path.join(self.dir, "b.png")
+        with open(other_path, "w") as f:
+            f.write("png b")
+        place_file(other_path, dest_path)
+        self.assertEqual(self.read(dest_path), "png b")
+        self.assertEqual(self.read(self.source_path), "png a")
+
+    def test_copy_directory_contents_on_threads(self):
+        for i in range(20):
+            with open(os.path.join(self.dir, "static", f"{i}.txt"), "w") as f:
+                f.write(str(i))
+        os.mkdir(os.path.join(self.dir, "static", "empty"))
+        dest_dir = os.path.join(self.dir, "docs")
+        copy_directory_contents(os.path.join(self.dir, "static"), dest_dir, link_mode="hardlink", threads=4)
+        self.assertEqual(self.read(os.path.join(dest_dir, "17.txt")), "17")
+        self.assertTrue(os.path.isdir(os.path.join(dest_dir, "empty")))
+
+    def umask(self):
+        umask = os.umask(0)
+        os.umask(umask)
+        return umask
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import unittest
+from unittest import mock
+
+import discovery
+from discovery import DirectorySnapshot, discover_pages
+from generate_page import collect_pages
+from template import LAYOUT_FILENAME
+from fixtures import TempDirTestCase
+
+
+class TestDiscoverPages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content_dir = os.path.join(self.dir, "content")
+        self.template_path = self.write("template.html", "{{ Content }}")
+        self.write("content/index.md", "# Home")
+        self.write("content/notes.txt", "not a page")
+        self.write("content/blog/one.md", "# One")
+        self.write("content/blog/" + LAYOUT_FILENAME, "<main>{{ Content }}</main>")
+        self.write("content/blog/2024/two.md", "# Two")
+        os.makedirs(os.path.join(self.content_dir, "empty"))
+        self.snapshot_path = os.path.join(self.dir, "snapshot.json")
+        # nothing in the temporary directory is old enough to be snapshotted otherwise
+        self.racy = mock.patch.object(discovery, "RACY_SECONDS", -60)
+        self.racy.start()
+
+    def tearDown(self):
+        self.racy.stop()
+        super().tearDown()
+
+    def pages(self, snapshot=None):
+        return {page.rel_path: page for page in discover_pages(self.content_dir, self.template_path, snapshot)}
+
+    def test_pages_and_layouts(self):
+        pages = self.pages()
+        self.assertEqual(sorted(pages), ["blog/2024/two.md", "blog/one.md", "index.md"])
+        layout_path = os.path.join(os.path.abspath(self.content_dir), "blog", LAYOUT_FILENAME)
+        self.assertEqual(pages["index.md"].template_path, os.path.abspath(self.template_path))
+        self.assertEqual(pages["blog/one.md"].template_path, layout_path)
+        self.assertEqual(pages["blog/2024/two.md"].template_path, layout_path)
+        self.assertEqual(pages["blog/one.md"].stat.st_size, 5)
+        self.assertEqual(pages["index.md"].path, os.path.join(self.content_dir, "index.md"))
+
+    def test_snapshot_skips_unchanged_directories(self):
+        snapshot = DirectorySnapshot.load(self.snapshot_path, self.content_dir)
+        expected = self.pages(snapshot)
+        snapshot.save()
+        self.assertEqual(snapshot.misses, 4)
+
+        snapshot = DirectorySnapshot.load(self.snapshot_path, self.content_dir)
+        with mock.patch.object(discovery.os, "scandir", side_effect=AssertionError("listed again")):
+            pages = self.pages(snapshot)
+        self.assertEqual(snapshot.hits, 4)
+        self.assertEqual(sorted(pages), sorted(expected))
+        self.assertEqual(pages["blog/one.md"].template_path, expected["blog/one.md"].template_path)
+
+        # an edited page is noticed by its stat, a new one by its directory's mtime
+        self.write("content/blog/one.md", "# One, edited")
+        self.write("content/blog/2024/three.md", "# Three")
+        os.utime(os.path.join(self.content_dir, "blog", "2024"), ns=(0, 1))
+        snapshot.misses = snapshot.hits = 0
+        pages = self.pages(snapshot)
+        self.assertEqual(pages["blog/one.md"].stat.st_size, 13)
+        self.assertIn("blog/2024/three.md", pages)
+        self.assertEqual((snapshot.hits, snapshot.misses), (3, 1))
+
+    def test_recent_directories_are_not_snapshotted(self):
+        self.racy.stop()
+        snapshot = DirectorySnapshot.load(self.snapshot_path, self.content_dir)
+        self.pages(snapshot)
+        self.assertEqual(snapshot.dirs, {})
+        self.racy.start()
+
+    def test_snapshot_of_another_directory_is_ignored(self):
+        snapshot = DirectorySnapshot.load(self.snapshot_path, self.content_dir)
+        self.pages(snapshot)
+        snapshot.save()
+        self.assertEqual(DirectorySnapshot.load(self.snapshot_path, self.dir).dirs, {})
+        self.assertEqual(len(DirectorySnapshot.load(self.snapshot_path, self.content_dir).dirs), 4)
+
+    def test_collect_pages(self):
+        dest_dir = os.path.join(self.dir, "docs")
+        pages = collect_pages(self.content_dir, self.template_path, dest_dir)
+        self.assertIn(os.path.join(dest_dir, "blog", "2024", "two.html"), [dest_path for from_path, template_path, dest_path in pages])
+        self.assertTrue(os.path.isdir(os.path.join(dest_dir, "blog", "2024")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+
+from generate_page import generate_pages_recursive, generate_pages_targets, collect_pages, render_page, PageBuildError, RENDERERS
+from manifest import BuildManifest
+from template import compile_template_string
+from fixtures import TempDirTestCase
+
+
+class TestGeneratePagesRecursive(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content_dir = os.path.join(self.dir, "content")
+        self.template_path = self.write("template.html", '<title>{{ Title }}</title><link href="/index.css" />{{ Content }}')
+        self.write("content/index.md", "# Home\n\n[blog](/blog/one)")
+        for i in range(6):
+            self.write(f"content/blog/post{i}/index.md", f"# Post {i}\n\n![img](/images/{i}.png) and **bold**")
+
+    def test_collect_pages(self):
+        dest_dir = os.path.join(self.dir, "docs")
+        os.mkdir(dest_dir)
+        pages = collect_pages(self.content_dir, self.template_path, dest_dir)
+        self.assertEqual(len(pages), 7)
+        self.assertIn(
+            os.path.join(dest_dir, "blog", "post3", "index.html"),
+            [dest_path for from_path, template_path, dest_path in pages]
+        )
+        self.assertTrue(os.path.isdir(os.path.join(dest_dir, "blog", "post3")))
+
+    def test_parallel_output_matches_serial(self):
+        serial_dir = os.path.join(self.dir, "serial")
+        parallel_dir = os.path.join(self.dir, "parallel")
+        os.mkdir(serial_dir)
+        os.mkdir(parallel_dir)
+        generate_pages_recursive(self.content_dir, self.template_path, serial_dir, basepath="site")
+        generate_pages_recursive(self.content_dir, self.template_path, parallel_dir, basepath="site", jobs=3)
+        serial_files = self.read_tree(serial_dir)
+        self.assertEqual(len(serial_files), 7)
+        self.assertEqual(serial_files, self.read_tree(parallel_dir))
+
+    def test_targets_match_separate_builds(self):
+        expected = {}
+        for basepath in ("/", "site"):
+            dest_dir = os.path.join(self.dir, "expected", basepath.strip("/") or "root")
+            os.makedirs(dest_dir)
+            generate_pages_recursive(self.content_dir, self.template_path, dest_dir, basepath=basepath)
+            expected[basepath] = self.read_tree(dest_dir)
+        for jobs in (1, 3):
+            targets = [(basepath, os.path.join(self.dir, f"out{jobs}", basepath.strip("/") or "root")) for basepath in ("/", "site")]
+            os.makedirs(targets[0][1])
+            generate_pages_targets(self.content_dir, self.template_path, targets, jobs=jobs)
+            for basepath, dest_dir in targets:
+                self.assertEqual(self.read_tree(dest_dir), expected[basepath])
+
+    def test_targets_incremental(self):
+        targets = [("/", os.path.join(self.dir, "root")), ("site", os.path.join(self.dir, "site"))]
+        os.makedirs(targets[0][1])
+        manifest = BuildManifest(os.path.join(self.dir, "manifest.json"))
+        generate_pages_targets(self.content_dir, self.template_path, targets, manifest=manifest)
+        self.assertEqual(len(manifest.pages), 14)
+        self.assertEqual(manifest.get_page(os.path.join(self.dir, "site", "index.html"))["basepath"], "/site/")
+        dest_path = os.path.join(self.dir, "site", "blog", "post1", "index.html")
+        mtime = os.stat(dest_path).st_mtime_ns
+        generate_pages_targets(self.content_dir, self.template_path, targets, manifest=manifest, jobs=2)
+        self.assertEqual(os.stat(dest_path).st_mtime_ns, mtime)
+
+    def test_errors_are_reported_per_page(self):
+        bad_path = self.write("content/blog/post2/index.md", "no title here")
+        dest_dir = os.path.join(self.dir, "docs")
+        os.mkdir(dest_dir)
+        for jobs in (1, 3):
+            with self.assertRaises(PageBuildError) as context:
+                generate_pages_recursive(self.content_dir, self.template_path, dest_dir, jobs=jobs)
+            self.assertEqual(len(context.exception.errors), 1)
+            self.assertEqual(context.exception.errors[0][0], bad_path)
+            self.assertIn(bad_path, str(context.exception))
+        # the other pages were still built
+        self.assertTrue(os.path.exists(os.path.join(dest_dir, "blog", "post5", "index.html")))
+
+
+class TestUrlResolution(unittest.TestCase):
+    def setUp(self):
+        self.template = compile_template_string('<link href="/index.css" /><a href="https://a.b/">x</a>{{ Content }}')
+        self.markdown = (
+            "# Title\n\n[home](/) and ![img](/images/a.png) and [ext](https://a.b/c)\n\n"
+            '```\n<a href="/not/a/link">code</a>\n```'
+        )
+
+    def test_basepath_is_applied_to_real_urls_only(self):
+        for renderer in RENDERERS:
+            html = render_page(self.markdown, self.template, "site", renderer=renderer)
+            self.assertEqual(
+                html,
+                '<link href="/site/index.css" /><a href="https://a.b/">x</a><div><h1>Title</h1>'
+                '<p><a href="/site/">home</a> and <img src="/site/images/a.png" alt="img" /> and <a href="https://a.b/c">ext</a></p>'
+                '<pre><code><a href="/not/a/link">code</a>\n</code></pre></div>'
+            )
+
+    def test_assets(self):
+        assets = {"/index.css": "/index.11111111.css", "/images/a.png": "/images/a.22222222.png"}
+        html = render_page(self.markdown, self.template, "/", assets=assets)
+        self.assertIn('href="/index.11111111.css"', html)
+        self.assertIn('src="/images/a.22222222.png"', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
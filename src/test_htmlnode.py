@@ -1,6 +1,8 @@
+import io
+import sys
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, FrozenLeafNode, ParentNode
 
 
 class TestHtmlNode(unittest.TestCase):
@@ -82,7 +84,27 @@ class TestLeafNode(unittest.TestCase):
             node.__repr__(),
             "LeafNode(a, Click me!, {'href': 'https://www.google.com'})"
         )
- 
+
+
+    def test_leaf_node_no_instance_dict(self):
+        node = LeafNode("b", "bold")
+        self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_frozen_leaf_node(self):
+        node = FrozenLeafNode("a", "Click me!", {"href": "https://www.google.com"})
+        self.assertEqual(node.to_html(), '<a href="https://www.google.com">Click me!</a>')
+        with self.assertRaises(AttributeError):
+            node.value = "changed"
+        with self.assertRaises(TypeError):
+            node.props["href"] = "changed"
+        self.assertEqual(repr(node), "LeafNode(a, Click me!, {'href': 'https://www.google.com'})")
+
+    def test_frozen_leaf_node_copies_its_props(self):
+        props = {"href": "https://www.google.com"}
+        node = FrozenLeafNode("a", "Click me!", props)
+        props["href"] = "changed"
+        self.assertEqual(node.props, {"href": "https://www.google.com"})
+
 
 class TestParentNode(unittest.TestCase):
     def test_parent_node_to_html(self):
@@ -131,3 +153,31 @@ class TestParentNode(unittest.TestCase):
             parent_node.to_html(),
             "<div><span><b>grandchild</b></span></div>",
         )
+
+    def test_iter_html_matches_to_html(self):
+        node = ParentNode("div", [
+            ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")]),
+            LeafNode("img", None, {"src": "a.png", "alt": "a"}),
+        ])
+        chunks = list(node.iter_html())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), '<div><p><b>bold</b> text</p><img src="a.png" alt="a" /></div>')
+
+    def test_write_html(self):
+        node = ParentNode("p", [LeafNode("i", "italic")])
+        fp = io.StringIO()
+        node.write_html(fp)
+        self.assertEqual(fp.getvalue(), "<p><i>italic</i></p>")
+
+    def test_to_html_deep_tree(self):
+        node = LeafNode(None, "deep")
+        depth = sys.getrecursionlimit() * 2
+        for _ in range(depth):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertEqual(len(html), depth * len("<span></span>") + len("deep"))
+
+    def test_to_html_missing_children(self):
+        node = ParentNode("div", [ParentNode("p", None)])
+        with self.assertRaises(ValueError):
+            node.to_html()
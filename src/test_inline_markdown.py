@@ -34,6 +34,54 @@ class TestTextToTextnodes(unittest.TestCase):
             expected_output
         )
 
+    def test_text_to_textnodes_first_element_wins(self):
+        text = "a [snake_case link](https://a.dev/x_y) and `**not bold**`"
+        self.assertListEqual(
+            text_to_textnodes(text),
+            [
+                TextNode("a ", TextType.NORMAL),
+                TextNode("snake_case link", TextType.LINK, "https://a.dev/x_y"),
+                TextNode(" and ", TextType.NORMAL),
+                TextNode("**not bold**", TextType.CODE),
+            ]
+        )
+
+    def test_text_to_textnodes_brackets_stay_text(self):
+        text = "[not a link] and ![not an image] then [link](/x)"
+        self.assertListEqual(
+            text_to_textnodes(text),
+            [
+                TextNode("[not a link] and ![not an image] then ", TextType.NORMAL),
+                TextNode("link", TextType.LINK, "/x"),
+            ]
+        )
+
+    def test_text_to_textnodes_unmatched_delimiter(self):
+        with self.assertRaises(Exception):
+            text_to_textnodes("this is **not closed")
+
+    def test_text_to_textnodes_star_runs(self):
+        # a run of n stars is n - 1 overlapping "**", as split_nodes_delimiter has always read it
+        self.assertListEqual(
+            text_to_textnodes("a *** b"),
+            [TextNode("a ", TextType.NORMAL), TextNode(" b", TextType.NORMAL)]
+        )
+        self.assertListEqual(
+            text_to_textnodes("This is ***very*** important"),
+            [TextNode("This is ", TextType.NORMAL), TextNode("very", TextType.NORMAL), TextNode(" important", TextType.NORMAL)]
+        )
+        self.assertListEqual(
+            text_to_textnodes("x ****y**** z"),
+            [TextNode("x ", TextType.NORMAL), TextNode("y", TextType.BOLD), TextNode(" z", TextType.NORMAL)]
+        )
+        self.assertListEqual(
+            text_to_textnodes("**a *** b**"),
+            [TextNode("a ", TextType.BOLD), TextNode(" b", TextType.BOLD)]
+        )
+        for text in ["a **** b", "**x*** y", "**a****b**"]:
+            with self.assertRaises(Exception):
+                text_to_textnodes(text)
+
 
 class TestExtractMarkdownImages(unittest.TestCase):
     def test_extract_markdown_images(self):
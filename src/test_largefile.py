@@ -0,0 +1,94 @@
+import os
+import tracemalloc
+import unittest
+
+from largefile import MappedMarkdown, is_large_file
+from generate_page import generate_pages_targets, generate_page_outputs
+from manifest import BuildManifest
+from markdown_to_html import clear_inline_caches
+from urls import UrlResolver
+from fixtures import TempDirTestCase
+
+
+class TestMappedMarkdown(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page_path = self.path("page.md")
+
+    def test_lines_match_read_split(self):
+        for data in [b"", b"# a", b"# a\n", b"a\n\nb", b"a\r\nb\r\n\r\n", b"a\rb\r", b"a\r\r\nb", "café\n\n☃".encode()]:
+            with open(self.page_path, "wb") as f:
+                f.write(data)
+            with open(self.page_path) as f:
+                expected = f.read().split("\n")
+            with MappedMarkdown(self.page_path) as markdown:
+                self.assertEqual(list(markdown.iter_lines()), expected, data)
+                # every call starts over
+                self.assertEqual(list(markdown.iter_lines()), expected, data)
+
+    def test_is_large_file(self):
+        with open(self.page_path, "w") as f:
+            f.write("# 10 bytes")
+        self.assertTrue(is_large_file(self.page_path, 10))
+        self.assertFalse(is_large_file(self.page_path, 11))
+        self.assertFalse(is_large_file(self.page_path, None))
+
+
+class TestLargeFileBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content_dir = os.path.join(self.dir, "content")
+        self.template_path = self.write("template.html", '<title>{{ Title }}</title><link href="/index.css" />{{ Content }}')
+        self.write("content/index.md", "Intro\n\n# Home\n\n[blog](/blog/one)\n\n```\ncode\n\n# not the title\n```\n")
+        self.write("content/blog/crlf.md", "# Windows\r\n\r\n- a\r\n- b\r\n\r\n> quote\r\n", newline="")
+        self.write("content/blog/list.md", "# List\n\n1. one\n2. _two_\n\n![img](/images/a.png)")
+
+    def build(self, name, **options):
+        targets = [("/", os.path.join(self.dir, name, "root")), ("site", os.path.join(self.dir, name, "site"))]
+        os.makedirs(targets[0][1], exist_ok=True)
+        generate_pages_targets(self.content_dir, self.template_path, targets, **options)
+        return [self.read_tree(dest_dir) for basepath, dest_dir in targets]
+
+    def test_output_matches(self):
+        expected = self.build("expected", large_file_threshold=None)
+        self.assertEqual(len(expected[0]), 3)
+        self.assertEqual(self.build("large", large_file_threshold=1), expected)
+        self.assertEqual(self.build("large_jobs", large_file_threshold=1, jobs=2), expected)
+        self.assertEqual(self.build("large_pipeline", large_file_threshold=1, pipeline=True), expected)
+
+    def test_incremental(self):
+        manifest = BuildManifest(os.path.join(self.dir, "manifest.json"))
+        expected = self.build("incremental", large_file_threshold=1, manifest=manifest)
+        self.assertEqual(len(manifest.pages), 6)
+        dest_path = os.path.join(self.dir, "incremental", "site", "index.html")
+        mtime = os.stat(dest_path).st_mtime_ns
+        # a touched but unchanged file is hashed, and left alone
+        os.utime(os.path.join(self.content_dir, "index.md"), ns=(0, 1))
+        self.assertEqual(self.build("incremental", large_file_threshold=1, manifest=manifest), expected)
+        self.assertEqual(os.stat(dest_path).st_mtime_ns, mtime)
+
+        self.write("content/index.md", "# Home, edited")
+        files = self.build("incremental", large_file_threshold=1, manifest=manifest, pipeline=True)
+        self.assertIn(b"Home, edited", files[1]["index.html"])
+
+    def test_memory_does_not_grow_with_the_file(self):
+        template_path = self.write("plain.html", "<title>{{ Title }}</title>{{ Content }}")
+        peaks = []
+        # both pages are big enough to fill the (bounded) inline caches
+        for paragraphs in (3000, 9000):
+            path = os.path.join(self.dir, f"big{paragraphs}.md")
+            with open(path, "w") as f:
+                f.write("# Big\n\n")
+                for i in range(paragraphs):
+                    f.write(f"paragraph {i} with a [link](/page-{i}) and _more_ words\n\n- item {i}\n- item\n\n")
+            clear_inline_caches()
+            tracemalloc.start()
+            generate_page_outputs(path, template_path, [(UrlResolver("/"), path + ".html")], large_file_threshold=1)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        # three times the markdown, (about) the same memory
+        self.assertLess(peaks[1], peaks[0] * 1.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
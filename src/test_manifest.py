@@ -0,0 +1,71 @@
+import os
+import unittest
+
+from manifest import BuildManifest
+from generate_page import generate_page, generate_pages_recursive
+from fixtures import TempDirTestCase
+
+
+class TestIncrementalBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content_dir = os.path.join(self.dir, "content")
+        self.dest_dir = os.path.join(self.dir, "docs")
+        os.mkdir(self.content_dir)
+        os.mkdir(self.dest_dir)
+        self.template_path = self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.page_path = self.write("content/index.md", "# Hello\n\nsome [link](/about)")
+        self.manifest_path = os.path.join(self.dir, "manifest.json")
+
+    def build(self, basepath="/"):
+        manifest = BuildManifest.load(self.manifest_path)
+        dest_path = os.path.join(self.dest_dir, "index.html")
+        written = generate_page(self.page_path, self.template_path, dest_path, basepath=basepath, manifest=manifest)
+        manifest.save()
+        return written
+
+    def test_unchanged_page_is_skipped(self):
+        self.assertTrue(self.build())
+        self.assertFalse(self.build())
+
+    def test_changed_markdown_is_rebuilt(self):
+        self.build()
+        self.write("content/index.md", "# Hello again")
+        self.assertTrue(self.build())
+        with open(os.path.join(self.dest_dir, "index.html")) as f:
+            self.assertEqual(f.read(), "<title>Hello again</title><div><h1>Hello again</h1></div>")
+
+    def test_changed_template_and_basepath_are_rebuilt(self):
+        self.build()
+        self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertTrue(self.build())
+        self.assertTrue(self.build(basepath="/site/"))
+        self.assertFalse(self.build(basepath="/site/"))
+
+    def test_same_output_is_not_rewritten(self):
+        self.build()
+        dest_path = os.path.join(self.dest_dir, "index.html")
+        mtime = os.stat(dest_path).st_mtime_ns
+        # touching the markdown without changing it must not touch the output
+        self.bump_mtime(self.write("content/index.md", "# Hello\n\nsome [link](/about)"))
+        self.assertFalse(self.build())
+        self.assertEqual(os.stat(dest_path).st_mtime_ns, mtime)
+
+    def test_prune_deleted_pages(self):
+        self.write("content/old.md", "# Old")
+        manifest = BuildManifest.load(self.manifest_path)
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, manifest=manifest)
+        manifest.save()
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "old.html")))
+
+        os.remove(os.path.join(self.content_dir, "old.md"))
+        manifest = BuildManifest.load(self.manifest_path)
+        generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, manifest=manifest)
+        removed = manifest.prune_pages(self.dest_dir)
+        self.assertEqual(len(removed), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "old.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
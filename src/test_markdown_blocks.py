@@ -4,6 +4,7 @@ from markdown_blocks import (
     markdown_to_blocks,
     BlockType,
     block_to_block_type,
+    scan_blocks,
 )
 
 
@@ -85,3 +86,71 @@ This is the same paragraph on a new line
                 "- This is a list\n- with items",
             ],
         )
+
+    def test_markdown_to_blocks_fenced_code_with_blank_lines(self):
+        md = """
+Some text
+
+```
+def f():
+
+    return 1
+```
+After the code
+"""
+        blocks = markdown_to_blocks(md)
+        self.assertEqual(
+            blocks,
+            [
+                "Some text",
+                "```\ndef f():\n\n    return 1\n```",
+                "After the code",
+            ],
+        )
+
+    def test_markdown_to_blocks_unclosed_fence(self):
+        md = "```\nnot code\n\nstill not code"
+        self.assertEqual(markdown_to_blocks(md), ["```\nnot code", "still not code"])
+
+    def test_markdown_to_blocks_inline_code_is_not_a_fence(self):
+        md = "```foo``` bar\n\npara\n\n```\ncode\n```"
+        self.assertEqual(markdown_to_blocks(md), ["```foo``` bar", "para", "```\ncode\n```"])
+        self.assertEqual(
+            [block.block_type for block in scan_blocks(md)],
+            [BlockType.PARAGRAPH, BlockType.PARAGRAPH, BlockType.CODE],
+        )
+
+    def test_markdown_to_blocks_fence_with_info_string(self):
+        md = "```python\nx = 1\n\ny = 2\n  ```\n\nafter"
+        self.assertEqual(markdown_to_blocks(md), ["```python\nx = 1\n\ny = 2\n  ```", "after"])
+
+
+class TestScanBlocks(unittest.TestCase):
+    def test_types_and_offsets(self):
+        md = """# Title
+
+- one
+- two
+
+
+```
+code
+```
+"""
+        blocks = list(scan_blocks(md))
+        self.assertEqual(
+            [(block.block_type, block.start_line, block.end_line) for block in blocks],
+            [
+                (BlockType.HEADING, 0, 1),
+                (BlockType.ULIST, 2, 4),
+                (BlockType.CODE, 6, 9),
+            ],
+        )
+        self.assertEqual(blocks[1].lines, ["- one", "- two"])
+
+    def test_strips_block_whitespace(self):
+        blocks = list(scan_blocks("   > quote  \n> more   \n"))
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks[0].text, "> quote  \n> more")
+        self.assertEqual(blocks[0].block_type, BlockType.QUOTE)
+
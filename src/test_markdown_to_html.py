@@ -1,14 +1,21 @@
+import os
 import unittest
 
 from markdown_to_html import (
     markdown_to_html_node,
+    markdown_to_html,
+    text_to_html,
     block_to_block_html_tags,
     text_to_children,
     strip_heading_prefix,
     strip_prefixes_from_ordered_list_md,
     strip_prefixes_from_unordered_list_md,
     extract_title,
+    inline_cache_info,
+    clear_inline_caches,
 )
+from inline_markdown import cached_text_to_textnodes, text_to_textnodes
+from urls import UrlResolver
 
 from htmlnode import LeafNode, ParentNode
 
@@ -100,6 +107,65 @@ the **same** even with inline stuff
             "<div><ul><li><b>bold</b></li><li><i>italic</i></li></ul></div>"
         )
 
+    def test_codeblock_with_blank_lines(self):
+        md = """
+```
+first
+
+second
+```
+"""
+
+        node = markdown_to_html_node(md)
+        html = node.to_html()
+        self.assertEqual(
+            html,
+            "<div><pre><code>first\n\nsecond\n</code></pre></div>",
+        )
+
+class TestMarkdownToHtml(unittest.TestCase):
+    def test_matches_tree_renderer(self):
+        md = """
+# Title with `code`
+
+A paragraph with **bold**, _italic_, a [link](/about) and an ![image](/a.png)
+over two lines.
+
+## Second heading
+
+> quoted **text**
+> over lines
+
+1. one
+2. _two_
+
+- [a](/a)
+- b
+
+```
+code with **stars**
+
+and a blank line
+```
+"""
+        self.assertEqual(markdown_to_html(md), markdown_to_html_node(md).to_html())
+
+    def test_matches_tree_renderer_for_content_pages(self):
+        content_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "content")
+        for dir_path, dir_names, file_names in os.walk(content_dir):
+            for file_name in file_names:
+                if file_name.endswith(".md"):
+                    with open(os.path.join(dir_path, file_name)) as f:
+                        md = f.read()
+                    self.assertEqual(markdown_to_html(md), markdown_to_html_node(md).to_html())
+
+    def test_text_to_html(self):
+        self.assertEqual(
+            text_to_html("this is a **paragraph**\n  on two lines"),
+            "this is a <b>paragraph</b> on two lines"
+        )
+
+
 class TestHelperFunctions(unittest.TestCase):
     def test_text_to_children_paragraph(self):
         text = "this is a **paragraph**"
@@ -231,3 +297,51 @@ blah
             str(context.exception),
             exp_out
         )
+
+
+class TestInlineCache(unittest.TestCase):
+    def setUp(self):
+        clear_inline_caches()
+
+    def test_repeated_text_is_a_hit(self):
+        text = "Read **more** about [Tolkien](/tolkien)"
+        first = text_to_children(text)
+        second = text_to_children(text)
+        self.assertEqual(first, second)
+        info = inline_cache_info()["text_to_children"]
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_shared_children_are_immutable(self):
+        children = text_to_children("some **bold** text")
+        with self.assertRaises(AttributeError):
+            children[1].value = "changed"
+        # the list itself is the caller's own
+        children.append(LeafNode(None, "extra"))
+        self.assertEqual(len(text_to_children("some **bold** text")), 3)
+
+    def test_shared_props_are_read_only(self):
+        resolver = UrlResolver("/blog/")
+        link = text_to_children("[home](/index.html)", resolver)[0]
+        with self.assertRaises(TypeError):
+            link.props["href"] = "/changed"
+        self.assertEqual(text_to_children("[home](/index.html)", resolver)[0].props, {"href": "/blog/index.html"})
+
+    def test_resolver_is_part_of_the_key(self):
+        text = "[home](/index.html)"
+        self.assertEqual(text_to_html(text), '<a href="/index.html">home</a>')
+        self.assertEqual(
+            text_to_html(text, UrlResolver("/blog/")),
+            '<a href="/blog/index.html">home</a>'
+        )
+        self.assertEqual(
+            text_to_children(text, UrlResolver("/blog/"))[0].props,
+            {"href": "/blog/index.html"}
+        )
+        self.assertEqual(inline_cache_info()["text_to_html"].misses, 2)
+
+    def test_textnodes_cache_is_shared_but_text_to_textnodes_is_not(self):
+        self.assertIs(cached_text_to_textnodes("a `b` c"), cached_text_to_textnodes("a `b` c"))
+        nodes = text_to_textnodes("a `b` c")
+        nodes[0].text = "changed"
+        self.assertEqual(cached_text_to_textnodes("a `b` c")[0].text, "a ")
+        self.assertEqual(text_to_textnodes("a `b` c")[0].text, "a ")
@@ -0,0 +1,92 @@
+import os
+import tracemalloc
+import unittest
+
+from memprofile import MemoryProfiler, format_memory_report, max_rss_bytes
+from profiling import set_profiler
+from generate_page import generate_pages_recursive
+from markdown_to_html import clear_inline_caches
+from fixtures import TempDirTestCase
+
+
+class TestMemoryProfiler(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self.path("content")
+        for i in range(6):
+            self.write(f"content/small-{i}.md", f"# Small {i}\n\nsome **bold** text {i}\n")
+        # one page much bigger than the others
+        self.write("content/big.md", "# Big\n\n" + "\n\n".join(f"paragraph {i} with a [link](/page-{i}) and _more_ words" for i in range(1000)))
+        self.template_path = self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.dest_dir = self.path("docs")
+        os.makedirs(self.dest_dir)
+        clear_inline_caches()
+
+    def tearDown(self):
+        set_profiler(None)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        super().tearDown()
+
+    def build(self, trace=False, top=10):
+        profiler = MemoryProfiler(trace, top)
+        set_profiler(profiler)
+        generate_pages_recursive(self.content, self.template_path, self.dest_dir)
+        set_profiler(None)
+        report = profiler.report()
+        profiler.stop()
+        return report
+
+    def test_report(self):
+        report = self.build()
+        self.assertFalse(tracemalloc.is_tracing())
+        memory = report["memory"]
+        self.assertEqual(memory["pages"]["count"], 7)
+        self.assertGreater(memory["traced_peak_bytes"], 0)
+        for name in ("read", "block parse", "serialize", "write"):
+            self.assertGreater(memory["stages"][name]["growth_bytes"], 0)
+        # what a stage added, not everything that was traced at the time
+        self.assertLess(memory["stages"]["walk"]["growth_bytes"], memory["traced_peak_bytes"] / 4)
+        self.assertLess(memory["stages"]["url rewrite"]["growth_bytes"], memory["stages"]["write"]["growth_bytes"])
+        # the timings are still there
+        self.assertEqual(report["pages"]["count"], 7)
+
+    def test_big_page_dominates(self):
+        memory = self.build()["memory"]
+        biggest = memory["largest_pages"][0]
+        self.assertTrue(biggest["source"].endswith("big.md"))
+        self.assertTrue(biggest["dominant"])
+        self.assertEqual(memory["dominant_pages"][0], biggest["source"])
+        self.assertTrue(biggest["call_sites"])
+        # compared with the page's start, so the page list of the walk isn't among them
+        self.assertFalse([site for site in biggest["call_sites"] if "discovery.py" in site["site"]])
+        self.assertIn("!! dominates memory", format_memory_report({"memory": memory}))
+
+    def test_call_sites(self):
+        memory = self.build(trace=True)["memory"]
+        sites = [site["site"] for page in memory["largest_pages"] for site in page["call_sites"]]
+        for stage in memory["stages"].values():
+            sites.extend(site["site"] for site in stage.get("call_sites", stage.get("page_call_sites")))
+        self.assertTrue(sites)
+        # the profilers' own allocations (e.g. the trace events) are left out
+        self.assertFalse([site for site in sites if "profiling.py" in site or "memprofile.py" in site])
+        # stages inside a page are compared with the page's start, the others with their own
+        self.assertIn("page_call_sites", memory["stages"]["write"])
+        self.assertIn("call_sites", memory["stages"]["walk"])
+
+    def test_largest_pages_are_kept(self):
+        memory = self.build(top=3)["memory"]
+        growths = [page["growth_bytes"] for page in memory["largest_pages"]]
+        self.assertEqual(len(growths), 3)
+        self.assertEqual(growths, sorted(growths, reverse=True))
+        self.assertEqual(growths[0], memory["pages"]["max_growth_bytes"])
+        self.assertTrue(memory["largest_pages"][0]["source"].endswith("big.md"))
+
+    def test_max_rss(self):
+        max_rss = max_rss_bytes()
+        if max_rss is not None:
+            self.assertGreater(max_rss, 1024 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
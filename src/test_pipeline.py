@@ -0,0 +1,133 @@
+import os
+import threading
+import unittest
+
+from pipeline import Pipeline, PipelineStage, format_pipeline_report
+from generate_page import generate_pages_recursive, generate_pages_targets, PageBuildError
+from manifest import BuildManifest
+from fixtures import TempDirTestCase
+
+
+class TestPipeline(unittest.TestCase):
+    def test_every_item_goes_through_every_stage(self):
+        done = []
+        lock = threading.Lock()
+
+        def finish(item):
+            with lock:
+                done.append(item)
+            return None, 1
+
+        pipeline = Pipeline([
+            PipelineStage("double", lambda item: (item * 2, 0), threads=3),
+            PipelineStage("add", lambda item: (item + 1, 0)),
+            PipelineStage("finish", finish, threads=2),
+        ], queue_size=2)
+        pipeline.run(range(100))
+        self.assertEqual(sorted(done), [i * 2 + 1 for i in range(100)])
+
+        report = pipeline.report()
+        self.assertEqual([stage["stage"] for stage in report["stages"]], ["walk", "double", "add", "finish"])
+        self.assertEqual([stage["items"] for stage in report["stages"]], [100] * 4)
+        self.assertEqual(report["stages"][3]["bytes"], 100)
+        self.assertIn(report["bottleneck"], ["walk", "double", "add", "finish"])
+        self.assertIn("bottleneck", format_pipeline_report(report))
+
+    def test_errors_drop_the_item(self):
+        errors = []
+
+        def check(item):
+            if item == 3:
+                raise ValueError("three")
+            return item, 0
+
+        done = []
+
+        def finish(item):
+            done.append(item)
+            return None, 0
+
+        pipeline = Pipeline(
+            [PipelineStage("check", check, threads=2), PipelineStage("finish", finish)],
+            on_error=lambda item, e: errors.append((item, str(e)))
+        )
+        pipeline.run(range(5))
+        self.assertEqual(errors, [(3, "three")])
+        self.assertEqual(sorted(done), [0, 1, 2, 4])
+
+    def test_source_errors_are_raised(self):
+        def source():
+            yield 1
+            raise ValueError("walk failed")
+
+        pipeline = Pipeline([PipelineStage("nothing", lambda item: (None, 0))])
+        with self.assertRaises(ValueError):
+            pipeline.run(source())
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            PipelineStage("none", lambda item: (None, 0), threads=0)
+        with self.assertRaises(ValueError):
+            Pipeline([], queue_size=0)
+
+
+class TestPipelinedBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content_dir = os.path.join(self.dir, "content")
+        self.template_path = self.write("template.html", '<title>{{ Title }}</title><link href="/index.css" />{{ Content }}')
+        self.write("content/index.md", "# Home\n\n[blog](/blog/one)")
+        for i in range(20):
+            self.write(f"content/blog/post{i}/index.md", f"# Post {i}\n\n![img](/images/{i}.png) and **bold**\n\n- a\n- list")
+
+    def build(self, name, **options):
+        targets = [("/", os.path.join(self.dir, name, "root")), ("site", os.path.join(self.dir, name, "site"))]
+        os.makedirs(targets[0][1])
+        report = generate_pages_targets(self.content_dir, self.template_path, targets, **options)
+        return report, [self.read_tree(dest_dir) for basepath, dest_dir in targets]
+
+    def test_output_matches_serial(self):
+        report, expected = self.build("serial")
+        self.assertIsNone(report)
+        self.assertEqual(len(expected[0]), 21)
+        for jobs in (1, 2):
+            report, files = self.build(f"pipeline{jobs}", pipeline=True, jobs=jobs, queue_size=2)
+            self.assertEqual(files, expected)
+            stages = {stage["stage"]: stage for stage in report["stages"]}
+            self.assertEqual(stages["walk"]["items"], 21)
+            self.assertEqual(stages["write"]["items"], 21)
+            self.assertEqual(stages["render"]["threads"], jobs)
+
+    def test_incremental(self):
+        manifest = BuildManifest(os.path.join(self.dir, "manifest.json"))
+        self.build("incremental", pipeline=True, manifest=manifest)
+        self.assertEqual(len(manifest.pages), 42)
+        dest_path = os.path.join(self.dir, "incremental", "site", "blog", "post1", "index.html")
+        mtime = os.stat(dest_path).st_mtime_ns
+
+        self.write("content/blog/post2/index.md", "# Post 2, edited")
+        targets = [("/", os.path.join(self.dir, "incremental", "root")), ("site", os.path.join(self.dir, "incremental", "site"))]
+        report = generate_pages_targets(self.content_dir, self.template_path, targets, manifest=manifest, pipeline=True)
+        stages = {stage["stage"]: stage for stage in report["stages"]}
+        # only the edited page got past reading
+        self.assertEqual(stages["read"]["items"], 21)
+        self.assertEqual(stages["write"]["items"], 1)
+        self.assertEqual(os.stat(dest_path).st_mtime_ns, mtime)
+        with open(os.path.join(self.dir, "incremental", "site", "blog", "post2", "index.html")) as f:
+            self.assertIn("Post 2, edited", f.read())
+
+    def test_errors_are_reported_per_page(self):
+        bad_path = self.write("content/blog/post2/index.md", "no title here")
+        dest_dir = os.path.join(self.dir, "docs")
+        os.mkdir(dest_dir)
+        for jobs in (1, 2):
+            with self.assertRaises(PageBuildError) as context:
+                generate_pages_recursive(self.content_dir, self.template_path, dest_dir, jobs=jobs, pipeline=True)
+            self.assertEqual(context.exception.errors[0][0], bad_path)
+            self.assertEqual(len(context.exception.errors), 1)
+            self.assertTrue(context.exception.errors[0][1].startswith("Exception: "))
+        self.assertTrue(os.path.exists(os.path.join(dest_dir, "blog", "post5", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
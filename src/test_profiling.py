@@ -0,0 +1,202 @@
+import os
+import json
+import threading
+import unittest
+
+import profiling
+from profiling import (
+    Profiler,
+    set_profiler,
+    stage,
+    timed_iter,
+    time_page,
+    span,
+    percentile,
+    format_report,
+    write_report,
+    write_trace,
+)
+from copystatic import copy_directory_contents
+from generate_page import render_page, generate_pages_recursive
+from template import compile_template_string
+from markdown_to_html import clear_inline_caches
+from fixtures import TempDirTestCase
+
+
+class TestProfiler(TempDirTestCase):
+    def tearDown(self):
+        set_profiler(None)
+        super().tearDown()
+
+    def test_nested_stages_are_not_counted_twice(self):
+        profiler = Profiler()
+        profiler.enter("write")
+        profiler.enter("template fill")
+        profiler.enter("block parse")
+        profiler.exit()
+        profiler.exit()
+        profiler.exit()
+        self.assertEqual(profiler.stack, [])
+        self.assertEqual(set(profiler.seconds), {"write", "template fill", "block parse"})
+        self.assertEqual(profiler.calls["block parse"], 1)
+
+    def test_not_profiling_does_nothing(self):
+        items = [1, 2, 3]
+        self.assertIs(timed_iter("read", items), items)
+        with stage("read"), time_page("a.md"):
+            pass
+        self.assertIsNone(profiling.get_profiler())
+
+    def test_timed_iter(self):
+        profiler = Profiler()
+        set_profiler(profiler)
+        self.assertEqual(list(timed_iter("block parse", iter([1, 2, 3]))), [1, 2, 3])
+        # one call for every item, and one to find the end
+        self.assertEqual(profiler.calls["block parse"], 4)
+        self.assertEqual(profiler.stack, [])
+
+    def test_stage_is_left_on_error(self):
+        profiler = Profiler()
+        set_profiler(profiler)
+        with self.assertRaises(ValueError):
+            with stage("read"):
+                raise ValueError("bad")
+        self.assertEqual(profiler.stack, [])
+
+    def test_merge_updates(self):
+        worker = Profiler()
+        with worker.stage("read"):
+            pass
+        worker.add_page("a.md", 0.5)
+        profiler = Profiler()
+        with profiler.stage("read"):
+            pass
+        profiler.merge_updates(worker.take_updates())
+        self.assertEqual(profiler.calls["read"], 2)
+        self.assertEqual(profiler.pages, [("a.md", 0.5)])
+        self.assertEqual((worker.seconds, worker.calls, worker.pages), ({}, {}, []))
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 95), 95.0)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_report(self):
+        profiler = Profiler()
+        for i in range(20):
+            profiler.add_page(f"{i}.md", i / 100)
+        with profiler.stage("write"):
+            pass
+        report = profiler.report(slowest=3)
+        self.assertEqual(report["pages"]["count"], 20)
+        self.assertEqual(report["pages"]["max_seconds"], 0.19)
+        self.assertEqual([page["source"] for page in report["slowest_pages"]], ["19.md", "18.md", "17.md"])
+        self.assertEqual(list(report["stages"]), ["write"])
+        self.assertIn("slowest pages:", format_report(report))
+
+        path = self.path("profile.json")
+        write_report(report, path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)["pages"]["count"], 20)
+
+
+class TestTrace(TempDirTestCase):
+    def tearDown(self):
+        set_profiler(None)
+        super().tearDown()
+
+    def test_no_trace_without_trace_option(self):
+        profiler = Profiler()
+        set_profiler(profiler)
+        with stage("read"), span("copy"):
+            pass
+        self.assertIsNone(profiler.events)
+        with self.assertRaises(ValueError):
+            profiler.trace()
+
+    def test_complete_events(self):
+        profiler = Profiler(trace=True)
+        set_profiler(profiler)
+        with time_page("a.md"):
+            with stage("write"):
+                with stage("template fill"):
+                    pass
+        events = [event for event in profiler.trace()["traceEvents"] if event["ph"] == "X"]
+        self.assertEqual([event["name"] for event in events], ["template fill", "write", "a.md"])
+        fill, write, page = events
+        # the trace shows the stages nested, i.e. their full duration
+        self.assertGreaterEqual(fill["ts"], write["ts"])
+        self.assertLessEqual(fill["ts"] + fill["dur"], write["ts"] + write["dur"] + 0.001)
+        self.assertEqual(page["args"], {"source": "a.md"})
+        self.assertEqual(page["pid"], os.getpid())
+
+    def test_copies_are_spans_on_their_threads(self):
+        profiler = Profiler(trace=True)
+        set_profiler(profiler)
+        for i in range(4):
+            self.write(f"static/{i}.txt", str(i))
+        copy_directory_contents(self.path("static"), self.path("docs"), threads=2)
+        path = self.path("trace.json")
+        write_trace(profiler, path)
+        with open(path) as f:
+            events = json.load(f)["traceEvents"]
+        copies = [event for event in events if event["name"] == "copy"]
+        self.assertEqual(len(copies), 4)
+        self.assertTrue(all(event["tid"] != threading.get_native_id() for event in copies))
+        self.assertEqual(sorted(os.path.basename(event["args"]["source"]) for event in copies), ["0.txt", "1.txt", "2.txt", "3.txt"])
+
+
+class TestProfiledBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self.path("content")
+        self.write("content/index.md", "# Home\n\nsome **bold** [link](/blog/)\n")
+        self.write("content/blog/index.md", "# Blog\n\n- one\n- two\n")
+        self.template_path = self.write("template.html", '<title>{{ Title }}</title><a href="/">home</a>{{ Content }}')
+
+    def tearDown(self):
+        set_profiler(None)
+        super().tearDown()
+
+    def test_same_html_when_profiling(self):
+        template = compile_template_string("<title>{{ Title }}</title>{{ Content }}")
+        markdown = "# Title\n\n**a** [b](/c)\n\n```\ncode\n```"
+        expected = render_page(markdown, template, "/blog/")
+        set_profiler(Profiler())
+        self.assertEqual(render_page(markdown, template, "/blog/"), expected)
+
+    def test_stages_and_pages(self):
+        for jobs in (1, 2):
+            # repeated inline text isn't parsed again (see inline_cache_info)
+            clear_inline_caches()
+            profiler = Profiler()
+            set_profiler(profiler)
+            dest_dir = os.path.join(self.dir, f"docs{jobs}")
+            os.makedirs(dest_dir)
+            generate_pages_recursive(self.content, self.template_path, dest_dir, jobs=jobs)
+            set_profiler(None)
+            report = profiler.report()
+            self.assertEqual(report["pages"]["count"], 2)
+            for name in ("walk", "read", "block parse", "inline parse", "serialize", "template fill", "url rewrite", "write"):
+                self.assertIn(name, report["stages"])
+            self.assertEqual(report["stages"]["read"]["calls"], 2)
+
+    def test_trace_has_the_workers(self):
+        profiler = Profiler(trace=True)
+        set_profiler(profiler)
+        dest_dir = os.path.join(self.dir, "docs")
+        os.makedirs(dest_dir)
+        generate_pages_recursive(self.content, self.template_path, dest_dir, jobs=2)
+        set_profiler(None)
+        events = profiler.trace()["traceEvents"]
+        pages = [event for event in events if event.get("cat") == "page"]
+        self.assertEqual(len(pages), 2)
+        self.assertNotIn(os.getpid(), [event["pid"] for event in pages])
+        process_names = [event["args"]["name"] for event in events if event["ph"] == "M"]
+        self.assertIn("build", process_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+import generate_page
+from markdown_blocks import scan_blocks
+from markdown_to_html import markdown_to_html, iter_markdown_html
+from render_cache import BlockCache
+from urls import UrlResolver
+from fixtures import TempDirTestCase
+
+
+class TestBlockCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_path = self.path("cache.sqlite")
+        self.markdown = "# Title\n\nsome **bold** [link](/a)\n\n- one\n- two\n\n```\ncode\n```"
+
+    def render(self, cache, markdown=None, resolver=None):
+        return "".join(iter_markdown_html(markdown or self.markdown, resolver, cache))
+
+    def test_cached_html_is_the_same(self):
+        cache = BlockCache(self.cache_path)
+        self.assertEqual(self.render(cache), markdown_to_html(self.markdown))
+        cache.close()
+        cache = BlockCache(self.cache_path)
+        self.assertEqual(self.render(cache), markdown_to_html(self.markdown))
+        self.assertEqual((cache.hits, cache.misses), (4, 0))
+        cache.close()
+
+    def test_only_changed_blocks_are_rendered(self):
+        cache = BlockCache(self.cache_path)
+        self.render(cache)
+        cache.flush()
+        cache.take_updates()
+        edited = self.markdown.replace("some **bold**", "some more **bold**")
+        self.assertEqual(self.render(cache, edited), markdown_to_html(edited))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+        cache.close()
+
+    def test_resolver_is_part_of_the_key(self):
+        cache = BlockCache(self.cache_path)
+        self.render(cache, resolver=UrlResolver("/"))
+        html = self.render(cache, resolver=UrlResolver("/site/"))
+        self.assertIn('href="/site/a"', html)
+        cache.close()
+
+    def test_lru_eviction(self):
+        cache = BlockCache(self.cache_path, max_bytes=10 ** 6)
+        blocks = list(scan_blocks("\n\n".join(f"paragraph {i} " + "x" * 100 for i in range(10))))
+        for block in blocks[:5]:
+            cache.render_block(block, None, lambda block, resolver: block.text)
+        cache.flush()
+        for block in blocks[5:]:
+            cache.render_block(block, None, lambda block, resolver: block.text)
+        cache.flush()
+        cache.max_bytes = 5 * 115
+        self.assertEqual(cache.evict(), 5)
+        # the oldest blocks went first
+        self.assertIsNone(cache.get(cache.block_key(blocks[0], None)))
+        self.assertIsNotNone(cache.get(cache.block_key(blocks[9], None)))
+        cache.close()
+
+    def test_worker_updates_are_merged(self):
+        cache = BlockCache(self.cache_path)
+        worker_cache = BlockCache(self.cache_path, read_only=True)
+        self.render(worker_cache)
+        cache.merge_updates(worker_cache.take_updates())
+        worker_cache.close()
+        self.assertEqual(cache.misses, 4)
+        cache.close()
+        cache = BlockCache(self.cache_path)
+        self.render(cache)
+        self.assertEqual(cache.hits, 4)
+        cache.close()
+
+    def test_workers_open_their_own_read_only_cache(self):
+        cache = BlockCache(self.cache_path)
+        with generate_page._worker_pool(2, {}, [], cache) as executor:
+            states = list(executor.map(worker_cache_state, [id(cache.connection)] * 4))
+        cache.close()
+        self.assertEqual(states, [(True, True, self.cache_path)] * 4)
+
+
+def worker_cache_state(parent_connection_id):
+    # runs in a worker process: is its cache read only, and on a connection other than the parent's?
+    cache = generate_page._worker_cache
+    return cache.read_only, id(cache.connection) != parent_connection_id, cache.path
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import unittest
+
+from template import (
+    compile_template,
+    compile_template_string,
+    find_layout,
+    LAYOUT_FILENAME,
+)
+from fixtures import TempDirTestCase
+
+
+class TestCompileTemplate(TempDirTestCase):
+    def test_segments_and_slots(self):
+        template = compile_template_string("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertListEqual(template.segments, ["<title>", "</title><main>", "</main>"])
+        self.assertListEqual(template.slots, ["Title", "Content"])
+
+    def test_render(self):
+        template = compile_template_string("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(
+            template.render({"Title": "Hello", "Content": "<p>hi</p>"}),
+            "<title>Hello</title><main><p>hi</p></main>"
+        )
+
+    def test_render_extra_and_missing_slots(self):
+        template = compile_template_string("{{ SiteName }} | {{ Title }} | {{ Unknown }}")
+        self.assertEqual(
+            template.render({"Title": "Hello", "SiteName": "Tolkien Fan Club"}),
+            "Tolkien Fan Club | Hello | {{ Unknown }}"
+        )
+
+    def test_slot_value_is_not_rescanned(self):
+        template = compile_template_string("<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(
+            template.render({"Title": "{{ Content }}", "Content": "body"}),
+            "<h1>{{ Content }}</h1>body"
+        )
+
+    def test_partials(self):
+        self.write("header.html", "<header>{{ Title }}</header>")
+        path = self.write("page.html", "{{> header.html }}<main>{{ Content }}</main>")
+        template = compile_template(path)
+        self.assertEqual(
+            template.render({"Title": "Hi", "Content": "body"}),
+            "<header>Hi</header><main>body</main>"
+        )
+        self.assertEqual(len(template.dependencies), 2)
+
+    def test_partial_cycle(self):
+        path = self.write("loop.html", "{{> loop.html }}")
+        with self.assertRaises(ValueError):
+            compile_template(path)
+
+    def test_cache_and_invalidation(self):
+        path = self.write("page.html", "<main>{{ Content }}</main>")
+        first = compile_template(path)
+        self.assertIs(compile_template(path), first)
+
+        self.bump_mtime(self.write("page.html", "<article>{{ Content }}</article>"))
+        second = compile_template(path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.render({"Content": "x"}), "<article>x</article>")
+
+    def test_find_layout(self):
+        section = os.path.join(self.dir, "blog")
+        os.mkdir(section)
+        self.assertEqual(find_layout(section, "template.html"), "template.html")
+        layout_path = os.path.join(section, LAYOUT_FILENAME)
+        with open(layout_path, "w") as f:
+            f.write("{{ Content }}")
+        self.assertEqual(find_layout(section, "template.html"), layout_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from textnode import TextNode, TextType, text_node_to_html_node
+from textnode import TextNode, FrozenTextNode, TextType, text_node_to_html_node
 
 
 class TestTextNode(unittest.TestCase):
@@ -31,6 +31,19 @@ class TestTextNode(unittest.TestCase):
             repr(node)
         )
 
+    def test_no_instance_dict(self):
+        node = TextNode("This is a text node", TextType.NORMAL)
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
+    def test_frozen(self):
+        node = FrozenTextNode("This is a text node", TextType.LINK, "https://www.boot.dev")
+        self.assertEqual(node, TextNode("This is a text node", TextType.LINK, "https://www.boot.dev"))
+        self.assertEqual(hash(node), hash(FrozenTextNode("This is a text node", TextType.LINK, "https://www.boot.dev")))
+        with self.assertRaises(AttributeError):
+            node.text = "changed"
+
 
 class TestTextNodeToHTMLNode(unittest.TestCase):
     def test_text(self):
@@ -0,0 +1,50 @@
+import pickle
+import unittest
+
+from urls import UrlResolver, ROOT_RESOLVER, MARKER_RESOLVER, split_marked_urls, patch_marked_urls
+
+
+class TestUrlResolver(unittest.TestCase):
+    def test_resolve(self):
+        resolver = UrlResolver("/site/", {"/index.css": "/index.11111111.css"})
+        self.assertEqual(resolver.resolve("/blog/"), "/site/blog/")
+        self.assertEqual(resolver.resolve("/index.css?v=2"), "/site/index.11111111.css?v=2")
+        self.assertEqual(resolver.resolve("images/a.png"), "images/a.png")
+        self.assertEqual(resolver.resolve("https://a.b/"), "https://a.b/")
+        self.assertEqual(resolver.resolve("//cdn.a.b/x.js"), "//cdn.a.b/x.js")
+        self.assertEqual(ROOT_RESOLVER.resolve("/blog/"), "/blog/")
+
+    def test_resolve_attributes(self):
+        resolver = UrlResolver("/site/")
+        self.assertEqual(
+            resolver.resolve_attributes('<a href="/x">a</a><img src="/i.png" /><a href="https://a.b/">c</a>'),
+            '<a href="/site/x">a</a><img src="/site/i.png" /><a href="https://a.b/">c</a>'
+        )
+
+    def test_hashable_and_picklable(self):
+        resolver = UrlResolver("/site/", {"/a.css": "/a.1.css"})
+        self.assertEqual(resolver, UrlResolver("/site/", {"/a.css": "/a.1.css"}))
+        self.assertNotEqual(resolver, UrlResolver("/site/"))
+        self.assertEqual(len({resolver, UrlResolver("/site/", {"/a.css": "/a.1.css"})}), 1)
+        copy = pickle.loads(pickle.dumps(resolver))
+        self.assertEqual(copy, resolver)
+        self.assertEqual(copy.resolve("/a.css"), "/site/a.1.css")
+
+    def test_marked_urls(self):
+        html = MARKER_RESOLVER.resolve_attributes('<a href="/x">a</a><a href="y">b</a><img src="/i.png" />')
+        parts = split_marked_urls(html)
+        self.assertEqual(parts[1::2], ["/x", "/i.png"])
+        for resolver in (ROOT_RESOLVER, UrlResolver("/site/", {"/i.png": "/i.1.png"})):
+            self.assertEqual(
+                "".join(patch_marked_urls(parts, resolver)),
+                resolver.resolve_attributes('<a href="/x">a</a><a href="y">b</a><img src="/i.png" />')
+            )
+        self.assertEqual(pickle.loads(pickle.dumps(MARKER_RESOLVER)), MARKER_RESOLVER)
+
+    def test_basepath_must_be_normalized(self):
+        with self.assertRaises(ValueError):
+            UrlResolver("site")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+import watch
+from watch import TreeWatcher, SiteBuilder, LiveReloadState
+from fixtures import TempDirTestCase
+
+
+class TestTreeWatcher(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/post.md", "# Post")
+        self.watcher = TreeWatcher([os.path.join(self.dir, "content")])
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.poll(), set())
+
+    def test_modified_file(self):
+        path = self.write("content/blog/post.md", "# Post, edited")
+        self.bump_mtime(path)
+        self.assertEqual(self.watcher.poll(), {path})
+        self.assertEqual(self.watcher.poll(), set())
+
+    def test_added_and_removed_files(self):
+        added = self.write("content/blog/new/index.md", "# New")
+        self.bump_mtime(self.path("content/blog"))
+        self.assertEqual(self.watcher.poll(), {added})
+
+        os.remove(self.path("content/index.md"))
+        self.bump_mtime(self.path("content"))
+        self.assertEqual(self.watcher.poll(), {self.path("content/index.md")})
+
+    def test_removed_directory(self):
+        os.remove(self.path("content/blog/post.md"))
+        os.rmdir(self.path("content/blog"))
+        self.assertEqual(
+            self.watcher.poll(),
+            {self.path("content/blog"), self.path("content/blog/post.md")}
+        )
+
+    def test_edit_within_the_same_mtime_tick(self):
+        path = self.path("content/blog/post.md")
+        now_ns = time.time_ns()
+        os.utime(path, ns=(now_ns, now_ns))
+        os.utime(self.path("content/blog"), ns=(now_ns, now_ns))
+        self.watcher = TreeWatcher([os.path.join(self.dir, "content")])
+        # same size, same mtime, other content
+        self.write("content/blog/post.md", "# Tsop")
+        os.utime(path, ns=(now_ns, now_ns))
+        self.assertEqual(self.watcher.poll(), {path})
+        self.assertEqual(self.watcher.poll(), set())
+
+        added = self.write("content/blog/new.md", "# New")
+        os.utime(self.path("content/blog"), ns=(now_ns, now_ns))
+        self.assertEqual(self.watcher.poll(), {added})
+
+    def test_old_mtimes_are_trusted(self):
+        path = self.path("content/blog/post.md")
+        os.utime(path, ns=(0, 1_000_000_000))
+        self.watcher = TreeWatcher([os.path.join(self.dir, "content")])
+        self.assertIsNone(self.watcher.files[path][2])
+        self.assertEqual(self.watcher.poll(), set())
+
+
+class TestSiteBuilder(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home")
+        self.write("content/blog/post.md", "# Post")
+        self.write("static/index.css", "body {}")
+        self.patches = [
+            mock.patch.object(watch, "dir_path_content", self.path("content")),
+            mock.patch.object(watch, "dir_path_static", self.path("static")),
+            mock.patch.object(watch, "dir_path_public", self.path("docs")),
+            mock.patch.object(watch, "template_path", self.path("template.html")),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.builder = SiteBuilder("/", self.path("manifest.json"))
+        self.builder.build_all()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        super().tearDown()
+
+    def rebuild(self, *names):
+        with mock.patch.object(self.builder, "_build_all_pages", wraps=self.builder._build_all_pages) as build_all_pages:
+            written = self.builder.rebuild({self.path(name) for name in names})
+        return written, build_all_pages.called
+
+    def test_other_files_in_content_are_ignored(self):
+        self.write("content/.index.md.swp", "swap")
+        self.write("content/index.md~", "# Home, backup")
+        os.mkdir(self.path("content/drafts"))
+        self.assertEqual(
+            self.rebuild("content/.index.md.swp", "content/index.md~", "content/drafts", "content/blog/4913"),
+            (False, False)
+        )
+
+    def test_removed_directory(self):
+        os.remove(self.path("content/blog/post.md"))
+        os.rmdir(self.path("content/blog"))
+        self.assertEqual(self.rebuild("content/blog", "content/blog/post.md"), (True, False))
+        self.assertFalse(os.path.exists(self.path("docs/blog/post.html")))
+        self.assertTrue(os.path.exists(self.path("docs/index.html")))
+
+    def test_layout_rebuilds_every_page(self):
+        self.write("content/blog/_layout.html", "<main>{{ Content }}</main>")
+        self.assertEqual(self.rebuild("content/blog/_layout.html"), (True, True))
+        with open(self.path("docs/blog/post.html")) as f:
+            self.assertIn("<main>", f.read())
+
+
+class TestLiveReloadState(unittest.TestCase):
+    def test_wait_for_change(self):
+        state = LiveReloadState()
+        self.assertEqual(state.wait_for_change(0, timeout=0), 0)
+        state.bump()
+        self.assertEqual(state.wait_for_change(0, timeout=0), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
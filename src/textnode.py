@@ -11,6 +11,9 @@ class TextType(Enum):
 
 
 class TextNode():
+    # no per-instance __dict__: one TextNode is created for every inline span of every page
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type: TextType, url=None):
         self.text = text
         if not isinstance(text_type, TextType):
@@ -29,7 +32,30 @@ class TextNode():
         return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
 
 
-def text_node_to_html_node(text_node):
+class FrozenTextNode(TextNode):
+    """
+    An immutable (and hashable) TextNode, e.g. for results that are shared between callers.
+    """
+    __slots__ = ()
+
+    def __init__(self, text, text_type: TextType, url=None):
+        if not isinstance(text_type, TextType):
+            raise ValueError("text_type passed into TextNode must be a TextType enum")
+        object.__setattr__(self, "text", text)
+        object.__setattr__(self, "text_type", text_type)
+        object.__setattr__(self, "url", url)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __hash__(self):
+        return hash((self.text, self.text_type, self.url))
+
+
+def text_node_to_html_node(text_node, resolver=None):
     """
     It should handle each type of the TextType enum. 
     If it gets a TextNode that is none of those types, it should raise an exception. 
@@ -41,6 +67,8 @@ def text_node_to_html_node(text_node):
     TextType.CODE: "code" tag, text
     TextType.LINK: "a" tag, anchor text, and "href" prop
     TextType.IMAGE: "img" tag, empty string value, "src" and "alt" props ("src" is the image URL, "alt" is the alt text)
+
+    An optional urls.UrlResolver resolves the href and src URLs (e.g. adds the basepath).
     """
     tag, value, props = None, None, None
     match text_node.text_type:
@@ -53,9 +81,11 @@ def text_node_to_html_node(text_node):
         case TextType.CODE:
             tag, value = "code", text_node.text
         case TextType.LINK:
-            tag, value, props = "a", text_node.text, { "href": text_node.url }
+            url = resolver.resolve(text_node.url) if resolver is not None else text_node.url
+            tag, value, props = "a", text_node.text, { "href": url }
         case TextType.IMAGE:
-            tag, value, props = "img", None, { "src": text_node.url, "alt": text_node.text }
+            url = resolver.resolve(text_node.url) if resolver is not None else text_node.url
+            tag, value, props = "img", None, { "src": url, "alt": text_node.text }
         case _:
             raise ValueError("TextNode text_type must be a TextType enum")
     
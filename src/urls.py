@@ -0,0 +1,123 @@
+import re
+
+from manifest import hash_context
+
+"""
+Resolving the site's own urls: a root-relative url like "/images/tom.png" gets the
+basepath in front (and, with fingerprinted assets, becomes the asset's hashed url).
+
+This is applied where urls are created (link and image props while building the
+html, and href/src attributes when a template is resolved) rather than by searching
+the finished page, so text that only looks like a url (e.g. inside a code sample)
+is left alone and the page's content never has to be scanned.
+"""
+
+# href and src attributes with a root-relative url, in a template's static html
+ROOT_URL_ATTRIBUTE_PATTERN = re.compile(r'(href|src)="(/[^"]*)"')
+
+
+class UrlResolver():
+    """
+    Resolves root-relative urls for one basepath and (optional) asset map
+    from assets.fingerprint_directory. Resolvers with the same basepath and assets
+    are equal and hash the same, so they can be used as cache keys; they can also
+    be pickled and sent to worker processes.
+    """
+    __slots__ = ("basepath", "assets", "assets_hash", "key")
+
+    def __init__(self, basepath="/", assets=None):
+        if not basepath.startswith("/") or not basepath.endswith("/"):
+            raise ValueError(f'basepath must begin and end with "/": {basepath}')
+        self.basepath = basepath
+        self.assets = assets if assets else None
+        self.assets_hash = hash_context(self.assets)
+        # identifies what this resolver does, e.g. for caching html rendered with it
+        self.key = f"{basepath}|{self.assets_hash}"
+
+    def resolve(self, url):
+        """ the url to put in the html for a url from the markdown or the template """
+        if not url.startswith("/") or url.startswith("//"):
+            return url # relative, external or protocol-relative: nothing to do
+        if self.assets is not None:
+            path, suffix = split_url_suffix(url)
+            asset_url = self.assets.get(path)
+            if asset_url is not None:
+                url = asset_url + suffix
+        if self.basepath == "/":
+            return url
+        return self.basepath + url[1:]
+
+    def resolve_attributes(self, html):
+        """ resolve the urls of the href="/..." and src="/..." attributes in a piece of html """
+        return ROOT_URL_ATTRIBUTE_PATTERN.sub(
+            lambda match: f'{match.group(1)}="{self.resolve(match.group(2))}"',
+            html
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, UrlResolver) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __reduce__(self):
+        return (UrlResolver, (self.basepath, self.assets))
+
+    def __repr__(self):
+        return f"UrlResolver({self.basepath!r}, {len(self.assets or {})} assets)"
+
+
+# resolves every url to itself
+ROOT_RESOLVER = UrlResolver("/")
+
+# wraps the urls marked by MarkerResolver; can't appear in html written by hand
+URL_MARKER = "\x00"
+
+
+class MarkerResolver(UrlResolver):
+    """
+    Marks every root-relative url in the html instead of resolving it ("/x" -> "\x00/x\x00"),
+    so a page can be rendered once and then be given any number of basepaths
+    with split_marked_urls() and patch_marked_urls().
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__("/")
+        self.key = "|marker|"
+
+    def resolve(self, url):
+        if not url.startswith("/") or url.startswith("//"):
+            return url
+        return URL_MARKER + url + URL_MARKER
+
+    def __reduce__(self):
+        return (MarkerResolver, ())
+
+
+MARKER_RESOLVER = MarkerResolver()
+
+
+def split_marked_urls(html):
+    """
+    Split html rendered with MARKER_RESOLVER into a list alternating between
+    html and the marked urls: [html, url, html, url, ..., html].
+    """
+    return html.split(URL_MARKER)
+
+
+def patch_marked_urls(parts, resolver):
+    """ yield the html from split_marked_urls with its urls resolved by resolver """
+    for i in range(len(parts)):
+        if i % 2:
+            yield resolver.resolve(parts[i])
+        else:
+            yield parts[i]
+
+
+def split_url_suffix(url):
+    """ split "/a.css?v=1#x" into ("/a.css", "?v=1#x") """
+    for i in range(len(url)):
+        if url[i] in "?#":
+            return url[:i], url[i:]
+    return url, ""
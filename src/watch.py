@@ -0,0 +1,406 @@
+import os
+import sys
+import stat
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from copystatic import sync_directory_contents, sync_file, remove_synced_file
+from discovery import RACY_SECONDS
+from generate_page import generate_page, generate_pages_recursive, normalize_basepath, PageBuildError
+from manifest import BuildManifest, hash_file
+from template import find_layout, LAYOUT_FILENAME
+
+"""
+Watch mode: build the site, serve ./docs, and rebuild whatever changed
+in content/, static/ or the template while the browser reloads itself.
+
+    python3 src/watch.py [basepath] [--port 8888]
+"""
+
+dir_path_static = "./static"
+dir_path_content = "./content"
+dir_path_public = "./docs"
+template_path = "./template.html"
+build_manifest_path = "./.build_manifest.json"
+
+# the dev server streams a message on this path whenever a rebuild finished
+LIVERELOAD_PATH = "/__livereload"
+LIVERELOAD_SCRIPT = (
+    f'<script>new EventSource("{LIVERELOAD_PATH}").onmessage = function () {{ location.reload(); }};</script>'
+)
+
+
+class TreeWatcher():
+    """
+    Polls a set of files and directories for changes.
+    Every poll is a stat sweep of every known directory and file: editing a file in place
+    doesn't change its directory's mtime, so only a stat of the file itself can tell.
+    What a poll saves is reading the directories: only those whose mtime changed
+    (an entry was added, removed or renamed) are listed again.
+
+    Like discovery.DirectorySnapshot, an mtime seen less than RACY_SECONDS after it was set
+    isn't trusted: the entry could still change within the same mtime tick. Such a directory
+    is listed again on the next poll, and such a file is hashed and compared by content.
+    """
+    def __init__(self, paths):
+        self.roots = [os.path.normpath(path) for path in paths]
+        self.dirs = {} # dir path -> mtime_ns (None while it is racy)
+        self.children = {} # dir path -> set of entry names
+        self.files = {} # file path -> (mtime_ns, size, sha256 while it is racy else None)
+        self.racy_ns = time.time_ns() - RACY_SECONDS * 1_000_000_000
+        for root in self.roots:
+            self._add(root, None)
+
+    def poll(self):
+        """ return the set of paths that were added, modified or removed since the last poll """
+        changes = set()
+        self.racy_ns = time.time_ns() - RACY_SECONDS * 1_000_000_000
+
+        for dir_path in list(self.dirs):
+            if dir_path not in self.dirs:
+                continue # removed along with its parent during this poll
+            try:
+                dir_stat = os.stat(dir_path)
+            except FileNotFoundError:
+                self._remove(dir_path, changes)
+                continue
+            if dir_stat.st_mtime_ns == self.dirs[dir_path]:
+                continue
+            self.dirs[dir_path] = self._dir_mtime(dir_stat)
+            known = self.children[dir_path]
+            current = set(os.listdir(dir_path))
+            for name in current - known:
+                self._add(os.path.join(dir_path, name), changes)
+            for name in known - current:
+                self._remove(os.path.join(dir_path, name), changes)
+
+        for file_path, signature in list(self.files.items()):
+            if file_path not in self.files:
+                continue
+            try:
+                file_stat = os.stat(file_path)
+            except FileNotFoundError:
+                self._remove(file_path, changes)
+                continue
+            try:
+                if (file_stat.st_mtime_ns, file_stat.st_size) != signature[:2]:
+                    changes.add(file_path)
+                elif signature[2] is None:
+                    continue
+                elif hash_file(file_path) != signature[2]:
+                    # edited within the same mtime tick
+                    changes.add(file_path)
+                self.files[file_path] = self._file_signature(file_path, file_stat)
+            except FileNotFoundError:
+                self._remove(file_path, changes)
+
+        # a root that didn't exist yet (or was deleted and recreated)
+        for root in self.roots:
+            if root not in self.dirs and root not in self.files:
+                self._add(root, changes)
+
+        return changes
+
+    def watch_file(self, path):
+        """ start watching an extra file, e.g. a template partial outside the watched directories """
+        path = os.path.normpath(path)
+        if path not in self.files and path not in self.roots:
+            self.roots.append(path)
+            self._add(path, None)
+
+    def _add(self, path, changes):
+        try:
+            path_stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        parent = os.path.dirname(path)
+        if parent in self.children:
+            self.children[parent].add(os.path.basename(path))
+        if stat.S_ISDIR(path_stat.st_mode):
+            self.dirs[path] = self._dir_mtime(path_stat)
+            self.children[path] = set()
+            for name in os.listdir(path):
+                self._add(os.path.join(path, name), changes)
+        else:
+            try:
+                self.files[path] = self._file_signature(path, path_stat)
+            except FileNotFoundError:
+                return
+            if changes is not None:
+                changes.add(path)
+
+    def _dir_mtime(self, dir_stat):
+        # a racy directory is saved without its mtime, so it is listed again next time
+        if dir_stat.st_mtime_ns >= self.racy_ns:
+            return None
+        return dir_stat.st_mtime_ns
+
+    def _file_signature(self, path, file_stat):
+        # a racy file is hashed as well, to tell an edit within the same mtime tick
+        digest = hash_file(path) if file_stat.st_mtime_ns >= self.racy_ns else None
+        return (file_stat.st_mtime_ns, file_stat.st_size, digest)
+
+    def _remove(self, path, changes):
+        parent = os.path.dirname(path)
+        if parent in self.children:
+            self.children[parent].discard(os.path.basename(path))
+        if path in self.dirs:
+            for name in list(self.children[path]):
+                self._remove(os.path.join(path, name), changes)
+            del self.dirs[path]
+            del self.children[path]
+        else:
+            self.files.pop(path, None)
+        changes.add(path)
+
+
+class SiteBuilder():
+    """
+    Builds the site once and then rebuilds only what a set of changed paths affects,
+    using the incremental build manifest.
+    """
+    def __init__(self, basepath="/", manifest_path=build_manifest_path):
+        self.basepath = normalize_basepath(basepath)
+        self.manifest = BuildManifest.load(manifest_path)
+
+    def build_all(self):
+        sync_directory_contents(dir_path_static, dir_path_public, self.manifest.static)
+        self._build_all_pages()
+        self.manifest.save()
+
+    def rebuild(self, changed_paths):
+        """ rebuild the outputs affected by changed_paths; returns True if any output was written """
+        changed_pages = []
+        all_pages = False
+        written = False
+
+        for path in sorted(changed_paths):
+            if _is_within(path, dir_path_static):
+                self._sync_static_path(path)
+                written = True
+            elif _is_within(path, dir_path_content):
+                # only pages and section layouts matter, not directories (added or removed,
+                # their pages are in changed_paths too), editor swap files or backups
+                if os.path.isdir(path):
+                    continue
+                if path.endswith(".md"):
+                    changed_pages.append(path)
+                elif os.path.basename(path) == LAYOUT_FILENAME:
+                    all_pages = True
+            else:
+                # the template or one of its partials:
+                # rebuild every page (the manifest skips the ones that don't use it)
+                all_pages = True
+
+        if all_pages:
+            written = self._build_all_pages() or written
+        else:
+            for path in changed_pages:
+                written = self._build_page(path) or written
+
+        self.manifest.save()
+        return written
+
+    def template_paths(self):
+        """ every template file the pages currently depend on (including partials) """
+        paths = set()
+        for record in self.manifest.pages.values():
+            paths.update(record.get("template_dependencies", []))
+        return paths
+
+    def _build_all_pages(self):
+        before = dict(self.manifest.pages)
+        self.manifest.start_build()
+        try:
+            generate_pages_recursive(
+                dir_path_content,
+                template_path,
+                dir_path_public,
+                basepath=self.basepath,
+                manifest=self.manifest
+            )
+        except PageBuildError as e:
+            print(e)
+            return True
+        self.manifest.prune_pages(dir_path_public)
+        return before != self.manifest.pages
+
+    def _build_page(self, from_path):
+        dest_path = _dest_path_for(from_path)
+        if not os.path.exists(from_path):
+            if os.path.isfile(dest_path):
+                os.remove(dest_path)
+            self.manifest.remove_page(dest_path)
+            print(f"Removed {dest_path}")
+            return True
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        try:
+            written = generate_page(
+                from_path,
+                _template_path_for(from_path),
+                dest_path,
+                basepath=self.basepath,
+                manifest=self.manifest
+            )
+        except Exception as e:
+            print(f"{from_path}: {type(e).__name__}: {e}")
+            return False
+        if written:
+            print(f"Rebuilt {dest_path}")
+        return written
+
+    def _sync_static_path(self, source_path):
+        dest_path = os.path.join(dir_path_public, os.path.relpath(source_path, dir_path_static))
+        if os.path.isfile(source_path):
+            if sync_file(source_path, dest_path, self.manifest.static):
+                print(f"Copied {dest_path}")
+        elif not os.path.exists(source_path):
+            # a removed file, or a removed directory along with everything synced into it
+            dest_prefix = os.path.normpath(dest_path) + os.sep
+            for synced_path in list(self.manifest.static):
+                if synced_path == os.path.normpath(dest_path) or synced_path.startswith(dest_prefix):
+                    remove_synced_file(synced_path, self.manifest.static, dir_path_public)
+            print(f"Removed {dest_path}")
+
+
+class LiveReloadState():
+    """ a build counter that the dev server's clients wait on """
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def bump(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version
+
+
+def make_dev_server(directory, port, reload_state):
+    class DevServerHandler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def do_GET(self):
+            if self.path == LIVERELOAD_PATH:
+                return self.send_livereload_events()
+            path = self.translate_path(self.path)
+            if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+                path = os.path.join(path, "index.html")
+            if path.endswith(".html") and os.path.isfile(path):
+                return self.send_html_with_livereload(path)
+            return super().do_GET()
+
+        def send_html_with_livereload(self, path):
+            with open(path, "rb") as f:
+                html = f.read()
+            script = LIVERELOAD_SCRIPT.encode()
+            body_end = html.rfind(b"</body>")
+            if body_end == -1:
+                html += script
+            else:
+                html = html[:body_end] + script + html[body_end:]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(html)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(html)
+
+        def send_livereload_events(self):
+            # a server-sent event stream: one "reload" message per finished rebuild
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            version = reload_state.version
+            try:
+                while True:
+                    new_version = reload_state.wait_for_change(version, timeout=15)
+                    if new_version != version:
+                        version = new_version
+                        self.wfile.write(b"data: reload\n\n")
+                    else:
+                        self.wfile.write(b": ping\n\n") # keeps the connection alive
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            if self.path != LIVERELOAD_PATH:
+                super().log_message(format, *args)
+
+    return ThreadingHTTPServer(("", port), DevServerHandler)
+
+
+def watch(basepath="/", port=8888, interval=0.5):
+    builder = SiteBuilder(basepath)
+    print("Building the site...")
+    builder.build_all()
+
+    watcher = TreeWatcher([dir_path_content, dir_path_static, template_path])
+    for path in builder.template_paths():
+        watcher.watch_file(path)
+
+    reload_state = LiveReloadState()
+    server = make_dev_server(dir_path_public, port, reload_state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving {dir_path_public} on http://localhost:{port}/ (watching for changes, Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(interval)
+            changes = watcher.poll()
+            if not changes:
+                continue
+            if builder.rebuild(changes):
+                reload_state.bump()
+            for path in builder.template_paths():
+                watcher.watch_file(path)
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        server.shutdown()
+
+
+def _is_within(path, dir_path):
+    path = os.path.abspath(path)
+    dir_path = os.path.abspath(dir_path)
+    return os.path.commonpath([path, dir_path]) == dir_path
+
+
+def _dest_path_for(from_path):
+    rel_path = os.path.relpath(from_path, dir_path_content)
+    return os.path.join(dir_path_public, os.path.splitext(rel_path)[0] + ".html")
+
+
+def _template_path_for(from_path):
+    # apply the section layouts from the content root down to the page's directory,
+    # the same way generate_pages_recursive does
+    page_template_path = find_layout(dir_path_content, template_path)
+    rel_dir = os.path.relpath(os.path.dirname(from_path), dir_path_content)
+    dir_path = dir_path_content
+    if rel_dir != ".":
+        for part in rel_dir.split(os.sep):
+            dir_path = os.path.join(dir_path, part)
+            page_template_path = find_layout(dir_path, page_template_path)
+    return page_template_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the site, serve ./docs and rebuild on changes")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls for changes (default: 0.5)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    watch(args.basepath, args.port, args.interval)
+
+
+if __name__ == "__main__":
+    main()
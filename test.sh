@@ -1 +1,2 @@
 python3 -m unittest discover -s src
+python3 -m unittest discover -s bench -t .